@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+'''
+usage:   extracttext.py [-j workers] <outdir> <some.pdf or directory> ...
+
+Writes the text of each PDF to a UTF-8 .txt file in outdir, with a
+form feed between pages.  Several files are processed at once.
+
+'''
+
+import sys
+import os
+
+import find_pdfrw
+from pdfrw.text import iterfiles
+from pdfrw.util import pdffiles
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    workers = None
+    if args[:1] == ['-j']:
+        workers = int(args[1])
+        args = args[2:]
+    outdir = args.pop(0)
+    fnames = []
+    for arg in args:
+        if os.path.isdir(arg):
+            fnames.extend(pdffiles(arg))
+        else:
+            fnames.append(arg)
+    for fname, pages in iterfiles(fnames, workers):
+        if pages is None:
+            continue
+        outfn = os.path.join(outdir, os.path.splitext(os.path.basename(fname))[0] + '.txt')
+        f = open(outfn, 'wb')
+        try:
+            f.write(u'\f'.join(pages).encode('utf-8'))
+        finally:
+            f.close()
+        print '%s: %d pages -> %s' % (fname, len(pages), outfn)
@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 
 '''
-usage:   getimages.py <some.pdf>
+usage:   getimages.py [-j workers] <outdir> <some.pdf or directory> ...
 
-Locates images and image type within the PDF.
-
-Need to add code to write them out.....
+Lists the images on each page of the PDFs, and writes them out
+to outdir.  JPEG and JPEG 2000 images are copied out as they are,
+and most other images are written out as PNG files.  Several
+files are processed at once.
 
 '''
 
@@ -13,50 +14,32 @@ import sys
 import os
 
 import find_pdfrw
-from pdfrw import PdfReader, PdfDict, PdfArray, PdfName
-
-
-XObject = PdfName.XObject
-Image = PdfName.Image
-
-def find_images(obj, visited=set()):
-    if not isinstance(obj, (PdfDict, PdfArray)):
-        return
-
-    # Don't get stuck in an infinite loop
-    myid = id(obj)
-    if myid in visited:
-        return
-    visited.add(myid)
-
-    if isinstance(obj, PdfDict):
-        if obj.Type == XObject and obj.Subtype == Image:
-            yield obj
-        obj = obj.itervalues()
-
-    for item in obj:
-        for result in find_images(item, visited):
-            yield result
-
-def show_image(image):
-    print '******************'
-    print
-    print image
-    print repr(image.stream[:200])
-    print
-    try:
-        print image.Filter
-        print int(image.Height)
-        print int(image.Width)
-        print int(image.Length)
-        print image.ColorSpace
-        print int(image.DecodeParms.Columns)
-        print int(image.DecodeParms.K)
-        print int(image.DecodeParms.Rows)
-    except:
-        pass
+from pdfrw import PdfReader
+from pdfrw.images import iterimages, extract_images
+from pdfrw.util import pdffiles
+
+
+def show_images(fname):
+    with PdfReader(fname) as reader:
+        for image in iterimages(reader):
+            print '%s page %d /%s: %dx%d, %s bits, %s, %s -> %s' % (
+                fname, image.pagenum, image.name, image.width, image.height,
+                image.bpc, image.colorspace, image.filter, image.extension())
 
 if __name__ == '__main__':
-    inpfn, = sys.argv[1:]
-    for image in find_images(PdfReader(inpfn)):
-        show_image(image)
+    args = sys.argv[1:]
+    workers = None
+    if args[:1] == ['-j']:
+        workers = int(args[1])
+        args = args[2:]
+    outdir = args.pop(0)
+    fnames = []
+    for arg in args:
+        if os.path.isdir(arg):
+            fnames.extend(pdffiles(arg))
+        else:
+            fnames.append(arg)
+    for fname in fnames:
+        show_images(fname)
+    written = extract_images(fnames, outdir, workers)
+    print '%d images written to %s' % (sum(len(x) for x in written.itervalues()), outdir)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+'''
+usage:   minify.py [-m] [-d digits] my.pdf
+
+Creates minify.my.pdf, with the page content streams rewritten
+more compactly (see pdfrw.content), and prints the sizes before
+and after.
+
+    -m         merges the content streams of each page into one
+    -d digits  rounds path coordinates to that many decimal places
+'''
+
+import sys
+import os
+import time
+
+import find_pdfrw
+from pdfrw import PdfReader, PdfWriter
+from pdfrw.content import optimizepages
+
+args = sys.argv[1:]
+merge = '-m' in args
+if merge:
+    args.remove('-m')
+digits = None
+if '-d' in args:
+    index = args.index('-d')
+    digits = int(args[index + 1])
+    del args[index:index + 2]
+inpfn, = args
+outfn = 'minify.' + os.path.basename(inpfn)
+
+trailer = PdfReader(inpfn)
+start = time.time()
+before, after = optimizepages(trailer.pages, merge, digits)
+print 'Content streams: %d bytes -> %d bytes (%.1f%% smaller) in %.2f seconds' % (
+        before, after, 100.0 * (before - after) / max(before, 1), time.time() - start)
+PdfWriter(compress=True).write(outfn, trailer)
+print 'File: %d bytes -> %d bytes' % (os.path.getsize(inpfn), os.path.getsize(outfn))
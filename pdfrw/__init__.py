@@ -6,6 +6,7 @@ __version__ = '0.1'
 
 from pdfrw.pdfwriter import PdfWriter
 from pdfrw.pdfreader import PdfReader
+from pdfrw.streamwriter import PdfStreamWriter
 from pdfrw.objects import PdfObject, PdfName, PdfArray, PdfDict, IndirectPdfDict, PdfString
 from pdfrw.tokens import PdfTokens
 from pdfrw.errors import PdfParseError
@@ -67,7 +67,16 @@ class ViewInfo(object):
             assert hasattr(self, key), key
             setattr(self, key, value)
 
-def get_rotation(rotate):
+def getfloats(array, tuple=tuple, float=float):
+    ''' Return a box or matrix as a tuple of floats.  (Cached,
+        if it is a PdfArray.)
+    '''
+    try:
+        return array.floats()
+    except AttributeError:
+        return tuple([float(x) for x in array])
+
+def get_rotation(rotate, getattr=getattr):
     ''' Return clockwise rotation code:
           0 = unrotated
           1 = 90 degrees
@@ -75,7 +84,7 @@ def get_rotation(rotate):
           3 = 270 degrees
     '''
     try:
-        rotate = int(rotate)
+        rotate = int(getattr(rotate, 'number', rotate))
     except (ValueError, TypeError):
         return 0
     if rotate % 90 != 0:
@@ -106,10 +115,10 @@ def getrects(inheritable, pageinfo, rotation):
         the desired pageinfo rectangle, return the page's
         media box and the calculated boundary (clip) box.
     '''
-    mbox = tuple([float(x) for x in inheritable.MediaBox])
+    mbox = getfloats(inheritable.MediaBox)
     vrect = pageinfo.viewrect
     if vrect is None:
-        cbox = tuple([float(x) for x in (inheritable.CropBox or mbox)])
+        cbox = getfloats(inheritable.CropBox or mbox)
     else:
         # Rotate the media box to match what the user sees,
         # figure out the clipping box, then rotate back
@@ -247,3 +256,19 @@ class CacheXObj(object):
         if doc is None:
             doc = pcache[fname] = PdfReader(fname, decompress=self.decompress)
         return docxobj(info, doc, allow_compressed=not self.decompress)
+
+    def close(self):
+        ''' Close all the cached readers (see PdfReader.close()).
+            Do this after the output has been written, because
+            the Form XObjects can refer to objects that have
+            not been read in yet.
+        '''
+        pcache = self.cached_pdfs
+        while pcache:
+            pcache.popitem()[1].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,120 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Copy a PDF object, and everything it refers to.
+
+A pdfrw object can be used in more than one place in an output
+file, but then it is the same object in every place.  If the
+places need to be changed separately (e.g. to give each copy of
+a page different annotations), clone() makes copies:
+
+    copies = [clone(page) for x in range(4)]
+
+clone() copies each object only once, so circular structures are
+fine, and an object that is used twice in the original is used
+twice in the copy.  Passing the same memo dictionary to several
+calls to clone() shares copies between them.
+
+Nothing is read in just to be copied.  A reference to an object
+that hasn't been read from its file yet is copied as a reference
+to a copy that will be made when (if) it is needed.
+
+Some objects are shared rather than copied.  By default these are
+fonts, font descriptors and images, which are usually large and
+not changed, and the /Parent of anything, so that cloning a page
+does not clone every other page in the document.  Pass a different
+share() function or sharekeys to change this.
+'''
+
+from pdfrw.objects import PdfDict, PdfArray, PdfName, PdfIndirect
+
+_sharedtypes = set([PdfName.Font, PdfName.FontDescriptor])
+
+def shareable(obj, isinstance=isinstance, PdfDict=PdfDict):
+    ''' Return true for objects that clone() should not copy.
+    '''
+    if isinstance(obj, PdfDict):
+        return obj.Type in _sharedtypes or obj.Subtype == PdfName.Image
+    return False
+
+
+class ClonePlaceholder(PdfIndirect):
+    ''' Stands in for the copy of an object that has not been
+        read in yet.  A subclass is made for each memo and
+        source reader, with a _loader that makes the copy.
+    '''
+    __slots__ = ()
+
+
+def _placeholder_class(source, memo, share, sharekeys):
+    ''' Return the clone placeholder class for the placeholders
+        of one source reader.
+    '''
+    result = memo.get(source)
+    if result is None:
+        def loader(key):
+            return clone(source(key).real_value(), memo, share, sharekeys)
+        def locator(key):
+            return source(key).offset()
+        result = memo[source] = type('ClonePlaceholder', (ClonePlaceholder,),
+                dict(__slots__=(), _loader=staticmethod(loader),
+                                   _locator=staticmethod(locator)))
+    return result
+
+
+def clone(obj, memo=None, share=shareable, sharekeys=(PdfName.Parent,),
+               isinstance=isinstance, id=id, vars=vars, iteritems=dict.iteritems,
+               setitem=dict.__setitem__, listiter=list.__iter__,
+               PdfDict=PdfDict, PdfArray=PdfArray, PdfIndirect=PdfIndirect):
+    ''' Return a copy of obj.  memo maps the ids of objects
+        that have already been copied to (original, copy)
+        tuples.
+    '''
+    if memo is None:
+        memo = {}
+    pending = []
+
+    def copyobj(obj):
+        ''' Return the copy of an object.  Dicts and arrays
+            are created empty, and filled in later.
+        '''
+        if isinstance(obj, PdfIndirect):
+            return _placeholder_class(type(obj), memo, share, sharekeys)(obj)
+        if not isinstance(obj, (dict, list)):
+            return obj
+        info = memo.get(id(obj))
+        if info is not None:
+            return info[1]
+        if share(obj):
+            result = obj
+        else:
+            result = (PdfArray, PdfDict)[isinstance(obj, dict)]()
+            indirect = getattr(obj, 'indirect', False)
+            if indirect:
+                result.indirect = indirect
+            pending.append((obj, result))
+        # Keep the original, so its id can't be reused
+        memo[id(obj)] = obj, result
+        return result
+
+    result = copyobj(obj)
+    while pending:
+        source, dest = pending.pop()
+        if isinstance(dest, PdfDict):
+            for key, value in iteritems(source):
+                if key not in sharekeys:
+                    value = copyobj(value)
+                setitem(dest, key, value)
+            stream = vars(source).get('stream')
+            if stream is not None:
+                vars(dest)['stream'] = stream
+        else:
+            items = [copyobj(x) for x in listiter(source)]
+            dest.extend(items)
+            for value in items:
+                if isinstance(value, PdfIndirect):
+                    dest._resolved = False
+                    break
+    return result
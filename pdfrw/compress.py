@@ -3,14 +3,30 @@
 # MIT license -- See LICENSE.txt for details
 
 '''
-Currently, this sad little file only knows how to decompress
-using the flate (zlib) algorithm.  Maybe more later, but it's
-not a priority for me...
+Stream compression for the writer.
+
+compress() flate-compresses streams that have no filter at all.
+
+transcode() goes further: streams that use the older or weaker
+filters (/LZWDecode, /ASCII85Decode, /ASCIIHexDecode,
+/RunLengthDecode, or chains of them) are decoded and compressed
+again with /FlateDecode.  Images with 8 or 16 bits per component
+are also tried with a PNG predictor, and the smaller result is
+kept.  ASCII filters in front of image filters such as /DCTDecode
+are simply removed.  A stream is only replaced if the result is
+smaller.
+
+Transcoding a large archive can take a while, so transcode() can
+spread the work over several threads (zlib and NumPy release the
+GIL while they work), and can be given a budget of input bytes or
+CPU seconds, after which the remaining streams are left alone.
 '''
 import zlib
-from pdfrw.objects import PdfDict, PdfName
+import time
+from pdfrw.objects import PdfDict, PdfName, PdfArray
 from pdfrw.errors import log
-from pdfrw.uncompress import streamobjects
+from pdfrw.uncompress import (streamobjects, getfilters, setfilters, splitfilters,
+                              decode, iterdecode, iterfilters, readparms, inorder, numpy)
 
 def compress(mylist):
     flate = PdfName.FlateDecode
@@ -24,3 +40,173 @@ def compress(mylist):
             obj.stream = newstr
             obj.Filter = flate
             obj.DecodeParms = None
+
+#####################################################################
+# PNG predictors
+
+def _png_numpy(data, bpp, rowlen, rows):
+    ''' Pick a filter type (None, Sub or Up) for each row, by the
+        usual PNG rule of thumb:  the smallest sum of the filtered
+        bytes, taken as signed values.
+    '''
+    uint8 = numpy.uint8
+    image = numpy.frombuffer(data, uint8, rows * rowlen).reshape(rows, rowlen)
+    sub = image.copy()
+    sub[:, bpp:] -= image[:, :-bpp]
+    up = image.copy()
+    up[1:] -= image[:-1]
+    choices = image, sub, up
+    costs = [numpy.abs(x.view(numpy.int8).astype(numpy.int16)).sum(axis=1, dtype=numpy.int64)
+                for x in choices]
+    kinds = numpy.argmin(numpy.vstack(costs), axis=0).astype(uint8)
+    result = numpy.empty((rows, rowlen + 1), uint8)
+    result[:, 0] = kinds
+    for kind, choice in enumerate(choices):
+        mask = kinds == kind
+        result[mask, 1:] = choice[mask]
+    return result.tostring()
+
+def _png_python(data, rowlen, rows, bytearray=bytearray, izip=zip):
+    ''' Use Up for every row but the first.
+    '''
+    prev = bytearray(rowlen)
+    result = []
+    for start in xrange(0, rows * rowlen, rowlen):
+        row = bytearray(data[start:start + rowlen])
+        result.append(start and '\2' or '\0')
+        if start:
+            result.append(str(bytearray([(x - y) & 255 for x, y in izip(row, prev)])))
+        else:
+            result.append(str(row))
+        prev = row
+    return ''.join(result)
+
+def png_predict(data, colors, bpc, columns):
+    ''' Apply the PNG predictors (/Predictor 15) to image data,
+        which must be a whole number of rows.
+    '''
+    bpp = (colors * bpc + 7) // 8
+    rowlen = (colors * bpc * columns + 7) // 8
+    rows = len(data) // rowlen
+    if numpy is not None:
+        return _png_numpy(data, bpp, rowlen, rows)
+    return _png_python(data, rowlen, rows)
+
+#####################################################################
+# Transcoding
+
+_colors = {
+    PdfName.DeviceGray: 1, PdfName.CalGray: 1, PdfName.G: 1,
+    PdfName.DeviceRGB: 3, PdfName.CalRGB: 3, PdfName.RGB: 3, PdfName.Lab: 3,
+    PdfName.DeviceCMYK: 4, PdfName.CMYK: 4,
+    PdfName.Indexed: 1, PdfName.I: 1, PdfName.Separation: 1,
+}
+
+def imagelayout(obj, isinstance=isinstance, int=int, PdfArray=PdfArray):
+    ''' Return (colors, bpc, columns) for an image stream that a
+        PNG predictor would suit, or None.
+    '''
+    if obj.Subtype != PdfName.Image or obj.ImageMask:
+        return None
+    bpc = int(obj.BitsPerComponent or 0)
+    if bpc not in (8, 16):
+        return None
+    colorspace = obj.ColorSpace
+    family = colorspace
+    if isinstance(colorspace, PdfArray):
+        family = colorspace[0]
+    colors = _colors.get(family)
+    if family == PdfName.ICCBased:
+        colors = int(colorspace[1].N)
+    elif family == PdfName.DeviceN:
+        colors = len(colorspace[1])
+    if colors is None:
+        return None
+    return colors, bpc, int(obj.Width)
+
+def _transcodestream(obj, pairs, layout, level, maxsize, compress=zlib.compress, len=len):
+    ''' Transcode one stream for transcode().  Return the new
+        data, the new filters, and the exception raised, if any.
+    '''
+    try:
+        if maxsize is None:
+            data, remaining = decode(obj.stream, pairs)
+        else:
+            known, remaining = splitfilters(pairs, iterfilters)
+            data = ''.join(iterdecode(obj, maxsize=maxsize, pairs=known))
+    except Exception, s:
+        return None, None, s
+    if remaining:
+        return data, remaining, None
+    result = compress(data, level)
+    filters = [(PdfName.FlateDecode, None)]
+    if layout is not None:
+        colors, bpc, columns = layout
+        rowlen = (colors * bpc * columns + 7) // 8
+        if data and not len(data) % rowlen:
+            predicted = compress(png_predict(data, colors, bpc, columns), level)
+            if len(predicted) < len(result):
+                result = predicted
+                filters = [(PdfName.FlateDecode, PdfDict(Predictor=15, Colors=colors,
+                                            BitsPerComponent=bpc, Columns=columns))]
+    return result, filters, None
+
+def _candidates(mylist, flate=(PdfName.FlateDecode, PdfName.Fl), vars=vars):
+    ''' Yield (obj, pairs, size) for the streams worth transcoding.
+    '''
+    for obj in streamobjects(mylist):
+        # XMP metadata is left as is, for tools that look for it in the file
+        if obj.Type == PdfName.Metadata:
+            continue
+        pairs = getfilters(obj)
+        known, remaining = splitfilters(pairs)
+        if remaining and not known:
+            continue
+        if len(pairs) == 1 and pairs[0][0] in flate:
+            continue
+        yield obj, pairs, len(vars(obj)['stream'])
+
+def transcode(mylist, workers=1, maxbytes=None, maxtime=None, level=9,
+              maxsize=None, clock=time.clock, len=len):
+    ''' Transcode the streams in mylist to /FlateDecode in place,
+        using workers threads.  Once maxbytes bytes of streams have
+        been started on, or maxtime seconds of CPU time have been
+        used, the remaining streams are left alone.  Streams that
+        decode to more than maxsize bytes are left alone too, and
+        are not decoded any further than that.  Return the number
+        of bytes saved.
+    '''
+    start = clock()
+
+    def jobs():
+        total = 0
+        for obj, pairs, size in _candidates(mylist):
+            total += size
+            if maxbytes is not None and total > maxbytes:
+                log.info('Transcoding stopped after %d bytes' % (total - size))
+                return
+            if maxtime is not None and clock() - start > maxtime:
+                log.info('Transcoding stopped after %.1f seconds' % (clock() - start))
+                return
+            layout = imagelayout(obj)
+            if workers > 1:
+                pairs = readparms(pairs)
+            yield obj, pairs, layout, level, maxsize
+
+    if workers > 1:
+        results = inorder(_transcodestream, jobs(), workers)
+    else:
+        results = ((job, _transcodestream(*job)) for job in jobs())
+    saved = 0
+    for job, (data, filters, error) in results:
+        obj = job[0]
+        if error is not None:
+            log.error('Not transcoding: %s %s' % (error, repr(obj.indirect)))
+            continue
+        oldsize = len(vars(obj)['stream'])
+        if len(data) >= oldsize:
+            continue
+        obj.stream = data
+        setfilters(obj, filters)
+        saved += oldsize - len(data)
+    return saved
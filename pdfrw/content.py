@@ -0,0 +1,342 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Read and rewrite page content streams.
+
+instructions() splits content stream data into (operands, operator)
+pairs.  The operands are a list of token strings, with arrays and
+dictionaries left as their bracket tokens, so the text of every
+operand is kept exactly.  Comments are dropped.  An inline image
+is returned as one instruction, with operator 'BI', and with the
+tokens of its dictionary followed by the raw image data as its
+operands.
+
+formatcontent() joins instructions back together, using whitespace
+only where it is needed to keep two tokens apart.
+
+optimize() rewrites content stream data more compactly, without
+changing what it draws:
+
+    - numbers are written in their shortest form (1.500 -> 1.5,
+      0.25 -> .25, -0 -> 0)
+    - settings of the graphics state (line width, colors, text
+      font, and so on) that do not change anything are removed,
+      keeping track of q/Q nesting
+    - q/Q pairs with nothing between them are removed
+
+If digits is given, the coordinates of path construction operators
+are also rounded to that many places after the decimal point.
+This is not lossless, but 2 or 3 digits (1/100 or 1/1000 of a point
+in default user space) is usually far finer than anything visible.
+
+optimizepages() does this to the content streams of a list of pages
+(each shared stream only once), and can also merge the Contents
+array of each page into a single stream.
+'''
+
+import re
+import zlib
+
+from pdfrw.objects import PdfArray, PdfName, IndirectPdfDict
+from pdfrw.uncompress import getfilters
+from pdfrw.errors import log
+
+_delimiters = '()<>[]{}/%'
+
+# A token, then any whitespace and comments after it
+_findtok = re.compile(r'''
+    ( << | >> | <[\x00\t\n\f\r 0-9A-Fa-f]*> | [\[\]{}(] |
+      /[^\x00\t\n\f\r ()<>\[\]{}/%]* |
+      [^\x00\t\n\f\r ()<>\[\]{}/%]+ | [\s\S] )
+    (?: [\x00\t\n\f\r ]+ | %[^\r\n]* )*
+''', re.VERBOSE).finditer
+_skip = re.compile(r'(?:[\x00\t\n\f\r ]+|%[^\r\n]*)*').match
+
+_findparen = re.compile(r'\\[\s\S]|[()]').finditer
+_findei = re.compile(r'[\x00\t\n\f\r ]EI(?=[\x00\t\n\f\r ]|$)').finditer
+_findbinary = re.compile(r'[\x00-\x08\x0b\x0e-\x1f\x7f-\xff]').search
+_isnumber = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)$').match
+
+_keywords = set(['true', 'false', 'null'])
+
+# The first characters of operands that are not keywords
+_operandstart = set(_delimiters + '0123456789+-.')
+
+
+def _stringend(fdata, start):
+    ''' Return the end of the literal string starting at start.
+    '''
+    depth = 0
+    for match in _findparen(fdata, start):
+        token = match.group()
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            if not depth:
+                return match.end()
+    log.warning('Unterminated string in content stream')
+    return len(fdata)
+
+
+def tokens(fdata):
+    ''' Yield the tokens of content stream data.  The data of
+        an inline image is yielded as a single token, right
+        after the ID operator.
+    '''
+    pos = _skip(fdata).end()
+    while 1:
+        for match in _findtok(fdata, pos):
+            token = match.group(1)
+            if token == '(':
+                start = match.start()
+                end = _stringend(fdata, start)
+                yield fdata[start:end]
+                pos = _skip(fdata, end).end()
+                break
+            yield token
+            if token == 'ID':
+                # A single whitespace character, then the data
+                start = match.end(1) + 1
+                for ei in _findei(fdata, start - 1):
+                    # The image data may hold EI too, but not followed
+                    # by more content stream text.
+                    if _findbinary(fdata, ei.end(), ei.end() + 32) is None:
+                        break
+                else:
+                    log.warning('Inline image without EI in content stream')
+                    yield fdata[start:]
+                    return
+                yield fdata[start:max(start, ei.start())]
+                pos = ei.start() + 1
+                break
+        else:
+            return
+
+
+def instructions(fdata, keywords=_keywords, operandstart=_operandstart):
+    ''' Yield (operands, operator) for each operator in
+        content stream data.
+    '''
+    source = tokens(fdata)
+    operands = []
+    for token in source:
+        if token[0] in operandstart or token in keywords:
+            operands.append(token)
+            continue
+        if token == 'BI':
+            # Dictionary tokens up to ID, then the data
+            for item in source:
+                if item == 'ID':
+                    operands.append(next(source, ''))
+                    break
+                operands.append(item)
+            for item in source:
+                if item == 'EI':
+                    break
+        yield operands, token
+        operands = []
+    if operands:
+        log.warning('Operands without an operator at end of content stream')
+
+
+def formatcontent(instructions, startdelims=_delimiters, enddelims=')>]}[{<'):
+    ''' Return content stream data for a list of (operands,
+        operator) pairs, with as little whitespace as possible.
+    '''
+    result = []
+    append = result.append
+    joined = False      # Would a regular token run into the last one?
+    for operands, operator in instructions:
+        if operator == 'BI':
+            operands, data = operands[:-1], operands[-1]
+            operands = ['BI'] + operands + ['ID']
+            operator = None
+        else:
+            operands = operands + [operator]
+        sep = '\n'
+        for token in operands:
+            if joined and token[0] not in startdelims:
+                append(sep)
+            append(token)
+            joined = token[-1] not in enddelims
+            sep = ' '
+        if operator is None:
+            append(' ')
+            append(data)
+            append('\nEI')
+            joined = True
+    return ''.join(result)
+
+
+#####################################################################
+# Optimization
+
+def fixnumber(token, digits=None):
+    ''' Return the shortest form of a number, rounded to
+        digits places after the decimal point if given.
+    '''
+    if digits is not None and '.' in token:
+        token = '%.*f' % (digits, round(float(token), digits))
+    negative = token[0] == '-'
+    token = token.lstrip('+-')
+    whole, dot, fraction = token.partition('.')
+    whole = whole.lstrip('0')
+    fraction = fraction.rstrip('0')
+    if fraction:
+        token = '%s.%s' % (whole, fraction)
+    else:
+        token = whole or '0'
+    if negative and token != '0':
+        token = '-' + token
+    return token
+
+
+# Operators whose operands are coordinates that may be rounded
+_pathops = set('m l c v y re'.split())
+
+# Operators that set one part of the graphics state
+_simpleops = set('w J j M d ri i Tc Tw Tz TL Tf Tr Ts'.split())
+
+# Color operators, with the state they set, and whether they
+# set the whole color (rather than just the components)
+_colorops = {
+    'CS': ('stroke', True), 'G': ('stroke', True), 'RG': ('stroke', True),
+    'K': ('stroke', True), 'SC': ('stroke', False), 'SCN': ('stroke', False),
+    'cs': ('fill', True), 'g': ('fill', True), 'rg': ('fill', True),
+    'k': ('fill', True), 'sc': ('fill', False), 'scn': ('fill', False),
+}
+
+# Operators that leave the state we track alone
+_otherops = set('''
+    m l c v y h re S s f F f* B B* b b* n W W* cm
+    BT ET Td Tm T* Tj TJ ' Do sh BMC BDC EMC MP DP BX EX d0 d1
+'''.split())
+
+
+def optimize(fdata, digits=None, isnumber=_isnumber, tuple=tuple,
+             numberstart=set('0123456789+-.')):
+    ''' Return a more compact version of content stream data.
+    '''
+    state = {}
+    stack = []
+    result = []
+    # The same numbers come up over and over
+    numbers = {None: {}, digits: {}}
+
+    def fix(token, places):
+        cache = numbers[places]
+        fixed = cache.get(token)
+        if fixed is None:
+            fixed = cache[token] = isnumber(token) and fixnumber(token, places) or token
+        return fixed
+
+    for operands, operator in instructions(fdata):
+        if operator == 'BI':
+            result.append((operands, operator))
+            continue
+        places = operator in _pathops and digits or None
+        operands = [x[0] in numberstart and fix(x, places) or x for x in operands]
+        if operator == 'q':
+            stack.append(state.copy())
+        elif operator == 'Q':
+            restored = stack and stack.pop() or {}
+            if result and result[-1][1] == 'q':
+                result.pop()
+                state = restored
+                continue
+            state = restored
+        elif operator in _simpleops:
+            value = tuple(operands)
+            if state.get(operator) == value:
+                continue
+            state[operator] = value
+        elif operator in _colorops:
+            key, whole = _colorops[operator]
+            value = operator, tuple(operands)
+            old = state.get(key)
+            if whole:
+                new = (value,)
+            else:
+                new = old is not None and (old[0], value) or None
+            if new is not None and new == old:
+                continue
+            state[key] = new
+        elif operator == '"':
+            # Sets the word and character spacing, then shows text
+            state['Tw'] = tuple(operands[:1])
+            state['Tc'] = tuple(operands[1:2])
+        elif operator == 'TD':
+            state.pop('TL', None)
+        elif operator not in _otherops:
+            # gs, or something we don't know
+            state = {}
+        result.append((operands, operator))
+    return formatcontent(result)
+
+
+def setstream(obj, data, compressed, compress=zlib.compress):
+    ''' Set new (decoded) data on a stream, Flate
+        compressed if compressed is true.
+    '''
+    if compressed:
+        obj.stream = compress(data)
+        obj.Filter = PdfName.FlateDecode
+    else:
+        obj.stream = data
+        obj.Filter = None
+    obj.DecodeParms = None
+
+
+def optimizestream(obj, digits=None):
+    ''' Optimize a content stream (or Form XObject) in place.
+        Return the decoded sizes before and after, or None
+        if the stream could not be decoded.
+    '''
+    data = obj.decoded
+    if data is None:
+        return None
+    new = optimize(data, digits)
+    if len(new) < len(data):
+        setstream(obj, new, getfilters(obj))
+    else:
+        new = data
+    return len(data), len(new)
+
+
+def optimizepages(pages, merge=False, digits=None, isinstance=isinstance):
+    ''' Optimize the content streams of pages in place.  If
+        merge is true, a /Contents array is replaced by a single
+        stream.  Return the total decoded sizes before and after.
+    '''
+    before = after = 0
+    done = set()
+    for page in pages:
+        contents = page.Contents
+        if contents is None:
+            continue
+        if merge and isinstance(contents, PdfArray):
+            datas = [x.decoded for x in contents]
+            if None in datas:
+                continue
+            data = '\n'.join(datas)
+            new = optimize(data, digits)
+            stream = IndirectPdfDict()
+            setstream(stream, new, [x for x in contents if getfilters(x)])
+            page.Contents = stream
+            before += sum(len(x) for x in datas)
+            after += len(new)
+            continue
+        if not isinstance(contents, PdfArray):
+            contents = [contents]
+        for obj in contents:
+            if id(obj) in done:
+                continue
+            done.add(id(obj))
+            sizes = optimizestream(obj, digits)
+            if sizes is not None:
+                before += sizes[0]
+                after += sizes[1]
+    return before, after
@@ -0,0 +1,302 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Find the images in a PDF, and write them out as image files:
+
+    for image in iterimages(PdfReader(fname)):
+        print image.pagenum, image.name, image.width, image.height
+        image.save('image%d' % image.pagenum)
+
+JPEG (/DCTDecode) and JPEG 2000 (/JPXDecode) images are written out
+as .jpg and .jp2 files by copying the stream data.
+
+Flate images with a PNG predictor already hold what a PNG file
+holds as its image data, so the compressed data is copied into
+PNG chunks without being decompressed.  Other images in a color
+space that PNG supports are decoded and recompressed, a chunk at
+a time.
+
+Anything else (e.g. CMYK images that are not JPEGs, or CCITT and
+JBIG2 images) is not written out.  Neither are inline images in
+content streams.
+
+extract_images() writes out the images of a list of files, in
+several processes.
+'''
+
+import os
+import zlib
+import struct
+
+from pdfrw.objects import PdfDict, PdfArray, PdfName
+from pdfrw.pdfreader import PdfReader
+from pdfrw.uncompress import getfilters, splitfilters, iterstream, iterdecode, rechunk
+from pdfrw.util import mapfiles
+from pdfrw.errors import PdfError, log
+
+_extensions = {
+    PdfName.DCTDecode: '.jpg',
+    PdfName.DCT: '.jpg',
+    PdfName.JPXDecode: '.jp2',
+}
+
+_gray = set([PdfName.DeviceGray, PdfName.CalGray, PdfName.G])
+_rgb = set([PdfName.DeviceRGB, PdfName.CalRGB, PdfName.RGB])
+
+
+def _components(colorspace, isinstance=isinstance, PdfArray=PdfArray):
+    ''' Return the number of color components (1 or 3) for a
+        color space PNG can handle directly, or None.
+    '''
+    family = colorspace
+    if isinstance(colorspace, PdfArray):
+        family = colorspace[0]
+    if family in _gray:
+        return 1
+    if family in _rgb:
+        return 3
+    if family == PdfName.ICCBased:
+        count = int(colorspace[1].N)
+        if count in (1, 3):
+            return count
+    return None
+
+
+class ImageInfo(object):
+    ''' Describes an image XObject, found on page pagenum
+        (starting at 1) under the resource name name.
+    '''
+
+    def __init__(self, obj, pagenum, name):
+        self.obj = obj
+        self.pagenum = pagenum
+        self.name = name
+        self.width = int(obj.Width)
+        self.height = int(obj.Height)
+        self.colorspace = obj.ColorSpace
+        self.bpc = int(obj.BitsPerComponent or 1)
+        self.filters = getfilters(obj)
+        self.filter = self.filters and self.filters[-1][0] or None
+
+    def pnginfo(self):
+        ''' Return the PNG color type, number of components
+            and palette for the image, or None if PNG can't
+            hold it.
+        '''
+        obj = self.obj
+        if obj.ImageMask:
+            if obj.Decode is not None and float(obj.Decode[0]):
+                return None
+            return 0, 1, None
+        if obj.Decode is not None or self.bpc not in (1, 2, 4, 8, 16):
+            return None
+        colorspace = self.colorspace
+        components = _components(colorspace)
+        if components == 1:
+            return 0, 1, None
+        if components == 3:
+            # PNG only has 8 and 16 bit RGB
+            if self.bpc < 8:
+                return None
+            return 2, 3, None
+        if not isinstance(colorspace, PdfArray) or colorspace[0] not in (PdfName.Indexed, PdfName.I):
+            return None
+        if self.bpc == 16:
+            return None
+        base, hival, lookup = colorspace[1:4]
+        components = _components(base)
+        if components is None:
+            return None
+        if isinstance(lookup, PdfDict):
+            lookup = lookup.decoded
+        else:
+            lookup = lookup.decode()
+        if lookup is None:
+            return None
+        palette = lookup[:components * (int(hival) + 1)]
+        if components == 1:
+            palette = ''.join(x * 3 for x in palette)
+        return 3, 1, palette
+
+    def extension(self):
+        ''' Return the file extension the image would
+            be saved with, or None if it can't be saved.
+        '''
+        ext = _extensions.get(self.filter)
+        if ext is not None:
+            return ext
+        if splitfilters(self.filters)[1]:
+            # Some other image format (CCITT, JBIG2)
+            return None
+        if self.pnginfo() is None:
+            return None
+        return '.png'
+
+    def save(self, basename):
+        ''' Write the image out to basename plus the extension.
+            Return the file name, or None if the image
+            could not be written.  The file is written under
+            a temporary name and renamed when it is complete,
+            so an image that fails to decode (PdfParseError)
+            does not leave a truncated file behind.
+        '''
+        ext = self.extension()
+        if ext is None:
+            log.warning('Cannot write out image %s (filter %s, color space %s)' %
+                            (repr(self.obj.indirect), self.filter, self.colorspace))
+            return None
+        fname = basename + ext
+        tempname = fname + '.part'
+        f = open(tempname, 'wb')
+        try:
+            try:
+                for data in self.iterdata():
+                    f.write(data)
+            finally:
+                f.close()
+        except:
+            os.remove(tempname)
+            raise
+        try:
+            os.rename(tempname, fname)
+        except OSError:
+            # Windows won't rename over an existing file
+            os.remove(fname)
+            os.rename(tempname, fname)
+        return fname
+
+    def iterdata(self):
+        ''' Yield the contents of the image file.
+        '''
+        if self.filter in _extensions:
+            if len(self.filters) == 1:
+                return iterstream(self.obj, 1 << 16)
+            return iterdecode(self.obj, pairs=self.filters[:-1])
+        return self.iterpng()
+
+    def iterpng(self, pack=struct.pack, crc32=zlib.crc32):
+        ''' Yield the contents of a PNG file for the image.
+        '''
+        def chunk(kind, data):
+            return '%s%s%s%s' % (pack('>L', len(data)), kind, data,
+                                 pack('>L', crc32(data, crc32(kind)) & 0xFFFFFFFF))
+
+        colortype, components, palette = self.pnginfo()
+        width = self.width
+        bpc = self.bpc
+        yield '\x89PNG\r\n\x1a\n'
+        yield chunk('IHDR', pack('>LLBBBBB', width, self.height, bpc, colortype, 0, 0, 0))
+        if palette is not None:
+            yield chunk('PLTE', palette)
+        for data in self.iteridat(components, width, bpc):
+            yield chunk('IDAT', data)
+        yield chunk('IEND', '')
+
+    def iteridat(self, components, width, bpc, join=''.join):
+        ''' Yield PNG image data.  If the image is Flate data with
+            a matching PNG predictor, this is the stream data.
+            Otherwise the image is decoded and compressed again,
+            with a PNG filter type byte at the start of each row.
+        '''
+        filters = self.filters
+        if len(filters) == 1 and filters[0][0] in (PdfName.FlateDecode, PdfName.Fl):
+            parms = filters[0][1] or PdfDict()
+            if (int(parms.Predictor or 1) >= 10 and
+                    int(parms.Colors or 1) == components and
+                    int(parms.BitsPerComponent or 8) == bpc and
+                    int(parms.Columns or 1) == width):
+                for data in iterstream(self.obj, 1 << 16):
+                    yield data
+                return
+        rowlen = (components * bpc * width + 7) // 8
+        if filters:
+            chunks = iterdecode(self.obj, rowlen * max(1, (1 << 16) // rowlen))
+        else:
+            chunks = rechunk(iterstream(self.obj, 1 << 16), rowlen * max(1, (1 << 16) // rowlen))
+        compressor = zlib.compressobj()
+        remaining = rowlen * self.height
+        for data in chunks:
+            data = data[:remaining]
+            remaining -= len(data)
+            rows = ['\0' + data[x:x + rowlen] for x in xrange(0, len(data), rowlen)]
+            data = compressor.compress(join(rows))
+            if data:
+                yield data
+        if remaining > 0:
+            # Short image -- fill it out with zeros
+            rows = ['\0' + '\0' * rowlen] * (remaining // rowlen)
+            yield compressor.compress(join(rows))
+        yield compressor.flush()
+
+
+def iterimages(reader, PdfDict=PdfDict):
+    ''' Yield an ImageInfo for each image on each page of a
+        document, including images in Form XObjects on the page.
+        (An image used more than once on a page is only given
+        once for that page.)
+    '''
+    for pagenum, page in enumerate(reader.pages):
+        visited = set()
+        pending = [page.inheritable.Resources]
+        while pending:
+            resources = pending.pop()
+            if not isinstance(resources, PdfDict) or id(resources) in visited:
+                continue
+            visited.add(id(resources))
+            xobjects = resources.XObject
+            if not isinstance(xobjects, PdfDict):
+                continue
+            for name, obj in sorted(xobjects.iteritems()):
+                if not isinstance(obj, PdfDict) or id(obj) in visited:
+                    continue
+                visited.add(id(obj))
+                subtype = obj.Subtype
+                if subtype == PdfName.Image:
+                    yield ImageInfo(obj, pagenum + 1, name[1:])
+                elif subtype == PdfName.Form:
+                    pending.append(obj.Resources)
+
+
+def extract_file(fname, outdir):
+    ''' Write out the images in one file to outdir, using names
+        like doc-p3-Im1.jpg.  (If two images on a page have the
+        same resource name, as a page's /Im1 and a Form XObject's
+        /Im1 can, the second is doc-p3-Im1-2.jpg, and so on.)
+        An image that is used on several pages is only written
+        out once.  An image that cannot be decoded is logged and
+        skipped.  Return the list of files written.
+    '''
+    prefix = os.path.join(outdir, os.path.splitext(os.path.basename(fname))[0])
+    result = []
+    written = set()
+    used = set()
+    with PdfReader(fname) as reader:
+        for image in iterimages(reader):
+            if id(image.obj) in written:
+                continue
+            written.add(id(image.obj))
+            basename = start = '%s-p%d-%s' % (prefix, image.pagenum, image.name)
+            count = 1
+            while basename in used:
+                count += 1
+                basename = '%s-%d' % (start, count)
+            used.add(basename)
+            try:
+                name = image.save(basename)
+            except PdfError, s:
+                log.error('Cannot write out image %s of %s: %s' % (basename, fname, s))
+                continue
+            if name is not None:
+                result.append(name)
+    return result
+
+def extract_images(fnames, outdir, workers=None):
+    ''' Write out the images in a list of files (or all the .pdf
+        files in a directory), using a pool of workers processes
+        (default: one per CPU).  Return a dictionary mapping each
+        input file to the list of image files written for it.
+    '''
+    return dict((fname, names or []) for fname, names
+                    in mapfiles(extract_file, fnames, workers, (outdir,)))
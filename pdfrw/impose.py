@@ -0,0 +1,286 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Put pages onto sheets:  n-up, booklets and posters.
+
+    sheets = impose(PdfReader('my.pdf').pages, NUp(2, 2))
+    PdfStreamWriter('4up.pdf').addpages(sheets).close()
+
+A layout is declared as a list of slots, which are the rectangles
+on a sheet that pages are fit into (as fractions of the size of
+the sheet, from the lower left corner), and a sheets() method that
+says which page goes into each slot of each sheet.  These are
+supplied:
+
+    NUp(columns, rows)      -- pages in order, left to right and
+                               top to bottom
+    Booklet()               -- two pages side by side, in the order
+                               needed to fold the printed sheets
+                               (printed on both sides) into a booklet
+    Poster(columns, rows)   -- each page cut into columns x rows
+                               parts, each enlarged onto its own sheet
+
+Each layout can be given the size of the sheets, in points.  By
+default, it is worked out from the size of the first page on each
+sheet (the same size for NUp and Poster, and twice as wide for
+Booklet).  Each layout can also be given a rotation (a multiple of
+90 degrees, clockwise) for the pages.  Pages are scaled (keeping
+their shape) to fit their slots, and centered in them.
+
+The Form XObjects for the pages are cached, keyed by page, the
+part of the page shown, and rotation, so a page that is used more
+than once is only set up once.  The placement matrices are worked
+out once for each slot and page size, not for each page.
+
+impose() is a generator, which makes each sheet only when it is
+asked for, and the sheets refer to the input pages' objects
+rather than copying them, so it can be used with a PdfReader
+that has a cachesize and a PdfStreamWriter to impose documents of
+any length.  imposefile() does that for a file, and imposefiles()
+does it to many files, using a pool of processes.
+'''
+
+import os
+from collections import OrderedDict
+
+from pdfrw.objects import PdfDict, PdfArray, PdfName, IndirectPdfDict
+from pdfrw.pdfreader import PdfReader
+from pdfrw.streamwriter import PdfStreamWriter
+from pdfrw.buildxobj import ViewInfo, pagexobj, getfloats, get_rotation, rotate_rect
+from pdfrw.content import setstream
+from pdfrw.util import mapfiles
+from pdfrw.errors import PdfOutputError
+
+
+class Layout(object):
+    ''' Fill the slots of each sheet with pages, in order.
+        Subclasses override sheets() for other orders.
+    '''
+    scale = 1, 1       # Default sheet size, in page sizes
+
+    def __init__(self, slots, size=None, rotate=0):
+        self.slots = [tuple(x) for x in slots]
+        self.size = size
+        self.rotate = rotate
+
+    def sheets(self, numpages):
+        ''' Yield a list of (page index, slot, part) for each
+            sheet.  The page index may be None (or too big)
+            to leave a slot empty.  The part is None for a
+            whole page, or (x, y, width, height) as fractions
+            of the page, from the lower left corner.
+        '''
+        slots = self.slots
+        count = len(slots)
+        for start in range(0, numpages, count):
+            yield [(start + index, slot, None) for index, slot in enumerate(slots)]
+
+
+class NUp(Layout):
+    ''' columns x rows pages on each sheet.
+    '''
+
+    def __init__(self, columns=2, rows=2, size=None, rotate=0):
+        width, height = 1.0 / columns, 1.0 / rows
+        slots = [(column * width, 1 - (row + 1) * height, width, height)
+                    for row in range(rows) for column in range(columns)]
+        Layout.__init__(self, slots, size, rotate)
+
+
+class Booklet(Layout):
+    ''' Two pages on each side of each sheet, in the order
+        for a saddle-stitched booklet.  Blank pages are
+        added at the end to make a multiple of four.
+    '''
+    scale = 2, 1
+
+    def __init__(self, size=None, rotate=0):
+        Layout.__init__(self, [(0, 0, 0.5, 1), (0.5, 0, 0.5, 1)], size, rotate)
+
+    def sheets(self, numpages):
+        left, right = self.slots
+        total = (numpages + 3) // 4 * 4
+        for index in range(0, total // 2, 2):
+            yield [(total - 1 - index, left, None), (index, right, None)]
+            yield [(index + 1, left, None), (total - 2 - index, right, None)]
+
+
+class Poster(Layout):
+    ''' Each page cut into columns x rows parts, each of
+        which is put on a sheet of its own, left to right
+        and top to bottom.
+    '''
+
+    def __init__(self, columns=2, rows=2, size=None, rotate=0):
+        Layout.__init__(self, [(0, 0, 1, 1)], size, rotate)
+        self.scale = columns, rows
+        width, height = 1.0 / columns, 1.0 / rows
+        self.parts = [(column * width, 1 - (row + 1) * height, width, height)
+                        for row in range(rows) for column in range(columns)]
+
+    def sheets(self, numpages):
+        slot, = self.slots
+        parts = self.parts
+        for index in range(numpages):
+            for part in parts:
+                yield [(index, slot, part)]
+
+
+def _viewrect(page, part):
+    ''' Return the ViewInfo viewrect (left, top, width, height,
+        from the top left of the media box as the page is shown)
+        for a part of the visible part of a page.
+    '''
+    inheritable = page.inheritable
+    rotation = get_rotation(inheritable.Rotate)
+    mbox = getfloats(inheritable.MediaBox)
+    cbox = getfloats(inheritable.CropBox or mbox)
+    mleft, mbot, mright, mtop = rotate_rect(mbox, rotation)
+    cleft, cbot, cright, ctop = rotate_rect(cbox, rotation)
+    x, y, w, h = part
+    w *= cright - cleft
+    h *= ctop - cbot
+    left = cleft + x * (cright - cleft)
+    top = cbot + y * (ctop - cbot) + h
+    return left - mleft, mtop - top, w, h
+
+
+def _onestream(page, isinstance=isinstance):
+    ''' pagexobj() needs the contents of a page in one stream.
+        Return the page, or a copy of it with its contents in
+        one stream (the page itself is left alone).
+    '''
+    contents = page.Contents
+    if isinstance(contents, PdfArray):
+        datas = [x.decoded for x in contents]
+        if None in datas:
+            raise PdfOutputError('Cannot decode the contents of a page')
+        contents = IndirectPdfDict()
+        setstream(contents, '\n'.join(datas), True)
+        return PdfDict(page, Contents=contents)
+    elif contents is None:
+        return PdfDict(page, Contents=IndirectPdfDict(stream=''))
+    return page
+
+
+def impose(pages, layout, maxcached=256, len=len, id=id):
+    ''' Yield the sheets for a list of pages, as new page
+        objects.  Up to maxcached Form XObjects are kept
+        for reuse.
+    '''
+    numpages = len(pages)
+    rotate = layout.rotate
+    size = layout.size
+    xobjs = OrderedDict()
+    matrices = {}
+    sheetsize = None
+    # The last page set up, and the page (or copy) with one
+    # content stream, so posters share one Form XObject per page
+    lastpage = source = None
+
+    for placements in layout.sheets(numpages):
+        used = []
+        for index, slot, part in placements:
+            if index is None or index >= numpages:
+                continue
+            page = pages[index]
+            viewrect = part and _viewrect(page, part)
+            key = id(page), viewrect, rotate
+            info = xobjs.pop(key, None)
+            if info is None:
+                if page is not lastpage:
+                    lastpage, source = page, _onestream(page)
+                # Keep the page, so that its id is not reused
+                info = page, pagexobj(source, ViewInfo(viewrect=viewrect, rotate=rotate))
+                if len(xobjs) >= maxcached:
+                    xobjs.popitem(last=False)
+            xobjs[key] = info
+            used.append((slot, info[1]))
+
+        if size is not None:
+            sheetsize = size
+        elif used:
+            xobj = used[0][1]
+            sheetsize = xobj.w * layout.scale[0], xobj.h * layout.scale[1]
+        elif sheetsize is None:
+            # A blank sheet before any page has been seen
+            sheetsize = 612, 792
+        width, height = sheetsize
+
+        stream = []
+        xobjdict = PdfDict()
+        for number, (slot, xobj) in enumerate(used):
+            key = sheetsize, slot, xobj.x, xobj.y, xobj.w, xobj.h
+            matrix = matrices.get(key)
+            if matrix is None:
+                matrix = matrices[key] = _fit(sheetsize, slot, xobj)
+            name = '/P%d' % number
+            stream.append('q %s cm %s Do Q\n' % (matrix, name))
+            xobjdict[name] = xobj
+
+        yield IndirectPdfDict(
+            Type = PdfName.Page,
+            Contents = IndirectPdfDict(stream=''.join(stream)),
+            MediaBox = PdfArray([0, 0, width, height]),
+            Resources = PdfDict(XObject=xobjdict),
+        )
+
+
+def _fit(sheetsize, slot, xobj):
+    ''' Return the matrix that scales a Form XObject to fit
+        a slot on a sheet, and centers it there.
+    '''
+    width, height = sheetsize
+    x, y, w, h = slot
+    x, y, w, h = x * width, y * height, w * width, h * height
+    scale = min(w / xobj.w, h / xobj.h)
+    x += (w - xobj.w * scale) / 2.0 - xobj.x * scale
+    y += (h - xobj.h * scale) / 2.0 - xobj.y * scale
+    return '%s 0 0 %s %s %s' % tuple(_num(v) for v in (scale, scale, x, y))
+
+
+def _num(value):
+    value = '%.4f' % value
+    return value.rstrip('0').rstrip('.') or '0'
+
+
+def imposefile(inname, outname, layout, compress=False, cachesize=None,
+               maxcached=256, release=1000):
+    ''' Impose the pages of the file inname, and write the sheets
+        to outname as they are made.  With a cachesize, the reader
+        only holds on to that many of the objects it has read.  The
+        writer lets go of the objects it has written after every
+        release sheets (objects that are used again after that are
+        written again), so that it does not hold on to the whole
+        document.  If release is None, it keeps them all.  Return
+        the number of sheets.
+    '''
+    count = 0
+    with PdfReader(inname, cachesize=cachesize) as reader:
+        writer = PdfStreamWriter(outname, compress=compress)
+        for sheet in impose(reader.pages, layout, maxcached):
+            writer.addpage(sheet)
+            count += 1
+            if release and not count % release:
+                writer.release()
+        writer.close()
+    return count
+
+
+def _imposefile(inname, outdir, layout, kw):
+    return imposefile(inname, os.path.join(outdir, os.path.basename(inname)), layout, **kw)
+
+
+def imposefiles(fnames, outdir, layout, workers=None, **kw):
+    ''' Impose each file in a list of files (or all the .pdf files
+        in a directory), writing files of the same names into outdir.
+        Yield (fname, number of sheets) in order, using a pool of
+        worker processes (default: one per CPU).  The number of
+        sheets is None for files that failed.  Other keyword
+        arguments are passed to imposefile().
+    '''
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    return mapfiles(_imposefile, fnames, workers, (outdir, layout, kw))
@@ -0,0 +1,405 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Linearized ("fast web view") output.
+
+Reference:  Adobe PDF reference, sixth edition, version 1.7,
+            Appendix F, "Linearized PDF"
+
+A linearized file is laid out so that a viewer can display
+the first page before the rest of the file has arrived:
+
+    1   Header
+    2   Linearization parameter dictionary
+    3   First-page cross-reference table and trailer
+    4   Document catalog
+    5   Primary hint stream
+    6   First page -- the page object, the objects only it uses,
+        and the shared objects that it uses
+    7   Remaining pages, each with the objects only it uses
+    8   Shared objects for all pages except the first
+    9   Other objects (page tree nodes, document info, etc.)
+    10  Main cross-reference table and trailer
+
+Objects in parts 7-9 are numbered from 1, in file order, and
+objects in parts 2-6 are numbered after those, so that each
+cross-reference table is a single contiguous section.
+
+The hint stream contains a page offset hint table and a shared
+object hint table.  Each object is its own shared object group,
+and the content stream fields of the page offset hint table
+duplicate the page fields, as is usual in practice.
+
+FormatLinearized takes the same parameters as FormatObjects,
+and is used by PdfWriter when it is created with linearize=True.
+'''
+
+from pdfrw.objects import PdfName, PdfArray, PdfDict, PdfObject, PdfString
+from pdfrw.pdfwriter import FormatObjects, format_array, objformatter, killswaps, shared_direct
+from pdfrw.errors import log
+
+# Fixed-width numbers used to size the parameter dictionary
+# and first-page trailer before the real values are known.
+_BIGNUM = 9999999999
+
+_SHARED = -1
+
+
+class _BitWriter(object):
+    ''' Bit-packed data for the hint tables.  Values are
+        written most significant bit first.
+    '''
+    def __init__(self):
+        self.data = []
+        self.acc = 0
+        self.nbits = 0
+
+    def write(self, value, nbits):
+        if not nbits:
+            return
+        self.acc = (self.acc << nbits) | value
+        self.nbits += nbits
+        data = self.data
+        while self.nbits >= 8:
+            self.nbits -= 8
+            data.append(chr((self.acc >> self.nbits) & 0xFF))
+        self.acc &= (1 << self.nbits) - 1
+
+    def writeall(self, values, nbits):
+        ''' Write a group of items, padded to a byte boundary
+        '''
+        for value in values:
+            self.write(value, nbits)
+        self.flush()
+
+    def flush(self):
+        if self.nbits:
+            self.write(0, 8 - self.nbits)
+
+    def tell(self):
+        return len(self.data)
+
+    def getvalue(self):
+        self.flush()
+        return ''.join(self.data)
+
+
+def _nbits(value):
+    return value and value.bit_length() or 0
+
+
+def FormatLinearized(f, trailer, version='1.3', compress=True, killobj=(),
+        id=id, isinstance=isinstance, getattr=getattr, len=len,
+        str=str, basestring=basestring, hasattr=hasattr, vars=vars,
+        list=list, dict=dict, tuple=tuple, PdfArray=PdfArray, PdfDict=PdfDict,
+        encode=PdfString.encode, format_array=format_array, promote=8):
+    ''' Write a linearized file.  Uses the same nested function
+        structure as FormatObjects, but finds all the objects
+        before numbering them, because the numbering depends
+        on which pages use which objects.
+    '''
+
+    pagetypes = PdfName.Page, PdfName.Pages
+
+    def isindirect(obj):
+        # Stream objects are always indirect, and so are the nodes
+        # of the page tree, which must be numbered even if the
+        # source file had them inline.
+        if isinstance(obj, PdfDict):
+            return (obj.indirect or (vars(obj).get('stream') is not None)
+                                 or id(obj) in promoted or obj.Type in pagetypes)
+        return getattr(obj, 'indirect', False) or id(obj) in promoted
+
+    def getindex(obj):
+        ''' Return the index of an indirect object, adding
+            it to the list of objects if it is new.
+        '''
+        objid = id(obj)
+        result = index_get(objid)
+        if result is None:
+            swapped = swapobj(objid)
+            if swapped is not None:
+                result = getindex(swapped)
+            else:
+                result = len(objects)
+                objects.append(obj)
+                refs.append(None)
+                pending.append(result)
+            index[objid] = result
+        return result
+
+    def scan(obj, myrefs):
+        ''' Find the indirect objects that obj refers to,
+            looking inside any direct objects.
+        '''
+        if isinstance(obj, (list, dict, tuple)):
+            if not isinstance(obj, (PdfArray, PdfDict)):
+                obj = (PdfArray, PdfDict)[isinstance(obj, dict)](obj)
+            if isinstance(obj, PdfDict):
+                obj = obj.itervalues()
+            for value in obj:
+                if isindirect(value):
+                    myrefs.append(getindex(value))
+                else:
+                    scan(value, myrefs)
+
+    def add(obj):
+        ''' Return a reference to an indirect object,
+            or the formatted direct object.
+        '''
+        if isindirect(obj):
+            return '%s 0 R' % objnums[getindex(obj)]
+        objid = id(obj)
+        if objid in visited:
+            log.warning('Replicating direct %s object, should be indirect for optimal file size' % type(obj))
+            obj = type(obj)(obj)
+            objid = id(obj)
+        visited.add(objid)
+        result = format_obj(obj)
+        visited.remove(objid)
+        return result
+
+    format_obj = objformatter(add, compress)
+
+    def readpages(node, result):
+        ''' Find the page objects, in order
+        '''
+        nodetype = node.Type
+        if nodetype == PdfName.Page:
+            result.append(getindex(node))
+        elif nodetype == PdfName.Pages:
+            for kid in node.Kids:
+                readpages(kid, result)
+        return result
+
+    # Find all the objects and what each one refers to.
+
+    objects = []
+    refs = []
+    index = {}
+    index_get = index.get
+    pending = []
+    swapobj = killswaps(trailer, killobj).get
+    promoted = promote and shared_direct(trailer, swapobj, promote) or ()
+
+    trailer_refs = []
+    scan(trailer, trailer_refs)
+    while pending:
+        objindex = pending.pop()
+        refs[objindex] = myrefs = []
+        scan(objects[objindex], myrefs)
+
+    catalog = getindex(trailer.Root)
+    pages = readpages(trailer.Root.Pages, [])
+    if not pages:
+        log.warning('Document has no pages -- not linearizing')
+        return FormatObjects(f, trailer, version, compress, killobj, promote=promote)
+
+    # Find the objects each page uses.  Don't wander from a
+    # page into the page tree, the catalog, or other pages.
+
+    stops = set(pages)
+    stops.add(catalog)
+    for objindex, obj in enumerate(objects):
+        if isinstance(obj, PdfDict) and obj.Type == PdfName.Pages:
+            stops.add(objindex)
+
+    owner = {}
+    pagerefs = []
+    for pagenum, pageindex in enumerate(pages):
+        seen = set([pageindex])
+        order = []
+        stack = [pageindex]
+        while stack:
+            for objindex in refs[stack.pop()]:
+                if objindex not in seen and objindex not in stops:
+                    seen.add(objindex)
+                    order.append(objindex)
+                    stack.append(objindex)
+        for objindex in order:
+            if owner.setdefault(objindex, pagenum) != pagenum:
+                owner[objindex] = _SHARED
+        pagerefs.append(order)
+
+    # Lay out the parts of the file
+
+    part4 = [catalog]
+    part6 = [pages[0]]
+    part6 += [x for x in pagerefs[0] if owner[x] == 0]
+    part6 += [x for x in pagerefs[0] if owner[x] == _SHARED]
+    part7 = []
+    pagegroups = [part6]
+    for pagenum in range(1, len(pages)):
+        group = [pages[pagenum]]
+        group += [x for x in pagerefs[pagenum] if owner[x] == pagenum]
+        pagegroups.append(group)
+        part7 += group
+    placed = set(part4 + part6 + part7)
+    part8 = []
+    for order in pagerefs[1:]:
+        for objindex in order:
+            if owner[objindex] == _SHARED and objindex not in placed:
+                placed.add(objindex)
+                part8.append(objindex)
+    part9 = [x for x in range(len(objects)) if x not in placed]
+
+    # Number the objects.  The main section is numbered from 1,
+    # and the first-page section follows it.
+
+    objnums = [None] * len(objects)
+    mainpart = part7 + part8 + part9
+    for objnum, objindex in enumerate(mainpart):
+        objnums[objindex] = objnum + 1
+    firstnum = len(mainpart) + 1
+    hintnum = firstnum + len(part4) + 1
+    for objnum, objindex in enumerate(part4):
+        objnums[objindex] = firstnum + 1 + objnum
+    for objnum, objindex in enumerate(part6):
+        objnums[objindex] = hintnum + 1 + objnum
+    size = hintnum + 1 + len(part6)
+
+    # Format all the objects
+
+    visited = set()
+    objstrs = [None] * len(objects)
+    for objindex, obj in enumerate(objects):
+        objstrs[objindex] = '%s 0 obj\n%s\nendobj\n' % (objnums[objindex], format_obj(obj))
+
+    # The first-page trailer gets everything in the real trailer,
+    # plus /Prev.  Its size, and the size of the parameter dictionary,
+    # are fixed now, so that the real values can be filled in later.
+
+    trailer.Size = PdfObject(size)
+    trailer.Prev = None
+    fptrailer = format_obj(trailer)
+    assert fptrailer.endswith('>>')
+    fptrailer = fptrailer[:-2] + ' /Prev '
+    fptrailer_len = len('%s%s>>' % (fptrailer, _BIGNUM))
+
+    lindict = '<</Linearized 1 /L %s /H [%s %s] /O %s /E %s /N %s /T %s>>'
+    lindict_len = len(lindict % ((_BIGNUM,) * 7))
+
+    def make_lindict(*values):
+        return '%s 0 obj\n%s\nendobj\n' % (firstnum, (lindict % values).ljust(lindict_len))
+
+    def make_fpxref(prev):
+        result = ['xref\n%s %s\n' % (firstnum, size - firstnum)]
+        result.extend('%010d 00000 n\r\n' % x for x in firstoffsets)
+        result.append('trailer\n%s\nstartxref\n0\n%%%%EOF\n' %
+                      ('%s%s>>' % (fptrailer, prev)).ljust(fptrailer_len))
+        return ''.join(result)
+
+    header = '%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n' % version
+    lindict_offset = len(header)
+    fpxref_offset = lindict_offset + len(make_lindict(*((0,) * 7)))
+    firstoffsets = [0] * (size - firstnum)
+    part4_offset = fpxref_offset + len(make_fpxref(0))
+
+    # Find the offset of every object, as if the hint stream were
+    # not there.  Those are the offsets the hint tables want.
+
+    offsets = [None] * len(objects)
+    offset = part4_offset
+    for objindex in part4:
+        offsets[objindex] = offset
+        offset += len(objstrs[objindex])
+    hint_offset = offset
+    for objindex in part6 + mainpart:
+        offsets[objindex] = offset
+        offset += len(objstrs[objindex])
+    mainxref_offset = offset
+
+    def grouplen(group):
+        return sum([len(objstrs[x]) for x in group])
+
+    # Page offset hint table
+
+    shared = part6 + part8
+    sharedids = dict((objindex, sharedid) for sharedid, objindex in enumerate(shared))
+    nobjects = [len(x) for x in pagegroups]
+    pagelens = [grouplen(x) for x in pagegroups]
+    # The first page's shared objects are all in part 6 with
+    # it, so they are not listed in its entry.
+    pageshared = [[sharedids[x] for x in order if owner[x] == _SHARED] for order in pagerefs]
+    pageshared[0] = []
+    min_nobjects = min(nobjects)
+    min_pagelen = min(pagelens)
+    nbits_nobjects = _nbits(max(nobjects) - min_nobjects)
+    nbits_pagelen = _nbits(max(pagelens) - min_pagelen)
+    nbits_nshared = _nbits(max([len(x) for x in pageshared]))
+    nbits_sharedid = _nbits(max(len(shared) - 1, 0))
+
+    hints = _BitWriter()
+    write = hints.write
+    write(min_nobjects, 32)
+    write(offsets[pages[0]], 32)
+    write(nbits_nobjects, 16)
+    write(min_pagelen, 32)
+    write(nbits_pagelen, 16)
+    write(0, 32)                # Least content stream offset
+    write(0, 16)                # Bits for content stream offset
+    write(min_pagelen, 32)      # Least content stream length
+    write(nbits_pagelen, 16)    # Bits for content stream length
+    write(nbits_nshared, 16)
+    write(nbits_sharedid, 16)
+    write(0, 16)                # Bits for fractional position numerator
+    write(1, 16)                # Fractional position denominator
+    hints.writeall([x - min_nobjects for x in nobjects], nbits_nobjects)
+    hints.writeall([x - min_pagelen for x in pagelens], nbits_pagelen)
+    hints.writeall([len(x) for x in pageshared], nbits_nshared)
+    hints.writeall([y for x in pageshared for y in x], nbits_sharedid)
+    hints.writeall([x - min_pagelen for x in pagelens], nbits_pagelen)
+
+    # Shared object hint table
+
+    shared_offset = hints.tell()
+    sharedlens = [len(objstrs[x]) for x in shared]
+    min_sharedlen = min(sharedlens)
+    nbits_sharedlen = _nbits(max(sharedlens) - min_sharedlen)
+    write(part8 and objnums[part8[0]] or 0, 32)
+    write(part8 and offsets[part8[0]] or 0, 32)
+    write(len(part6), 32)
+    write(len(shared), 32)
+    write(0, 16)                # Bits for number of objects in a group
+    write(min_sharedlen, 32)
+    write(nbits_sharedlen, 16)
+    hints.writeall([x - min_sharedlen for x in sharedlens], nbits_sharedlen)
+    hints.writeall([0] * len(shared), 1)     # No signatures
+
+    hintdata = hints.getvalue()
+    hintstr = '%s 0 obj\n<</Length %s /S %s>>\nstream\n%s\nendstream\nendobj\n' % (
+                    hintnum, len(hintdata), shared_offset, hintdata)
+    hint_len = len(hintstr)
+
+    # Now move everything after the hint stream to its real place
+
+    for objindex in part6 + mainpart:
+        offsets[objindex] += hint_len
+    mainxref_offset += hint_len
+    firstpage_end = offsets[part6[-1]] + len(objstrs[part6[-1]])
+
+    firstoffsets[0] = lindict_offset
+    for objindex in part4 + part6:
+        firstoffsets[objnums[objindex] - firstnum] = offsets[objindex]
+    firstoffsets[hintnum - firstnum] = hint_offset
+
+    mainxref = ['xref\n0 %s\n' % firstnum, '0000000000 65535 f\r\n']
+    mainxref.extend('%010d 00000 n\r\n' % offsets[x] for x in mainpart)
+    mainxref.append('trailer\n<</Size %s>>\nstartxref\n%s\n%%%%EOF\n' % (firstnum, fpxref_offset))
+    mainxref = ''.join(mainxref)
+    filelen = mainxref_offset + len(mainxref)
+
+    f_write = f.write
+    f_write(header)
+    f_write(make_lindict(filelen, hint_offset, hint_len, objnums[pages[0]],
+                         firstpage_end, len(pages),
+                         mainxref_offset + len('xref\n0 %s' % firstnum)))
+    f_write(make_fpxref(mainxref_offset))
+    for objindex in part4:
+        f_write(objstrs[objindex])
+    f_write(hintstr)
+    for objindex in part6 + mainpart:
+        f_write(objstrs[objindex])
+    f_write(mainxref)
@@ -5,55 +5,125 @@
 from pdfrw.objects.pdfindirect import PdfIndirect
 from pdfrw.objects.pdfobject import PdfObject
 
-def _resolved():
-    pass
-
 class PdfArray(list):
     ''' A PdfArray maps the PDF file array object into a Python list.
         It has an indirect attribute which defaults to False.
+
+        Placeholders for indirect objects in the array are resolved
+        one at a time, as they are indexed or iterated over, so looking
+        at one element of a large /Kids or /Annots array only reads
+        that one object in.  resolve() reads in all of them at once.
+
+        Arrays that cannot hold placeholders use the class _resolved
+        flag, so they never need an attribute dictionary.
     '''
     indirect = False
+    _resolved = True
+    _floats = None
 
-    def __init__(self, source=[]):
-        self._resolve = self._resolver
+    def __init__(self, source=[], isinstance=isinstance):
         self.extend(source)
+        if source and not isinstance(source, PdfArray):
+            self._resolved = False
+
+    def _resolveone(self, index, value, PdfNull=PdfObject('null'),
+                          setitem=list.__setitem__):
+        ''' Return the object for the placeholder at index, and
+            replace the placeholder with it, unless the placeholder's
+            reader wants to be able to unload the object again.
+        '''
+        replace = value._replace
+        value = value.real_value()
+        if value is None:
+            value = PdfNull
+        if replace:
+            setitem(self, index, value)
+        return value
+
+    def resolve(self, isinstance=isinstance, enumerate=enumerate,
+                      listiter=list.__iter__, PdfIndirect=PdfIndirect):
+        ''' Resolve all the placeholders in the array, reading
+            the objects in the order they appear in the file.
+        '''
+        if self._resolved:
+            return
+        pending = [(value.offset(), index, value)
+                        for index, value in enumerate(listiter(self))
+                        if isinstance(value, PdfIndirect)]
+        pending.sort()
+        resolveone = self._resolveone
+        resolved = True
+        for offset, index, value in pending:
+            resolved = resolved and value._replace
+            resolveone(index, value)
+        self._resolved = resolved
 
-    def _resolver(self, isinstance=isinstance, enumerate=enumerate,
-                        listiter=list.__iter__,
-                        PdfIndirect=PdfIndirect, resolved=_resolved,
-                        PdfNull=PdfObject('null')):
-        for index, value in enumerate(list.__iter__(self)):
-                if isinstance(value, PdfIndirect):
-                    value = value.real_value()
-                    if value is None:
-                        value = PdfNull
-                    self[index] = value
-        self._resolve = resolved
-
-    def __getitem__(self, index, listget=list.__getitem__):
-        self._resolve()
-        return listget(self, index)
-
-    def __getslice__(self, index, listget=list.__getslice__):
-        self._resolve()
-        return listget(self, index)
+    def _iterresolve(self, isinstance=isinstance, enumerate=enumerate,
+                           listiter=list.__iter__, PdfIndirect=PdfIndirect):
+        resolveone = self._resolveone
+        resolved = True
+        for index, value in enumerate(listiter(self)):
+            if isinstance(value, PdfIndirect):
+                resolved = resolved and value._replace
+                value = resolveone(index, value)
+            yield value
+        self._resolved = resolved
+
+    def floats(self, tuple=tuple, float=float, getattr=getattr,
+                     listiter=list.__iter__):
+        ''' Return the contents of the array (e.g. a /MediaBox or
+            a /Matrix) as a tuple of floats.  The result is cached
+            on the array, and only recomputed if the array changes.
+        '''
+        items = tuple(self._resolved and listiter(self) or self)
+        cached = self._floats
+        if cached is not None and cached[0] == items:
+            return cached[1]
+        result = tuple([float(getattr(x, 'number', x)) for x in items])
+        self._floats = items, result
+        return result
+
+    def _values(self):
+        ''' Return a list with all the placeholders resolved
+            (the array itself, if possible).
+        '''
+        self.resolve()
+        return self._resolved and self or list(self)
+
+    def __getitem__(self, index, listget=list.__getitem__,
+                          isinstance=isinstance, PdfIndirect=PdfIndirect,
+                          slice=slice, xrange=xrange):
+        value = listget(self, index)
+        if not self._resolved:
+            if isinstance(value, PdfIndirect):
+                value = self._resolveone(index, value)
+            elif isinstance(index, slice):
+                value = [self[item] for item in xrange(*index.indices(len(self)))]
+        return value
+
+    def __getslice__(self, i, j, listget=list.__getslice__, xrange=xrange):
+        if self._resolved:
+            return listget(self, i, j)
+        return [self[index] for index in xrange(max(i, 0), min(j, len(self)))]
 
     def __iter__(self, listiter=list.__iter__):
-        self._resolve()
-        return listiter(self)
+        if self._resolved:
+            return listiter(self)
+        return self._iterresolve()
+
+    def pop(self, index=-1):
+        value = self[index]
+        list.pop(self, index)
+        return value
 
     def count(self, item):
-        self._resolve()
-        return list.count(self, item)
+        return list.count(self._values(), item)
     def index(self, item):
-        self._resolve()
-        return list.index(self, item)
+        return list.index(self._values(), item)
     def remove(self, item):
-        self._resolve()
-        return list.remove(self, item)
+        del self[self.index(item)]
     def sort(self, *args, **kw):
-        self._resolve()
-        return list.sort(self, *args, **kw)
-    def pop(self, *args):
-        self._resolve()
-        return list.pop(self, *args)
+        values = self._values()
+        list.sort(values, *args, **kw)
+        if values is not self:
+            self[:] = values
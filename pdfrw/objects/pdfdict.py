@@ -8,12 +8,30 @@ from pdfrw.objects.pdfobject import PdfObject
 
 class _DictSearch(object):
     '''  Used to search for inheritable attributes.
+
+         The standard inheritable page attributes are cached
+         on each /Pages node the first time they are looked up,
+         so looking them up for a lot of pages under the same
+         node does not walk the tree again.  The caches are
+         stamped with a global generation count, and stale
+         caches are rebuilt on their next use.  Every node that
+         a cached value was looked up through has a cache too,
+         so the count only has to be bumped when one of these
+         attributes or a /Parent is changed on a dictionary that
+         has a cache:  new dictionaries, pages, and nodes that
+         have not been searched yet can be changed for free.
     '''
+    generation = 0
+    cached = set([PdfName.Resources, PdfName.MediaBox,
+                  PdfName.CropBox, PdfName.Rotate])
+
     def __init__(self, basedict):
         self.basedict = basedict
     def __getattr__(self, name, PdfName=PdfName):
         return self[PdfName(name)]
     def __getitem__(self, name, set=set, getattr=getattr, id=id):
+        if name in self.cached:
+            return self.cachedget(name)
         visited = set()
         mydict = self.basedict
         while 1:
@@ -27,6 +45,36 @@ class _DictSearch(object):
             if mydict is None:
                 return
 
+    def cachedget(self, name, set=set, id=id, vars=vars):
+        mydict = self.basedict
+        value = mydict[name]
+        if value is not None:
+            return value
+        generation = self.generation
+        visited = set([id(mydict)])
+        walked = []
+        while 1:
+            mydict = mydict.Parent
+            if mydict is None:
+                break
+            myid = id(mydict)
+            assert myid not in visited
+            visited.add(myid)
+            cache = vars(mydict).get('_inherited')
+            if cache is None or cache[0] != generation:
+                cache = vars(mydict)['_inherited'] = generation, {}
+            cache = cache[1]
+            if name in cache:
+                value = cache[name]
+                break
+            walked.append(cache)
+            value = mydict[name]
+            if value is not None:
+                break
+        for cache in walked:
+            cache[name] = value
+        return value
+
 class _Private(object):
     ''' Used to store private attributes (not output to PDF files)
         on PdfDict classes
@@ -74,6 +122,9 @@ class PdfDict(dict):
               and will also update the stream length.
             - _stream will store in the object's attribute dictionary without
               updating the stream length.
+            - The stream data may be stored in a file instead of in
+              memory (see pdfrw.spill).  Reading the stream attribute
+              always returns the data itself.
 
             It is possible, for example, to have a PDF name such as "/indirect"
             or "/stream", but you cannot access such a name as an attribute:
@@ -82,20 +133,57 @@ class PdfDict(dict):
                 mydict["/indirect"] -- accesses actual PDF dictionary
     '''
     indirect = False
-    stream = None
 
     _special = dict(indirect = ('indirect', False),
                     stream = ('stream', True),
                     _stream = ('stream', False),
                    )
 
-    def __setitem__(self, name, value, setter=dict.__setitem__):
+    # Changing any of these on a node with a cache (see
+    # _DictSearch) invalidates cached inheritable attributes
+    _invalidates = _DictSearch.cached | set([PdfName.Parent])
+
+    def __setitem__(self, name, value, setter=dict.__setitem__,
+                          invalidates=_invalidates, search=_DictSearch, vars=vars):
         assert name.startswith('/'), name
+        if name in invalidates and '_inherited' in vars(self):
+            search.generation += 1
         if value is not None:
             setter(self, name, value)
         elif name in self:
             del self[name]
 
+    def __delitem__(self, name, deleter=dict.__delitem__,
+                          invalidates=_invalidates, search=_DictSearch, vars=vars):
+        if name in invalidates and '_inherited' in vars(self):
+            search.generation += 1
+        deleter(self, name)
+
+    def _invalidate(self, vars=vars):
+        ''' Invalidate cached inheritable attributes if this
+            node has a cache and holds any of the attributes.
+            Used by the methods that change several items at once.
+        '''
+        if '_inherited' in vars(self):
+            for name in self._invalidates:
+                if name in self:
+                    _DictSearch.generation += 1
+                    break
+
+    def update(self, *args, **kw):
+        dict.update(self, *args, **kw)
+        self._invalidate()
+
+    def clear(self):
+        self._invalidate()
+        dict.clear(self)
+
+    def setdefault(self, key, value=None):
+        result = self.get(key)
+        if result is None:
+            self[key] = result = value
+        return result
+
     def __init__(self, *args, **kw):
         if args:
             if len(args) == 1:
@@ -103,7 +191,7 @@ class PdfDict(dict):
             self.update(args)
             if isinstance(args, PdfDict):
                 self.indirect = args.indirect
-                self._stream = args.stream
+                self._stream = vars(args).get('stream')
         for key, value in kw.iteritems():
             setattr(self, key, value)
 
@@ -114,12 +202,29 @@ class PdfDict(dict):
         '''
         return self.get(PdfName(name))
 
+    def _resolveitem(self, key, value, setter=dict.__setitem__, deleter=dict.__delitem__):
+        ''' Replace a placeholder with the object it stands
+            for.  This is not a change to the dictionary, so
+            it does not invalidate any cached attributes.
+            (The placeholder is kept if its reader may want
+            to unload the object again.)
+        '''
+        replace = value._replace
+        value = value.real_value()
+        if not replace:
+            pass
+        elif value is not None:
+            setter(self, key, value)
+        else:
+            deleter(self, key)
+        return value
+
     def get(self, key, dictget=dict.get, isinstance=isinstance, PdfIndirect=PdfIndirect):
         ''' Get a value out of the dictionary, after resolving any indirect objects.
         '''
         value = dictget(self, key)
         if isinstance(value, PdfIndirect):
-            self[key] = value = value.real_value()
+            value = self._resolveitem(key, value)
         return value
 
     def __getitem__(self, key):
@@ -144,7 +249,7 @@ class PdfDict(dict):
         '''
         for key, value in list(dictiter(self)):
             if isinstance(value, PdfIndirect):
-                self[key] = value = value.real_value()
+                value = self._resolveitem(key, value)
             if value is not None:
                 assert key.startswith('/'), (key, value)
                 yield key, value
@@ -167,16 +272,20 @@ class PdfDict(dict):
     def copy(self):
         return type(self)(self)
 
-    def pop(self, key):
+    def pop(self, key, *default):
+        if default and key not in self:
+            return default[0]
         value = self.get(key)
         del self[key]
         return value
 
-    def popitem(self):
-        key, value = dict.pop(self)
+    def popitem(self, invalidates=_invalidates, search=_DictSearch, vars=vars):
+        key, value = dict.popitem(self)
+        if key in invalidates and '_inherited' in vars(self):
+            search.generation += 1
         if isinstance(value, PdfIndirect):
             value = value.real_value()
-        return value
+        return key, value
 
     def inheritable(self):
         ''' Search through ancestors as needed for inheritable
@@ -184,11 +293,33 @@ class PdfDict(dict):
             NOTE:  You might think it would be a good idea
             to cache this class, but then you'd have to worry
             about it pointing to the wrong dictionary if you
-            made a copy of the object...
+            made a copy of the object...  (The values of the
+            standard page attributes are cached on the /Pages
+            nodes instead.)
         '''
         return _DictSearch(self)
     inheritable = property(inheritable)
 
+    def stream(self, vars=vars, basestring=basestring):
+        ''' Return the stream data, reading it back in
+            if it has been spilled to disk.
+        '''
+        value = vars(self).get('stream')
+        if value is None or isinstance(value, basestring):
+            return value
+        return value.read()
+    stream = property(stream)
+
+    def decoded(self):
+        ''' Return the stream data with its filters undone
+            (or None if that can't be done), without changing
+            the stream, so it is still written out encoded.
+            Results are cached in pdfrw.uncompress.decodecache.
+        '''
+        from pdfrw.uncompress import decodecache
+        return decodecache.get(self)
+    decoded = property(decoded)
+
     def private(self):
         ''' Allows setting private metadata for use in
             processing (not sent to PDF file).
@@ -2,19 +2,28 @@
 # Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
 # MIT license -- See LICENSE.txt for details
 
-class _NotLoaded(object):
-    pass
-
 class PdfIndirect(tuple):
     ''' A placeholder for an object that hasn't been read in yet.
         The object itself is the (object number, generation number) tuple.
-        The attributes include information about where the object is
-        referenced from and the file object to retrieve the real object from.
+
+        Placeholders have no per-instance attributes.  Each reader
+        makes its own subclass, with a _loader class attribute that
+        is called with the placeholder and returns the real object
+        (reading it in the first time it is asked for), and a
+        _locator class attribute that returns the object's
+        offset in the file.  If the _replace class attribute is
+        false, containers keep the placeholder instead of replacing
+        it with the real object, so the reader can unload the
+        object and read it in again later.
     '''
-    value = _NotLoaded
+    __slots__ = ()
+    _replace = True
+
+    def real_value(self):
+        return self._loader(self)
 
-    def real_value(self, NotLoaded=_NotLoaded):
-        value = self.value
-        if value is NotLoaded:
-            value = self.value = self._loader(self)
-        return value
+    def offset(self):
+        ''' Return the file offset of the object (0 if unknown),
+            so that several objects can be read in file order.
+        '''
+        return self._locator(self)
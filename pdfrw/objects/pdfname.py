@@ -4,14 +4,47 @@
 
 from pdfrw.objects.pdfobject import PdfObject
 
+# The shared name objects, keyed by their strings (including
+# the leading '/').  Names come from files as well as from
+# code, so the table stops growing at maxinterned names, and
+# after that new names are not shared.
+interned = {}
+maxinterned = 1 << 16
+
+def intern(name, cache=None, get=interned.get, len=len, PdfObject=PdfObject):
+    ''' Return the name object for name (which includes the
+        leading '/').  Once the table is full, new names are
+        kept in cache instead, if one is given.
+    '''
+    result = get(name)
+    if result is None:
+        if len(interned) < maxinterned:
+            cache = interned
+        elif cache is None:
+            return PdfObject(name)
+        result = cache.get(name)
+        if result is None:
+            result = cache[name] = PdfObject(name)
+    return result
+
 class PdfName(object):
     ''' PdfName is a simple way to get a PDF name from a string:
 
                 PdfName.FooBar == PdfObject('/FooBar')
+
+        Names are interned, so PdfName.FooBar, PdfName('FooBar')
+        and every /FooBar read by the tokenizer are usually the
+        same object.  (Names written with # escapes in a file,
+        and new names once the table is full, are not, so always
+        compare names with ==.)  The result of attribute access
+        is remembered on the instance, so the second
+        PdfName.FooBar is a plain attribute lookup.
     '''
     def __getattr__(self, name):
-        return self(name)
-    def __call__(self, name, PdfObject=PdfObject):
-        return PdfObject('/' + name)
+        result = self(name)
+        if interned.get(result) is result:
+            vars(self)[name] = result
+        return result
+    def __call__(self, name, intern=intern):
+        return intern('/' + name)
 PdfName = PdfName()
-
@@ -2,9 +2,32 @@
 # Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
 # MIT license -- See LICENSE.txt for details
 
+class _LazyNumber(object):
+    ''' Parses a numeric PdfObject the first time its number
+        attribute is asked for, and stores the result on the
+        object, where it hides this descriptor.
+    '''
+    def __get__(self, obj, cls, int=int, float=float, vars=vars):
+        if obj is None:
+            return self
+        try:
+            value = int(obj)
+        except ValueError:
+            value = float(obj)
+        vars(obj)['number'] = value
+        return value
+
 class PdfObject(str):
     ''' A PdfObject is a textual representation of any PDF file object
         other than an array, dict or string. It has an indirect attribute
         which defaults to False.
+
+        If the object is a number, its number attribute is the int or
+        float value.  This is only computed once per object, so it is
+        cheaper than calling int() or float() on the object every time
+        it is used.  (The tokenizer shares number objects only within
+        one run of tokens -- usually a single indirect object -- so
+        the same number elsewhere in a file is a different object.)
     '''
     indirect = False
+    number = _LazyNumber()
@@ -3,6 +3,45 @@
 # MIT license -- See LICENSE.txt for details
 
 import re
+import sys
+import codecs
+import binascii
+from array import array
+
+def _unescape_dict():
+    ''' Build a dictionary mapping every possible escape
+        sequence inside a literal string to its value.
+    '''
+    # A backslash before any other character is ignored
+    result = dict(('\\' + chr(x), chr(x)) for x in range(256))
+    result.update({'\\b':'\b', '\\f':'\f', '\\n':'\n',
+                   '\\r':'\r', '\\t':'\t',
+                   '\\\r\n': '', '\\\r':'', '\\\n':'',
+                   '\\':'',
+                  })
+    # Octal escapes of 1 to 3 digits.  High-order overflow is ignored.
+    for x in range(512):
+        octal = '%o' % x
+        for digits in range(len(octal), 4):
+            result['\\' + octal.zfill(digits)] = chr(x & 0xFF)
+    return result
+
+# PDFDocEncoding is Latin-1, except for these codes.  (Undefined
+# codes are mapped to the replacement character.)
+_pdfdoc_differences = {
+    0x18: 0x02D8, 0x19: 0x02C7, 0x1A: 0x02C6, 0x1B: 0x02D9,
+    0x1C: 0x02DD, 0x1D: 0x02DB, 0x1E: 0x02DA, 0x1F: 0x02DC,
+    0x7F: 0xFFFD,
+    0x80: 0x2022, 0x81: 0x2020, 0x82: 0x2021, 0x83: 0x2026,
+    0x84: 0x2014, 0x85: 0x2013, 0x86: 0x0192, 0x87: 0x2044,
+    0x88: 0x2039, 0x89: 0x203A, 0x8A: 0x2212, 0x8B: 0x2030,
+    0x8C: 0x201E, 0x8D: 0x201C, 0x8E: 0x201D, 0x8F: 0x2018,
+    0x90: 0x2019, 0x91: 0x201A, 0x92: 0x2122, 0x93: 0xFB01,
+    0x94: 0xFB02, 0x95: 0x0141, 0x96: 0x0152, 0x97: 0x0160,
+    0x98: 0x0178, 0x99: 0x017D, 0x9A: 0x0131, 0x9B: 0x0142,
+    0x9C: 0x0153, 0x9D: 0x0161, 0x9E: 0x017E, 0x9F: 0xFFFD,
+    0xA0: 0x20AC, 0xAD: 0xFFFD,
+}
 
 class PdfString(str):
     ''' A PdfString is an encoded string.  It has a decode
@@ -10,48 +49,50 @@ class PdfString(str):
         is an encode class method to create such a string.
         Like any PDF object, it could be indirect, but it
         defaults to being a direct object.
+
+        to_unicode() decodes a PDF text string (such as the
+        document /Title) to unicode, using the byte order mark
+        to recognize UTF-16, and PDFDocEncoding otherwise.
     '''
     indirect = False
-    unescape_dict = {'\\b':'\b', '\\f':'\f', '\\n':'\n',
-                     '\\r':'\r', '\\t':'\t',
-                     '\\\r\n': '', '\\\r':'', '\\\n':'',
-                     '\\\\':'\\', '\\':'',
-                    }
-    unescape_pattern = r'(\\\\|\\b|\\f|\\n|\\r|\\t|\\\r\n|\\\r|\\\n|\\[0-9]+|\\)'
-    unescape_func = re.compile(unescape_pattern).split
+    unescape_dict = _unescape_dict()
+    unescape_split = re.compile(r'(\\(?:[0-7]{1,3}|\r\n|.)?)', re.DOTALL).split
+    octal_match = re.compile(r'\\[0-7]').match
 
-    hex_pattern = '([a-fA-F0-9][a-fA-F0-9]|[a-fA-F0-9])'
-    hex_func = re.compile(hex_pattern).split
-
-    hex_pattern2 = '([a-fA-F0-9][a-fA-F0-9][a-fA-F0-9][a-fA-F0-9]|[a-fA-F0-9][a-fA-F0-9]|[a-fA-F0-9])'
-    hex_func2 = re.compile(hex_pattern2).split
-
-    hex_funcs = hex_func, hex_func2
+    pdfdoc_table = u''.join(unichr(_pdfdoc_differences.get(x, x)) for x in range(256))
 
     def decode_regular(self, remap=chr):
         assert self[0] == '(' and self[-1] == ')'
-        mylist = self.unescape_func(self[1:-1])
-        result = []
-        unescape = self.unescape_dict.get
-        for chunk in mylist:
-            chunk = unescape(chunk, chunk)
-            if chunk.startswith('\\') and len(chunk) > 1:
-                value = int(chunk[1:], 8)
-                # FIXME: TODO: Handle unicode here
-                if value > 127:
-                    value = 127
-                chunk = remap(value)
-            if chunk:
-                result.append(chunk)
-        return ''.join(result)
+        data = self[1:-1]
+        if '\\' not in data:
+            return data
+        unescape = self.unescape_dict.__getitem__
+        data = self.unescape_split(data)
+        escapes = data[1::2]
+        if remap is chr:
+            data[1::2] = map(unescape, escapes)
+        else:
+            octal = self.octal_match
+            data[1::2] = [octal(x) and remap(ord(unescape(x))) or unescape(x)
+                            for x in escapes]
+        return ''.join(data)
 
-    def decode_hex(self, remap=chr, twobytes=False):
-        data = ''.join(self.split())
-        data = self.hex_funcs[twobytes](data)
-        chars = data[1::2]
-        other = data[0::2]
-        assert other[0] == '<' and other[-1] == '>' and ''.join(other) == '<>', self
-        return ''.join([remap(int(x, 16)) for x in chars])
+    def decode_hex(self, remap=chr, twobytes=False, unhexlify=binascii.unhexlify):
+        assert self[0] == '<' and self[-1] == '>', self
+        data = ''.join(self[1:-1].split())
+        if len(data) & 1:
+            # Missing final digit is assumed to be zero
+            data += '0'
+        data = unhexlify(data)
+        if not twobytes:
+            if remap is chr:
+                return data
+            return ''.join([remap(x) for x in bytearray(data)])
+        codes = array('B', data[-1:] * (len(data) & 1))
+        data = array('H', data[:len(data) & ~1])
+        if sys.byteorder == 'little':
+            data.byteswap()
+        return ''.join([remap(x) for x in data]) + ''.join([remap(x) for x in codes])
 
     def decode(self, remap=chr, twobytes=False):
         if self.startswith('('):
@@ -60,12 +101,25 @@ class PdfString(str):
         else:
             return self.decode_hex(remap, twobytes)
 
-    def encode(cls, source, usehex=False):
-        assert not usehex, "Not supported yet"
+    def to_unicode(self, charmap_decode=codecs.charmap_decode):
+        ''' Decode a PDF text string to unicode.
+        '''
+        data = self.decode()
+        if data[:2] == '\xfe\xff':
+            return data[2:].decode('utf-16-be', 'replace')
+        if data[:2] == '\xff\xfe':
+            return data[2:].decode('utf-16-le', 'replace')
+        if data[:3] == '\xef\xbb\xbf':
+            return data[3:].decode('utf-8', 'replace')
+        return charmap_decode(data, 'strict', self.pdfdoc_table)[0]
+
+    def encode(cls, source, usehex=False, hexlify=binascii.hexlify):
         if isinstance(source, unicode):
             source = source.encode('utf-8')
         else:
             source = str(source)
+        if usehex:
+            return cls('<' + hexlify(source) + '>')
         source = source.replace('\\', '\\\\')
         source = source.replace('(', '\\(')
         source = source.replace(')', '\\)')
@@ -0,0 +1,176 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Put a Form XObject (usually a whole page, from pagexobj()) over
+or under pages, as a watermark, letterhead, stamp, and so on:
+
+    stamp = pagexobj(PdfReader('watermark.pdf').pages[0])
+    pages = PdfReader('my.pdf').pages
+    PdfWriter().addpages(Overlay(stamp).apply(pages)).write('out.pdf')
+
+Over a page, the page's own content is bracketed by q and Q (so
+that nothing it leaves in the graphics state changes the stamp),
+and the stamp is drawn after it.  Under a page, the stamp is
+drawn first.  The streams added to the /Contents of the pages
+are shared:  there is one q stream, and one stamp stream for each
+name the stamp gets, however many pages there are.
+
+The stamp is added to a copy of the resources of each page, made
+once for each distinct resource dictionary, so pages that share
+resources still share them afterwards, and the source document
+is not changed.  The stamp is given the same name (by default
+/Overlay) everywhere it can be.  If that name is already taken, the
+next one (/Overlay.1, and so on) is tried, and kept for the rest
+of the pages, so there is no search through the used names.
+
+overlayfile() does this to a file, and writes the result with a
+PdfStreamWriter, page by page.  That keeps the /Info of the document,
+but not the rest of its catalog (outlines, forms and so on); with
+stream=False, the whole document is written with a PdfWriter instead.
+overlayfiles() does it to many files, using a pool of processes.
+Those two take the stamp as a name in the form used by CacheXObj
+(e.g. 'letterhead.pdf#page=2'), and load it once in each process.
+'''
+
+import os
+
+from pdfrw.objects import PdfDict, PdfArray, IndirectPdfDict
+from pdfrw.pdfreader import PdfReader
+from pdfrw.pdfwriter import PdfWriter
+from pdfrw.streamwriter import PdfStreamWriter
+from pdfrw.buildxobj import CacheXObj
+from pdfrw.util import mapfiles
+
+
+class Overlay(object):
+    ''' Draw xobj over (or, if underneath is true, under) pages.
+        If matrix is given, it is concatenated to the CTM before
+        the stamp is drawn, to move or scale it.
+    '''
+
+    def __init__(self, xobj, underneath=False, matrix=None, prefix='/Overlay'):
+        self.xobj = xobj
+        self.underneath = underneath
+        self.prefix = prefix
+        self.index = 0
+        self.begin = IndirectPdfDict(stream='q\n')
+        self.streams = {}
+        if matrix is not None:
+            matrix = 'q %s cm %%s Do Q\n' % ' '.join(str(x) for x in matrix)
+        else:
+            matrix = '%s Do\n'
+        self.drawfmt = underneath and matrix or 'Q ' + matrix
+
+    def name(self, xobjdict):
+        ''' Return the name to use for the stamp in a
+            resource dictionary.
+        '''
+        xobj = self.xobj
+        xobjdict = xobjdict or {}
+        while 1:
+            index = self.index
+            name = index and '%s.%d' % (self.prefix, index) or self.prefix
+            used = xobjdict.get(name)
+            if used is None or used is xobj:
+                return name
+            self.index = index + 1
+
+    def resources(self, resources):
+        ''' Return a copy of a resource dictionary with the
+            stamp added to it, and the stamp's name.
+        '''
+        xobjdict = resources is not None and resources.XObject or None
+        name = self.name(xobjdict)
+        xobjdict = PdfDict(xobjdict or ())
+        xobjdict[name] = self.xobj
+        resources = IndirectPdfDict(resources or (), XObject=xobjdict)
+        # Copying a direct dictionary copies its indirect flag too,
+        # but the copy is shared, so it must be written once.
+        resources.indirect = True
+        return resources, name
+
+    def draw(self, name):
+        ''' Return the (shared) stream that draws the stamp.
+        '''
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = self.streams[name] = IndirectPdfDict(stream=self.drawfmt % name)
+        return stream
+
+    def apply(self, pages, pagenums=None, isinstance=isinstance, id=id):
+        ''' Yield the pages after putting the stamp on them
+            (or on the ones whose 1-based page numbers are in
+            pagenums).  The pages are changed in place.
+        '''
+        copies = {}
+        for pagenum, page in enumerate(pages, 1):
+            if pagenums is None or pagenum in pagenums:
+                resources = page.inheritable.Resources
+                info = copies.get(id(resources))
+                if info is None:
+                    # Keep the original, so that its id is not reused
+                    info = copies[id(resources)] = self.resources(resources) + (resources,)
+                page.Resources, name = info[:2]
+                contents = page.Contents
+                if contents is None:
+                    contents = []
+                elif not isinstance(contents, PdfArray):
+                    contents = [contents]
+                if self.underneath:
+                    contents = [self.draw(name)] + contents
+                else:
+                    contents = [self.begin] + contents + [self.draw(name)]
+                page.Contents = PdfArray(contents)
+            yield page
+
+
+# One CacheXObj for each process
+_stamps = CacheXObj()
+
+
+def overlayfile(inname, outname, stamp, underneath=False, pagenums=None,
+                matrix=None, compress=False, cachesize=None, stream=True):
+    ''' Put a stamp (a name for CacheXObj.load()) over the pages
+        of the file inname, and write them to outname.  Return the
+        number of pages.
+
+        By default, the pages are written out with a PdfStreamWriter
+        as they are done, and only the pages and the document /Info
+        are kept:  the rest of the catalog (outlines, forms, page
+        labels and so on) is dropped.  If stream is false, the whole
+        document is read in, and written out with a PdfWriter,
+        catalog and all.
+    '''
+    xobj = _stamps.load(stamp)
+    overlay = Overlay(xobj, underneath, matrix)
+    with PdfReader(inname, cachesize=cachesize) as reader:
+        if not stream:
+            for page in overlay.apply(reader.pages, pagenums):
+                pass
+            PdfWriter(compress=compress).write(outname, reader)
+            return len(reader.pages)
+        writer = PdfStreamWriter(outname, compress=compress)
+        writer.addpages(overlay.apply(reader.iterpages(), pagenums))
+        writer.info = reader.Info
+        writer.close()
+        return len(reader.pages)
+
+
+def _overlayfile(inname, outdir, kw):
+    return overlayfile(inname, os.path.join(outdir, os.path.basename(inname)), **kw)
+
+
+def overlayfiles(fnames, outdir, stamp, workers=None, **kw):
+    ''' Put a stamp on each file in a list of files (or on all the
+        .pdf files in a directory), writing files of the same names
+        into outdir.  Yield (fname, number of pages) in order,
+        using a pool of worker processes (default: one per CPU).
+        The number of pages is None for files that failed.  Other
+        keyword arguments are passed to overlayfile().
+    '''
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    kw['stamp'] = stamp
+    return mapfiles(_overlayfile, fnames, workers, (outdir, kw))
@@ -10,36 +10,57 @@ document pages are stored in a list in the pages attribute
 of the object.
 '''
 import gc
+import re
+import weakref
+import operator
+from collections import OrderedDict
 
-from pdfrw.errors import PdfParseError, log
+from pdfrw.errors import PdfError, PdfParseError, log
 from pdfrw.tokens import PdfTokens
 from pdfrw.objects import PdfDict, PdfArray, PdfName, PdfObject, PdfIndirect
 from pdfrw.uncompress import uncompress
 
+def _closedloader(key):
+    raise PdfError('Cannot read in object %s -- the PdfReader has been closed' % (key,))
+
+def _closedlocator(key):
+    return 0
+
 class PdfReader(PdfDict):
 
     warned_bad_stream_start = False  # Use to keep from spewing warnings
     warned_bad_stream_end = False  # Use to keep from spewing warnings
 
-    def findindirect(self, objnum, gennum, PdfIndirect=PdfIndirect, int=int):
+    loaded = None  # Replaced with a weak dictionary if cachesize is given
+    source = None  # Tokenizer for the file data, until close()
+    span_class = None  # Placeholder class for lazily parsed containers
+    lazysize = None  # Minimum size of a lazily parsed dictionary or array
+    decompressed = None  # (spill,) if streams are decompressed as they are read in
+
+    # Things that can nest or hide brackets, outside and inside literal strings
+    findbracket = re.compile(r'<<|>>|[\[\]()]|%[^\r\n]*|<[0-9A-Fa-f\s]*>').search
+    findparen = re.compile(r'\\[\s\S]|[()]').search
+
+    def findindirect(self, objnum, gennum, int=int):
         ''' Return a previously loaded indirect object, or create
             a placeholder for it.
         '''
         key = int(objnum), int(gennum)
         result = self.indirect_objects.get(key)
         if result is None:
-            self.indirect_objects[key] = result = PdfIndirect(key)
+            self.indirect_objects[key] = result = self.indirect_class(key)
             self.deferred_objects.add(key)
-            result._loader = self.loadindirect
         return result
 
-    def readarray(self, source, PdfArray=PdfArray):
+    def readarray(self, source, PdfArray=PdfArray, isinstance=isinstance,
+                        PdfIndirect=PdfIndirect):
         ''' Found a [ token.  Parse the tokens after that.
         '''
         specialget = self.special.get
         result = []
         pop = result.pop
         append = result.append
+        indirect = False
 
         for value in source:
             if value in ']R':
@@ -47,14 +68,22 @@ class PdfReader(PdfDict):
                     break
                 generation = pop()
                 value = self.findindirect(pop(), generation)
+                indirect = True
             else:
                 func = specialget(value)
                 if func is not None:
                     value = func(source)
+                    if isinstance(value, PdfIndirect):
+                        # Lazily parsed array or dictionary
+                        indirect = True
             append(value)
-        return PdfArray(result)
+        array = PdfArray()
+        array.extend(result)
+        if indirect:
+            array._resolved = False
+        return array
 
-    def readdict(self, source, PdfDict=PdfDict):
+    def readdict(self, source, PdfDict=PdfDict, setitem=dict.__setitem__):
         ''' Found a << token.  Parse the tokens after that.
         '''
         specialget = self.special.get
@@ -78,7 +107,9 @@ class PdfReader(PdfDict):
                         source.exception('Expected "R" following two integers')
                     value = self.findindirect(value, tok)
                     tok = next()
-            result[key] = value
+            # A brand new dictionary can't have cached
+            # inheritable attributes depending on it.
+            setitem(result, key, value)
         return result
 
     def empty_obj(self, source, PdfObject=PdfObject):
@@ -87,6 +118,113 @@ class PdfReader(PdfDict):
         '''
         source.floc = source.tokstart
 
+    def matchend(self, fdata, start, end):
+        ''' Return the location just past the ] or >> that matches
+            the [ or << at start, without tokenizing the contents,
+            or -1 if it is not found before end.
+        '''
+        findbracket = self.findbracket
+        findparen = self.findparen
+        depth = 0
+        loc = start
+        while 1:
+            match = findbracket(fdata, loc, end)
+            if match is None:
+                return -1
+            tok = match.group()
+            loc = match.end()
+            if tok in ('<<', '['):
+                depth += 1
+            elif tok in ('>>', ']'):
+                depth -= 1
+                if not depth:
+                    return loc
+            elif tok == '(':
+                nest = 1
+                while nest:
+                    match = findparen(fdata, loc, end)
+                    if match is None:
+                        return -1
+                    loc = match.end()
+                    tok = match.group()
+                    if tok == '(':
+                        nest += 1
+                    elif tok == ')':
+                        nest -= 1
+            # Anything else (comments, hex strings, unbalanced
+            # parentheses) can't hide a bracket, and is skipped.
+
+    def lazyreader(self, reader):
+        ''' Return a special token function to replace reader
+            while parsing a large object.  It skips over
+            containers of at least lazysize bytes, and returns
+            placeholders that parse them when they are needed.
+        '''
+        private = self.private
+        def readlazy(source):
+            start = source.tokstart
+            end = self.matchend(source.fdata, start, self.lazyend)
+            if end - start >= self.lazysize:
+                source.floc = end
+                return self.span_class((start, end))
+            # Small enough to parse now, so don't look
+            # for large containers inside it.
+            lazy = self.special
+            private.special = self.eagerspecial
+            try:
+                return reader(source)
+            finally:
+                private.special = lazy
+        return readlazy
+
+    def objectend(self, offset):
+        ''' Estimate where the object at offset ends,
+            from where the next object in the file starts.
+        '''
+        objends = self.objends
+        if objends is None:
+            fdata = self.source.fdata
+            offsets = sorted(set(self.source.all_offsets))
+            objends = dict(zip(offsets, offsets[1:] + [len(fdata)]))
+            self.private.objends = objends
+        return objends.get(offset, len(self.source.fdata))
+
+    def loadspan(self, span):
+        ''' Parse a large array or dictionary that was skipped
+            over while its object was being read in.
+
+            With a cachesize, the placeholder is not replaced
+            (that would look like a change to the object holding
+            it), so the result is cached and evicted like an
+            indirect object, keyed by ('span', start, end), and
+            kept if it is changed.
+        '''
+        loaded = self.loaded
+        if loaded is not None:
+            key = ('span',) + span
+            result = self.indirect_objects.get(key)
+            if result is not None:
+                return result
+            result = loaded.get(key)
+            if result is not None:
+                self.cacheobj(key, result)
+                return result
+        private = self.private
+        source = self.source
+        start, private.lazyend = span
+        source.floc = start
+        reader = self.eagerspecial[source.next()]
+        private.special = self.lazyspecial
+        try:
+            result = reader(source)
+        finally:
+            private.special = self.eagerspecial
+        if loaded is not None:
+            loaded[key] = result
+            vars(result)['_signature'] = self.signature(result)
+            self.cacheobj(key, result)
+        return result
+
     def badtoken(self, source):
         ''' Didn't see that coming.
         '''
@@ -166,14 +304,88 @@ class PdfReader(PdfDict):
             return
         source.error('Illegal endstream/endobj combination')
 
+    def findoffset(self, key):
+        ''' Return the file offset of an indirect object,
+            or 0 if it is not in the cross-reference table.
+        '''
+        return self.source.obj_offsets.get(key, 0)
+
+    def signature(obj, hash=hash, frozenset=frozenset, id=id, vars=vars,
+                       iteritems=dict.iteritems, listiter=list.__iter__):
+        ''' Return a number that will change if the (top level)
+            contents of a dictionary or array are changed.
+        '''
+        if isinstance(obj, dict):
+            return hash((frozenset([(key, id(value)) for key, value in iteritems(obj)]),
+                         id(vars(obj).get('stream'))))
+        return hash(tuple([id(value) for value in listiter(obj)]))
+    signature = staticmethod(signature)
+
+    def cacheobj(self, key, obj):
+        ''' Note that an object has just been used, and
+            evict the least recently used object if there
+            are too many.
+        '''
+        recent = self.recent
+        recent.pop(key, None)
+        recent[key] = obj
+        if len(recent) > self.cachesize:
+            self.evictobj(*recent.popitem(last=False))
+
+    def evictobj(self, key, obj, vars=vars):
+        ''' Stop holding on to an object, so that it can be
+            freed (and read in again if it is needed later),
+            unless it has been changed since it was read in.
+            /Pages nodes that hold cached inheritable attributes
+            are kept too, since the caches below them rely on
+            them not being replaced by a fresh copy.
+        '''
+        myvars = vars(obj)
+        if '_inherited' in myvars or self.signature(obj) != myvars['_signature']:
+            self.indirect_objects[key] = obj
+            self.deferred_objects.discard(key)
+
+    def evict(self):
+        ''' Stop holding on to all the unchanged objects
+            that have been read in.  (Any that are still
+            in use elsewhere will stay in memory until
+            they are no longer used.)
+        '''
+        recent = self.recent
+        evictobj = self.evictobj
+        while recent:
+            evictobj(*recent.popitem(last=False))
+
+    def iterpages(self):
+        ''' Iterate over the pages.  If the reader was created with a
+            cachesize, the objects that were read in for each page are
+            released when the caller asks for the next page, so the
+            whole document is never in memory at once.  (Without a
+            cachesize, this is the same as iterating over self.pages.)
+        '''
+        for page in self.pages:
+            yield page
+            if self.loaded is not None:
+                self.evict()
+
     def loadindirect(self, key):
         result = self.indirect_objects.get(key)
         if not isinstance(result, PdfIndirect):
             return result
+        loaded = self.loaded
+        if loaded is not None:
+            result = loaded.get(key)
+            if result is not None:
+                self.cacheobj(key, result)
+                return result
+        if key not in self.deferred_objects:
+            # Already tried, and failed
+            return None
         source = self.source
         offset = int(self.source.obj_offsets.get(key, '0'))
         if not offset:
             log.warning("Did not find PDF object %s" % (key,))
+            self.deferred_objects.discard(key)
             return None
 
         # Read the object header and validate it
@@ -192,20 +404,38 @@ class PdfReader(PdfDict):
             offset2 = fdata.find('\n' + objheader) + 1 or fdata.find('\r' + objheader) + 1
             if not offset2 or fdata.find(fdata[offset2-1] + objheader, offset2) > 0:
                 source.warning("Expected indirect object '%s'" % objheader)
+                self.deferred_objects.discard(key)
                 return None
             source.warning("Indirect object %s found at incorrect offset %d (expected offset %d)" %
                                      (objheader, offset2, offset))
             source.floc = offset2 + len(objheader)
 
         # Read the object, and call special code if it starts
-        # an array or dictionary
+        # an array or dictionary.  If the object is large, large
+        # containers inside it are parsed when they are needed.
         obj = source.next()
         func = self.special.get(obj)
         if func is not None:
-            obj = func(source)
-
-        self.indirect_objects[key] = obj
-        self.deferred_objects.remove(key)
+            lazysize = self.lazysize
+            if lazysize is not None:
+                end = self.objectend(offset)
+                if end - offset >= lazysize:
+                    private = self.private
+                    private.lazyend = end
+                    private.special = self.lazyspecial
+            try:
+                obj = func(source)
+            finally:
+                self.private.special = self.eagerspecial
+
+        # Dictionaries and arrays are only held weakly if
+        # we are keeping the memory use down.
+        evictable = loaded is not None and isinstance(obj, (PdfDict, PdfArray))
+        if evictable:
+            loaded[key] = obj
+        else:
+            self.indirect_objects[key] = obj
+            self.deferred_objects.remove(key)
 
         # Mark the object as indirect, and
         # add it to the list of streams if it starts a stream
@@ -213,6 +443,12 @@ class PdfReader(PdfDict):
         tok = source.next()
         if tok != 'endobj':
             self.readstream(obj, self.findstream(obj, tok, source), source)
+            decompressed = self.decompressed
+            if decompressed is not None:
+                uncompress([obj], spill=decompressed[0])
+        if evictable:
+            vars(obj)['_signature'] = self.signature(obj)
+            self.cacheobj(key, obj)
         return obj
 
     def findxref(fdata):
@@ -285,6 +521,43 @@ class PdfReader(PdfDict):
             source.floc = start
             source.exception('Invalid table format')
 
+    def findlinearized(self, fdata):
+        ''' If the file is linearized (and has not been updated
+            since it was), return the linearization parameter
+            dictionary, which must be the first object in the file.
+        '''
+        try:
+            source = PdfTokens(fdata, max(fdata.find('%PDF-'), 0))
+            objid = source.multiple(4)
+            if (len(objid) < 4 or not objid[0].isdigit() or
+                    not objid[1].isdigit() or objid[2:] != ['obj', '<<']):
+                return None
+            if source.floc > 1024:
+                return None
+            result = self.readdict(source)
+        except PdfParseError:
+            return None
+        length = result.L
+        if result.Linearized is None or length is None or not length.isdigit():
+            return None
+        if int(length) != len(fdata):
+            log.warning('Linearized file has been updated -- ignoring linearization')
+            return None
+        return result
+
+    def linearized(self, vars=vars):
+        ''' The linearization parameter dictionary (see findlinearized).
+            Only looked for the first time it is asked for, and None
+            if it is first asked for after close().
+        '''
+        info = vars(self)
+        if '_linearized' not in info:
+            source = self.source
+            info['_linearized'] = (source is not None and
+                                   self.findlinearized(source.fdata) or None)
+        return info['_linearized']
+    linearized = property(linearized)
+
     def readpages(self, node):
         pagename=PdfName.Page
         pagesname=PdfName.Pages
@@ -313,7 +586,28 @@ class PdfReader(PdfDict):
             log.error('Invalid page tree: %s' % s)
             return []
 
-    def __init__(self, fname=None, fdata=None, decompress=False, disable_gc=True):
+    def __init__(self, fname=None, fdata=None, decompress=False, disable_gc=True,
+                       spill=None, cachesize=None, lazysize=None, workers=1):
+        ''' If decompress is true, the streams are decompressed,
+            in workers threads.  If a pdfrw.spill.SpillStore is
+            passed as spill, decompressed streams will be handed to it.
+            (With a cachesize, streams are decompressed as they are read
+            in; see uncompress().)
+
+            If cachesize is given, the reader only holds on to
+            that many of the most recently used dictionaries and
+            arrays, and reads the others in again if they are
+            needed.  Objects that are still in use elsewhere, and
+            objects whose contents have been changed, are kept.
+            (Only the top level of an object is checked for changes,
+            so keep a reference to anything changed further down.)
+            See also iterpages().
+
+            If lazysize is given, arrays and dictionaries inside
+            indirect objects that take up at least that many bytes
+            in the file are skipped over when the object is read,
+            and parsed the first time they are accessed.
+        '''
 
         # Runs a lot faster with GC off.
         disable_gc = disable_gc and gc.isenabled()
@@ -356,12 +650,33 @@ class PdfReader(PdfDict):
             private = self.private
             private.indirect_objects = {}
             private.deferred_objects = set()
+            # Placeholders share their loader through a class
+            # attribute, rather than each carrying a reference to it.
+            if cachesize is not None:
+                private.cachesize = cachesize
+                private.loaded = weakref.WeakValueDictionary()
+                private.recent = OrderedDict()
+            private.indirect_class = type('PdfIndirect', (PdfIndirect,),
+                    dict(__slots__=(), _loader=staticmethod(self.loadindirect),
+                                       _locator=staticmethod(self.findoffset),
+                                       _replace=cachesize is None))
             private.special = {'<<': self.readdict,
                                '[': self.readarray,
                                'endobj': self.empty_obj,
                                }
             for tok in r'\ ( ) < > { } ] >> %'.split():
                 self.special[tok] = self.badtoken
+            private.eagerspecial = self.special
+            if lazysize is not None:
+                private.lazysize = lazysize
+                private.objends = None
+                private.lazyspecial = lazyspecial = self.special.copy()
+                lazyspecial['<<'] = self.lazyreader(self.readdict)
+                lazyspecial['['] = self.lazyreader(self.readarray)
+                private.span_class = type('PdfSpan', (PdfIndirect,),
+                        dict(__slots__=(), _loader=staticmethod(self.loadspan),
+                                           _locator=staticmethod(operator.itemgetter(0)),
+                                           _replace=cachesize is None))
 
 
             startloc, source = self.findxref(fdata)
@@ -405,7 +720,7 @@ class PdfReader(PdfDict):
             #self.read_all_indirect(source)
             private.pages = self.readpages(self.Root)
             if decompress:
-                self.uncompress()
+                self.uncompress(spill, workers)
 
             # For compatibility with pyPdf
             private.numPages = len(self.pages)
@@ -428,6 +743,54 @@ class PdfReader(PdfDict):
             for key in new:
                 self.loadindirect(key)
 
-    def uncompress(self):
+    def uncompress(self, spill=None, workers=1):
+        ''' Decompress the streams.  With a cachesize, an object
+            that is evicted is read in again as it is in the file,
+            so only the objects in memory are decompressed now,
+            and the rest are decompressed whenever they are read in.
+        '''
+        if self.loaded is not None:
+            self.private.decompressed = spill,
+            signature = self.signature
+            objs = self.loaded.values()
+            unchanged = [x for x in objs if signature(x) == vars(x)['_signature']]
+            uncompress(objs + self.indirect_objects.values(), spill=spill, workers=workers)
+            # Decompressing is not a change that has to be kept
+            for obj in unchanged:
+                vars(obj)['_signature'] = signature(obj)
+            return
         self.read_all()
-        uncompress(self.indirect_objects.itervalues())
+        uncompress(self.indirect_objects.itervalues(), spill=spill, workers=workers)
+
+    def close(self, staticmethod=staticmethod):
+        ''' Release the file data and the tokenizer, and break the
+            reference cycles between the reader and its placeholders,
+            so the memory is freed without waiting for the garbage
+            collector.  Objects that have already been read in can
+            still be used, but any placeholder that is left (and,
+            with a cachesize, every placeholder) raises PdfError
+            when it is resolved.
+        '''
+        private = self.private
+        source = self.source
+        if source is None:
+            return
+        for cls in (self.indirect_class, self.span_class):
+            if cls is not None:
+                cls._loader = staticmethod(_closedloader)
+                cls._locator = staticmethod(_closedlocator)
+        source.iterator.close()
+        private.source = None
+        private.indirect_objects = {}
+        private.deferred_objects = set()
+        private.special = private.eagerspecial = private.lazyspecial = None
+        private.objends = None
+        if self.loaded is not None:
+            private.recent = None
+            private.loaded = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -16,6 +16,10 @@ and
 
 addpage() assumes that the pages are part of a valid
 tree/forest of PDF objects.
+
+The output /Pages tree is balanced, with at most fanout
+(default 128) kids per node, so that readers can get
+to any page without walking a huge flat /Kids array.
 '''
 
 try:
@@ -24,23 +28,162 @@ except NameError:
     from sets import Set as set
 
 from pdfrw.objects import PdfName, PdfArray, PdfDict, IndirectPdfDict, PdfObject, PdfString
-from pdfrw.compress import compress as do_compress
+from pdfrw.compress import compress as do_compress, transcode as do_transcode
 from pdfrw.errors import PdfOutputError, log
 
 NullObject = PdfObject('null')
 NullObject.indirect = True
 NullObject.Type = 'Null object'
 
+def format_array(myarray, formatter, sum=sum, len=len,
+                 space_join=' '.join, lf_join='\n  '.join):
+    ''' Format array data into semi-readable ASCII
+    '''
+    if sum([len(x) for x in myarray]) <= 70:
+        return formatter % space_join(myarray)
+    bigarray = []
+    count = 1000000
+    for x in myarray:
+        lenx = len(x) + 1
+        count += lenx
+        if count > 71:
+            subarray = []
+            bigarray.append(subarray)
+            count = lenx
+        subarray.append(x)
+    return formatter % lf_join([space_join(x) for x in bigarray])
+
+def objformatter(add, compress=False, spilled=False, isinstance=isinstance,
+                 hasattr=hasattr, getattr=getattr, str=str, basestring=basestring,
+                 vars=vars, list=list, dict=dict, tuple=tuple,
+                 PdfArray=PdfArray, PdfDict=PdfDict, encode=PdfString.encode,
+                 format_array=format_array, do_compress=do_compress):
+    ''' Return a format_obj() function, which formats PDF object
+        data into semi-readable ASCII.  It is shared by all the
+        writers, which supply add():  add() returns references
+        for indirect objects (keeping track of them), and calls
+        format_obj() for direct ones, so the two may mutually
+        recurse.
+
+        If compress is set, streams without filters are compressed
+        first.  If spilled is set, an object whose stream has been
+        spilled to disk is returned as (text, SpilledStream), so
+        that the data can be read in when the object is written.
+    '''
+    def format_obj(obj):
+        while 1:
+            if isinstance(obj, (list, dict, tuple)):
+                if isinstance(obj, PdfArray):
+                    myarray = [add(x) for x in obj]
+                    return format_array(myarray, '[%s]')
+                elif isinstance(obj, PdfDict):
+                    # (Look in vars, so spilled streams are not read in.)
+                    if compress and vars(obj).get('stream'):
+                        do_compress([obj])
+                    myarray = []
+                    dictkeys = [str(x) for x in obj.keys()]
+                    dictkeys.sort()
+                    for key in dictkeys:
+                        myarray.append(key)
+                        myarray.append(add(obj[key]))
+                    result = format_array(myarray, '<<%s>>')
+                    stream = vars(obj).get('stream')
+                    if stream is not None:
+                        if not isinstance(stream, basestring):
+                            if spilled:
+                                return result, stream
+                            stream = stream.read()
+                        result = '%s\nstream\n%s\nendstream' % (result, stream)
+                    return result
+                obj = (PdfArray, PdfDict)[isinstance(obj, dict)](obj)
+                continue
+
+            if not hasattr(obj, 'indirect') and isinstance(obj, basestring):
+                return encode(obj)
+            return str(getattr(obj, 'encoded', obj))
+    return format_obj
+
+def killswaps(trailer, killobj):
+    ''' Return a dictionary mapping the ids of objects that
+        should not be output (old catalog and pages objects)
+        to the objects that should be referenced instead.
+    '''
+    swapobj = {PdfName.Catalog:trailer.Root, PdfName.Pages:trailer.Root.Pages, None:trailer}.get
+    swapobj = [(objid, swapobj(obj.Type)) for objid, obj in killobj.iteritems()]
+    return dict((objid, obj is None and NullObject or obj) for objid, obj in swapobj)
+
+def isindirect(obj, isinstance=isinstance, getattr=getattr, vars=vars, PdfDict=PdfDict):
+    ''' Return true if obj will be written as an indirect
+        object.  Stream objects are always indirect.
+    '''
+    if isinstance(obj, PdfDict):
+        return obj.indirect or (vars(obj).get('stream') is not None)
+    return getattr(obj, 'indirect', False)
+
+def walkobjects(trailer, swapobj, id=id, isinstance=isinstance,
+                isindirect=isindirect, list=list, dict=dict, tuple=tuple,
+                PdfDict=PdfDict):
+    ''' Yield (obj, indirect, first) for every reference to a dict
+        or array that will be written out, starting from the
+        trailer.  first is true the first time an object is
+        seen; each object is only looked inside once.
+    '''
+    seen = {}   # Holds the objects, so their ids can't be reused
+    pending = [trailer]
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, dict):
+            obj = isinstance(obj, PdfDict) and obj.itervalues() or obj.values()
+        for child in obj:
+            if not isinstance(child, (list, dict, tuple)):
+                continue
+            childid = id(child)
+            indirect = isindirect(child)
+            if indirect:
+                swapped = swapobj(childid)
+                if swapped is not None:
+                    child = swapped
+                    childid = id(child)
+            first = childid not in seen
+            if first:
+                seen[childid] = child
+                pending.append(child)
+            yield child, indirect, first
+
+def shared_direct(trailer, swapobj, minsize, id=id, len=len):
+    ''' Return the ids of direct dicts and arrays that are
+        referenced from more than one place and have at
+        least minsize items.  Writing these as indirect
+        objects is better than replicating them.
+    '''
+    counts = {}
+    result = set()
+    for obj, indirect, first in walkobjects(trailer, swapobj):
+        if indirect:
+            continue
+        objid = id(obj)
+        count = counts.get(objid, 0) + 1
+        counts[objid] = count
+        if count == 2 and len(obj) >= minsize:
+            result.add(objid)
+    return result
+
 def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
         id=id, isinstance=isinstance, getattr=getattr,len=len,
         sum=sum, set=set, str=str, basestring=basestring,
         hasattr=hasattr, repr=repr, enumerate=enumerate,
         list=list, dict=dict, tuple=tuple,
         do_compress=do_compress, PdfArray=PdfArray,
-        PdfDict=PdfDict, PdfObject=PdfObject, encode=PdfString.encode):
+        PdfDict=PdfDict, PdfObject=PdfObject, encode=PdfString.encode,
+        format_array=format_array, vars=vars, promote=8):
     ''' FormatObjects performs the actual formatting and disk write.
         Should be a class, was a class, turned into nested functions
         for performace (to reduce attribute lookups).
+
+        Direct dicts and arrays with at least promote items that
+        are referenced from more than one place are written as
+        indirect objects.  Set promote to 0 to replicate them
+        instead.
     '''
 
     def add(obj):
@@ -50,13 +193,14 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
         # Can't hash dicts, so just hash the object ID
         objid = id(obj)
 
-        # Automatically set stream objects to indirect
+        # Automatically set stream objects to indirect.
+        # (Look in vars, so spilled streams are not read in.)
         if isinstance(obj, PdfDict):
-            indirect = obj.indirect or (obj.stream is not None)
+            indirect = obj.indirect or (vars(obj).get('stream') is not None)
         else:
             indirect = getattr(obj, 'indirect', False)
 
-        if not indirect:
+        if not indirect and objid not in promoted:
             if objid in visited:
                 log.warning('Replicating direct %s object, should be indirect for optimal file size' % type(obj))
                 obj = type(obj)(obj)
@@ -84,58 +228,12 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
             objlist_append(None)
             indirect_dict[objid] = objnum
             deferred.append((objnum-1, obj))
+            # Keep the object alive, so its id can't be reused
+            # (a reader with a cachesize can unload objects).
+            numbered.append(obj)
         return '%s 0 R' % objnum
 
-    def format_array(myarray, formatter):
-        # Format array data into semi-readable ASCII
-        if sum([len(x) for x in myarray]) <= 70:
-            return formatter % space_join(myarray)
-        return format_big(myarray, formatter)
-
-    def format_big(myarray, formatter):
-        bigarray = []
-        count = 1000000
-        for x in myarray:
-            lenx = len(x) + 1
-            count += lenx
-            if count > 71:
-                subarray = []
-                bigarray.append(subarray)
-                count = lenx
-            subarray.append(x)
-        return formatter % lf_join([space_join(x) for x in bigarray])
-
-    def format_obj(obj):
-        ''' format PDF object data into semi-readable ASCII.
-            May mutually recurse with add() -- add() will
-            return references for indirect objects, and add
-            the indirect object to the list.
-        '''
-        while 1:
-            if isinstance(obj, (list, dict, tuple)):
-                if isinstance(obj, PdfArray):
-                    myarray = [add(x) for x in obj]
-                    return format_array(myarray, '[%s]')
-                elif isinstance(obj, PdfDict):
-                    if compress and obj.stream:
-                        do_compress([obj])
-                    myarray = []
-                    dictkeys = [str(x) for x in obj.keys()]
-                    dictkeys.sort()
-                    for key in dictkeys:
-                        myarray.append(key)
-                        myarray.append(add(obj[key]))
-                    result = format_array(myarray, '<<%s>>')
-                    stream = obj.stream
-                    if stream is not None:
-                        result = '%s\nstream\n%s\nendstream' % (result, stream)
-                    return result
-                obj = (PdfArray, PdfDict)[isinstance(obj, dict)](obj)
-                continue
-
-            if not hasattr(obj, 'indirect') and isinstance(obj, basestring):
-                return encode(obj)
-            return str(getattr(obj, 'encoded', obj))
+    format_obj = objformatter(add, compress, spilled=True)
 
     def format_deferred():
         while deferred:
@@ -150,20 +248,19 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
     visited = set()
     visiting = visited.add
     leaving = visited.remove
-    space_join = ' '.join
-    lf_join = '\n  '.join
     f_write = f.write
 
     deferred = []
+    numbered = []
 
     # Don't reference old catalog or pages objects -- swap references to new ones.
-    swapobj = {PdfName.Catalog:trailer.Root, PdfName.Pages:trailer.Root.Pages, None:trailer}.get
-    swapobj = [(objid, swapobj(obj.Type)) for objid, obj in killobj.iteritems()]
-    swapobj = dict((objid, obj is None and NullObject or obj) for objid, obj in swapobj).get
+    swapobj = killswaps(trailer, killobj).get
 
     for objid in killobj:
         assert swapobj(objid) is not None
 
+    promoted = promote and shared_direct(trailer, swapobj, promote) or ()
+
     # The first format of trailer gets all the information,
     # but we throw away the actual trailer formatting.
     format_obj(trailer)
@@ -187,6 +284,8 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
     offsets_append = offsets.append
 
     for i, x in enumerate(objlist):
+        if isinstance(x, tuple):
+            x = '%s\nstream\n%s\nendstream' % (x[0], x[1].read())
         objstr = '%s 0 obj\n%s\nendobj\n' % (i + 1, x)
         offsets_append((offset, 0, 'n'))
         offset += len(objstr)
@@ -197,14 +296,56 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
         f_write('%010d %05d %s\r\n' % x)
     f_write('trailer\n\n%s\nstartxref\n%s\n%%%%EOF\n' % (trailer, offset))
 
+def _hoistkey(value, isinstance=isinstance, PdfDict=PdfDict, PdfArray=PdfArray, str=str):
+    ''' Return a key that compares equal for two inheritable
+        attribute values only if either could stand in for the
+        other.  Dictionaries (e.g. /Resources) must be the
+        same object; arrays and scalars must have the same text.
+    '''
+    if isinstance(value, PdfDict):
+        return id(value)
+    if isinstance(value, PdfArray):
+        return tuple([str(x) for x in value])
+    return str(value)
+
 class PdfWriter(object):
 
     _trailer = None
-
-    def __init__(self, version='1.3', compress=False):
+    _hoisted = False
+
+    # Inheritable page attributes that may be moved up the
+    # /Pages tree when every kid of a node agrees on them.
+    hoistable = PdfName.Resources, PdfName.MediaBox, PdfName.CropBox, PdfName.Rotate
+
+    def __init__(self, version='1.3', compress=False, fanout=128, linearize=False,
+                       promote=8, transcode=False):
+        ''' fanout is the maximum number of kids of any node in
+            the /Pages tree.  If it is 0 or None, all the pages
+            are placed into a single flat /Kids array, and
+            nothing is moved off of the pages.
+
+            If linearize is set, the file is written in the
+            linearized ("fast web view") layout.
+
+            Direct dicts and arrays with at least promote items
+            that are used in more than one place are written
+            once, as indirect objects, instead of being copied
+            into every place they are used.  Set promote to 0
+            to turn this off.
+
+            If transcode is set, streams with old or weak filters
+            (or none) are compressed again with /FlateDecode before
+            they are written (see pdfrw.compress.transcode).  It
+            may be a dictionary of keyword arguments for transcode(),
+            e.g. dict(workers=4, maxtime=60).
+        '''
         self.pagearray = PdfArray()
         self.compress = compress
         self.version = version
+        self.fanout = fanout
+        self.linearize = linearize
+        self.promote = promote
+        self.transcode = transcode
         self.killobj = {}
 
     def addpage(self, page):
@@ -251,20 +392,74 @@ class PdfWriter(object):
         trailer = PdfDict(
             Root = IndirectPdfDict(
                 Type = PdfName.Catalog,
-                Pages = IndirectPdfDict(
-                    Type = PdfName.Pages,
-                    Count = PdfObject(len(self.pagearray)),
-                    Kids = self.pagearray
-                )
+                Pages = self._get_pagetree()
             )
         )
-        # Make all the pages point back to the page dictionary
-        pagedict = trailer.Root.Pages
-        for page in pagedict.Kids:
-            page.Parent = pagedict
         self._trailer = trailer
         return trailer
 
+    def _get_pagetree(self):
+        ''' Build the /Pages tree and return its root.  The tree
+            is balanced -- every page is at the same depth, and
+            no node has more than fanout kids.
+        '''
+        level = self.pagearray
+        fanout = self.fanout
+        if self._hoisted:
+            self._restore_inherited(level)
+        # Linearized files need the first page's resources
+        # with the first page, so leave them on the pages.
+        self._hoisted = bool(fanout) and not self.linearize
+        counts = [1] * len(level)
+        while fanout and len(level) > fanout:
+            nodes = []
+            nodecounts = []
+            for start in range(0, len(level), fanout):
+                end = start + fanout
+                nodecounts.append(sum(counts[start:end]))
+                nodes.append(self._pagenode(level[start:end], nodecounts[-1]))
+            level, counts = nodes, nodecounts
+        return self._pagenode(level, sum(counts))
+
+    def _pagenode(self, kids, count):
+        ''' Create a single /Pages node, make all its kids
+            point back to it, and move any attributes that
+            all the kids share up into it.
+        '''
+        if not isinstance(kids, PdfArray):
+            kids = PdfArray(kids)
+        node = IndirectPdfDict(
+            Type = PdfName.Pages,
+            Count = PdfObject(count),
+            Kids = kids
+        )
+        for kid in kids:
+            kid.Parent = node
+        if self._hoisted and kids:
+            for name in self.hoistable:
+                values = [kid[name] for kid in kids]
+                key = _hoistkey(values[0])
+                for value in values:
+                    if value is None or _hoistkey(value) != key:
+                        break
+                else:
+                    node[name] = values[0]
+                    for kid in kids:
+                        kid[name] = None
+        return node
+
+    def _restore_inherited(self, pages):
+        ''' A previous tree may have moved attributes off of
+            the pages.  Put them back before building a new one.
+        '''
+        hoistable = self.hoistable
+        for page in pages:
+            if page.Parent is not None:
+                inheritable = page.inheritable
+                for name in hoistable:
+                    if page[name] is None:
+                        page[name] = inheritable[name]
+
     def _set_trailer(self, trailer):
         self._trailer = trailer
 
@@ -272,15 +467,33 @@ class PdfWriter(object):
 
     def write(self, fname, trailer=None):
         trailer = trailer or self.trailer
+        if self.transcode:
+            self.transcodestreams(trailer)
 
         # Dump the data.  We either have a filename or a preexisting
         # file object.
         preexisting = hasattr(fname, 'write')
         f = preexisting and fname or open(fname, 'wb')
-        FormatObjects(f, trailer, self.version, self.compress, self.killobj)
+        formatter = FormatObjects
+        if self.linearize:
+            from pdfrw.linearize import FormatLinearized as formatter
+        formatter(f, trailer, self.version, self.compress, self.killobj,
+                  promote=self.promote)
         if not preexisting:
             f.close()
 
+    def transcodestreams(self, trailer=None):
+        ''' Transcode the streams that will be written out, in
+            place.  Return the number of bytes saved.
+        '''
+        trailer = trailer or self.trailer
+        options = self.transcode
+        if not isinstance(options, dict):
+            options = {}
+        swapobj = killswaps(trailer, self.killobj).get
+        objects = [obj for obj, indirect, first in walkobjects(trailer, swapobj) if first]
+        return do_transcode(objects, **options)
+
 if __name__ == '__main__':
     import logging
     log.setLevel(logging.DEBUG)
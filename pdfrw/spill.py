@@ -0,0 +1,149 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Spill large stream bodies out to a temporary file.
+
+Decompressing a document can take many times the size of
+the file in memory.  A SpillStore keeps track of the streams
+it is handed, and once the total size of the large ones
+(at least threshold bytes each) goes over the memory budget,
+it moves the oldest ones out to a temporary file until the
+total is back under the budget.
+
+A spilled stream is transparently read back in every time
+the stream attribute of its PdfDict is read, so filters and
+the writer work as before, holding only one stream in memory
+at a time.  Assigning to the stream attribute replaces the
+spilled data.
+
+One store can be shared by several documents, to keep
+all of them under a single budget:
+
+    store = SpillStore(budget=256 << 20)
+    for fname in fnames:
+        PdfReader(fname, decompress=True, spill=store)
+'''
+
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+from pdfrw.errors import PdfError
+
+
+class SpilledStream(object):
+    ''' Stands in for the stream data in a PdfDict
+        attribute dictionary.
+    '''
+    __slots__ = 'store', 'offset', 'length'
+
+    def __init__(self, store, offset, length):
+        self.store = store
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, start=0, length=None):
+        if length is None:
+            length = self.length - start
+        return self.store.read(self.offset + start, length)
+
+
+class SpillStore(object):
+    ''' A temporary file for stream data, and a record of
+        which in-memory streams can be moved out to it.
+    '''
+    def __init__(self, threshold=1 << 20, budget=64 << 20, dirname=None):
+        self.threshold = threshold
+        self.budget = budget
+        self.dirname = dirname
+        self.f = None
+        self.filesize = 0
+        self.resident = OrderedDict()
+        self.inmemory = 0
+        self.lock = threading.Lock()
+
+    def add(self, obj, vars=vars, isinstance=isinstance, basestring=basestring):
+        ''' Track a stream object, and spill the oldest
+            tracked streams if we are over budget.
+        '''
+        stream = vars(obj).get('stream')
+        if not isinstance(stream, basestring) or len(stream) < self.threshold:
+            return
+        resident = self.resident
+        key = id(obj)
+        info = resident.get(key)
+        if info is not None:
+            if info[0]() is obj:
+                return
+            self.inmemory -= info[1]
+            del resident[key]
+        resident[key] = weakref.ref(obj), len(stream)
+        self.inmemory += len(stream)
+        if self.inmemory > self.budget:
+            self.trim()
+
+    def addall(self, mylist):
+        for obj in mylist:
+            self.add(obj)
+
+    def trim(self, vars=vars, isinstance=isinstance, basestring=basestring):
+        ''' Spill tracked streams, oldest first, until
+            the ones left in memory fit in the budget.
+        '''
+        resident = self.resident
+        budget = self.budget
+        while resident and self.inmemory > budget:
+            key, (ref, size) = resident.popitem(last=False)
+            self.inmemory -= size
+            obj = ref()
+            # The object may be gone, or may have been given new data.
+            if obj is not None:
+                stream = vars(obj).get('stream')
+                if isinstance(stream, basestring) and len(stream) == size:
+                    self.spill(obj)
+
+    def spill(self, obj):
+        ''' Move one stream out to the file.
+        '''
+        stream = vars(obj).get('stream')
+        lock = self.lock
+        lock.acquire()
+        try:
+            f = self.f
+            if f is None:
+                f = self.f = tempfile.TemporaryFile(dir=self.dirname)
+            offset = self.filesize
+            f.seek(offset)
+            f.write(stream)
+            self.filesize += len(stream)
+        finally:
+            lock.release()
+        vars(obj)['stream'] = SpilledStream(self, offset, len(stream))
+
+    def read(self, offset, length):
+        lock = self.lock
+        lock.acquire()
+        try:
+            f = self.f
+            if f is None:
+                raise PdfError('Spilled stream data has been discarded')
+            f.seek(offset)
+            return f.read(length)
+        finally:
+            lock.release()
+
+    def close(self):
+        ''' Discard the file.  Any streams still spilled
+            to it can no longer be read.
+        '''
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        self.resident.clear()
+        self.inmemory = 0
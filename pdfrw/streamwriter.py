@@ -0,0 +1,275 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+The PdfStreamWriter class writes a PDF file out to disk
+incrementally.  Unlike PdfWriter, which keeps every page
+(and everything every page refers to) until write() is
+called, PdfStreamWriter writes each page and its objects
+as soon as the page is added.
+
+This makes it suitable for concatenating large numbers
+of documents:
+
+    writer = PdfStreamWriter('merged.pdf')
+    for fname in fnames:
+        writer.adddoc(fname)
+    writer.close()
+
+adddoc() reads a document, writes all its pages, and then
+releases the document, so the peak memory use is bounded
+by the largest single input rather than by the sum of the
+inputs.
+
+Objects are only shared between pages that are added between
+two calls to release() (adddoc() calls it automatically).
+An object that is reachable from pages on both sides of a
+release() will be written to the file twice.
+'''
+
+import gc
+
+from pdfrw.objects import PdfName, PdfArray, PdfDict, IndirectPdfDict, PdfObject
+from pdfrw.pdfreader import PdfReader
+from pdfrw.pdfwriter import objformatter
+from pdfrw.errors import PdfOutputError, log
+
+
+class PdfStreamWriter(object):
+
+    # Object numbers reserved for the catalog and for
+    # the root of the /Pages tree, which are both
+    # written by close().
+    catalog_ref = PdfObject('1 0 R')
+    pages_ref = PdfObject('2 0 R')
+
+    info = None
+    closed = False
+
+    def __init__(self, fname, version='1.3', compress=False, fanout=128):
+        ''' fanout is the maximum number of kids of any node in
+            the /Pages tree.  As for PdfWriter, if it is 0 or None,
+            all the pages are placed into a single flat /Kids array.
+        '''
+        self.preexisting = preexisting = hasattr(fname, 'write')
+        self.f = f = preexisting and fname or open(fname, 'wb')
+        self.compress = compress
+        self.fanout = fanout and max(fanout, 2)
+        header = '%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n' % version
+        f.write(header)
+        self.offset = len(header)
+        self.offsets = {}
+        self.objcount = 2
+        self.leaves = []
+        self.leafkids = None
+        self.visited = set()
+        self.deferred = []
+        self._format = objformatter(self._add, compress)
+        self.release()
+
+    def release(self):
+        ''' Forget about all the objects written so far,
+            so that they (and the documents they came from)
+            can be garbage collected.
+        '''
+        self.indirect_dict = {}
+        self.swapped = {}
+
+    def _newnum(self):
+        self.objcount += 1
+        return self.objcount
+
+    def _writeobj(self, objnum, objstr):
+        objstr = '%s 0 obj\n%s\nendobj\n' % (objnum, objstr)
+        self.offsets[objnum] = self.offset
+        self.offset += len(objstr)
+        self.f.write(objstr)
+
+    def _add(self, obj, id=id, isinstance=isinstance, getattr=getattr,
+                    vars=vars, PdfDict=PdfDict):
+        ''' Return a reference to an indirect object, or the
+            formatted text of a direct one.  Just like the add()
+            function inside FormatObjects, except that the
+            object numbers stay valid until release().
+        '''
+        objid = id(obj)
+
+        # Automatically set stream objects to indirect
+        if isinstance(obj, PdfDict):
+            indirect = obj.indirect or (vars(obj).get('stream') is not None)
+        else:
+            indirect = getattr(obj, 'indirect', False)
+
+        if not indirect:
+            visited = self.visited
+            if objid in visited:
+                log.warning('Replicating direct %s object, should be indirect for optimal file size' % type(obj))
+                obj = type(obj)(obj)
+                objid = id(obj)
+            visited.add(objid)
+            result = self._format(obj)
+            visited.remove(objid)
+            return result
+
+        swapped = self.swapped.get(objid)
+        if swapped is not None:
+            return swapped[0]
+
+        # The object is kept with its number, so that its
+        # id cannot be reused before release() is called.
+        info = self.indirect_dict.get(objid)
+        if info is None:
+            info = self.indirect_dict[objid] = '%s 0 R' % self._newnum(), obj
+            self.deferred.append((self.objcount, obj))
+        return info[0]
+
+    def _flush(self):
+        ''' Write out every object that has been
+            referenced but not yet written.
+        '''
+        deferred = self.deferred
+        while deferred:
+            objnum, obj = deferred.pop()
+            self._writeobj(objnum, self._format(obj))
+
+    def addpage(self, page):
+        ''' Write a page, and any objects it refers
+            to that have not yet been written.
+        '''
+        if self.closed:
+            raise PdfOutputError('Cannot add a page to a closed PdfStreamWriter')
+        if page.Type != PdfName.Page:
+            raise PdfOutputError('Bad /Type:  Expected %s, found %s'
+                                  % (PdfName.Page, page.Type))
+
+        # Start a new leaf of the /Pages tree if required.
+        # (With no fanout, the root is the only leaf.)
+        fanout = self.fanout
+        leafkids = self.leafkids
+        if leafkids is None or (fanout and len(leafkids) >= fanout):
+            leafkids = self.leafkids = []
+            self.leaves.append((fanout and self._newnum() or 2, leafkids))
+        leafnum = self.leaves[-1][0]
+
+        # Replace references to the old page tree with references
+        # to the new one.  (Anything that isn't a /Pages node
+        # in the old tree becomes null.)
+        swapped = self.swapped
+        obj = page.Parent
+        while obj is not None:
+            objid = id(obj)
+            if objid in swapped:
+                break
+            swapped[objid] = (obj.Type == PdfName.Pages and self.pages_ref
+                                        or 'null'), obj
+            obj = obj.Parent
+
+        inheritable = page.inheritable
+        newpage = IndirectPdfDict(
+            page,
+            Resources = inheritable.Resources,
+            MediaBox = inheritable.MediaBox,
+            CropBox = inheritable.CropBox,
+            Rotate = inheritable.Rotate,
+            Parent = PdfObject('%s 0 R' % leafnum),
+        )
+        pageref = self._add(newpage)
+        swapped[id(page)] = pageref, page
+        leafkids.append(PdfObject(pageref))
+        self._flush()
+        return self
+
+    def addpages(self, pagelist):
+        for page in pagelist:
+            self.addpage(page)
+        return self
+
+    def adddoc(self, source, decompress=False):
+        ''' Add all the pages of a document, then release it.
+            source can be a PdfReader or anything that can
+            be passed to PdfReader as a file name.
+        '''
+        if not isinstance(source, PdfReader):
+            source = PdfReader(source, decompress=decompress)
+        try:
+            self.addpages(source.pages)
+        finally:
+            del source
+            self.release()
+            # Page objects and their parents refer to each
+            # other, so they are not freed without help.
+            gc.collect()
+        return self
+
+    def _pagetree(self):
+        ''' Write out the /Pages tree.  The leaves already have
+            object numbers, because the pages refer to them.
+            The root of the tree is always the reserved object
+            number 2.
+        '''
+        fanout = self.fanout
+        if not fanout:
+            kids = self.leaves and self.leaves[0][1] or []
+            self._writenode((self.pages_ref, len(kids), kids), None)
+            return
+        level = [(PdfObject('%s 0 R' % num), len(kids), kids)
+                        for num, kids in self.leaves]
+        while len(level) > fanout:
+            level = [self._pagenode(level[start:start + fanout])
+                        for start in range(0, len(level), fanout)]
+        root = self.pages_ref, sum([x[1] for x in level]), level
+        self._writenode(root, None)
+
+    def _pagenode(self, kids):
+        return (PdfObject('%s 0 R' % self._newnum()),
+                sum([x[1] for x in kids]), kids)
+
+    def _writenode(self, node, parentref):
+        ''' Recursively write a /Pages node and its descendants.
+            Each node is a (reference, count, kids) tuple, where
+            the kids are either nodes or page references.
+        '''
+        myref, count, kids = node
+        if kids and isinstance(kids[0], tuple):
+            for kid in kids:
+                self._writenode(kid, myref)
+            kids = [kid[0] for kid in kids]
+        node = PdfDict(
+            Type = PdfName.Pages,
+            Count = PdfObject(count),
+            Kids = PdfArray(kids),
+            Parent = parentref,
+        )
+        self._writeobj(int(myref.split()[0]), self._format(node))
+
+    def close(self):
+        ''' Write the /Pages tree, the catalog, any /Info
+            dictionary, the cross-reference table and the
+            trailer, and close the file if we opened it.
+        '''
+        if self.closed:
+            return
+        self._pagetree()
+        trailer = PdfDict(
+            Root = self.catalog_ref,
+        )
+        self._writeobj(1, self._format(PdfDict(Type=PdfName.Catalog,
+                                               Pages=self.pages_ref)))
+        if self.info is not None:
+            trailer.Info = PdfObject(self._add(IndirectPdfDict(self.info)))
+            self._flush()
+        self.release()
+        size = self.objcount + 1
+        trailer.Size = PdfObject(size)
+
+        f = self.f
+        offsets = self.offsets
+        f.write('xref\n0 %s\n' % size)
+        f.write('%010d %05d %s\r\n' % (0, 65535, 'f'))
+        for objnum in range(1, size):
+            f.write('%010d %05d %s\r\n' % (offsets[objnum], 0, 'n'))
+        f.write('trailer\n\n%s\nstartxref\n%s\n%%%%EOF\n' % (self._format(trailer), self.offset))
+        if not self.preexisting:
+            f.close()
+        self.closed = True
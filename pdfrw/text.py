@@ -0,0 +1,449 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Get the text out of the pages of a PDF, for indexing and search:
+
+    for pagenum, text in itertext(PdfReader(fname)):
+        print pagenum, text.encode('utf-8')
+
+The strings shown by Tj, TJ, ' and " on each page (and in the Form
+XObjects it uses) are decoded to unicode with the font's /ToUnicode
+CMap where it has one, and otherwise with its /Encoding (a base
+encoding plus /Differences, with glyph names looked up in a table of
+the common Latin glyphs, or read as uniXXXX names).  Composite
+(/Type0) fonts need a /ToUnicode CMap, or a UCS2 or UTF16 /Encoding;
+there are no tables for the character collections (Adobe-Japan1
+and so on) here.
+
+A new line is started where the text moves to a new line, and a
+space is put in where it moves to the right or a TJ array leaves a
+gap.  Glyph widths are not looked at, and no attempt is made to put
+columns or tables back in reading order.
+
+Parsed CMaps are kept in a cache keyed by a hash of their data, so
+the same CMap used by several fonts or documents (as happens with
+fonts embedded from the same source) is only parsed once in each
+process.  The decoder for each font is made once per itertext() call.
+
+iterfiles() gets the text of many files, using a pool of processes.
+'''
+
+import codecs
+import hashlib
+import binascii
+from collections import OrderedDict
+
+from pdfrw.objects import PdfDict, PdfArray, PdfName, PdfString
+from pdfrw.pdfreader import PdfReader
+from pdfrw.content import tokens, instructions
+from pdfrw.util import mapfiles
+from pdfrw.errors import log
+
+#####################################################################
+# Glyph names and encodings
+
+_glyphs = dict((name, unichr(int(code, 16))) for name, code in (x.split(':') for x in '''
+    space:20 exclam:21 quotedbl:22 numbersign:23 dollar:24 percent:25 ampersand:26
+    quotesingle:27 quoteright:2019 parenleft:28 parenright:29 asterisk:2A plus:2B
+    comma:2C hyphen:2D period:2E slash:2F zero:30 one:31 two:32 three:33 four:34
+    five:35 six:36 seven:37 eight:38 nine:39 colon:3A semicolon:3B less:3C equal:3D
+    greater:3E question:3F at:40 bracketleft:5B backslash:5C bracketright:5D
+    asciicircum:5E underscore:5F grave:60 quoteleft:2018 braceleft:7B bar:7C
+    braceright:7D asciitilde:7E exclamdown:A1 cent:A2 sterling:A3 fraction:2044
+    yen:A5 florin:192 section:A7 currency:A4 quotedblleft:201C guilsinglleft:2039
+    guilsinglright:203A fi:FB01 fl:FB02 ff:FB00 ffi:FB03 ffl:FB04 endash:2013
+    dagger:2020 daggerdbl:2021 periodcentered:B7 paragraph:B6 bullet:2022
+    quotesinglbase:201A quotedblbase:201E quotedblright:201D guillemotleft:AB
+    guillemotright:BB ellipsis:2026 perthousand:2030 questiondown:BF acute:B4
+    circumflex:2C6 tilde:2DC macron:AF breve:2D8 dotaccent:2D9 dieresis:A8 ring:2DA
+    cedilla:B8 hungarumlaut:2DD ogonek:2DB caron:2C7 emdash:2014 AE:C6
+    ordfeminine:AA Lslash:141 Oslash:D8 OE:152 ordmasculine:BA ae:E6 dotlessi:131
+    dotlessj:237 lslash:142 oslash:F8 oe:153 germandbls:DF Aacute:C1 Acircumflex:C2
+    Adieresis:C4 Agrave:C0 Aring:C5 Atilde:C3 Ccedilla:C7 Eacute:C9 Ecircumflex:CA
+    Edieresis:CB Egrave:C8 Eth:D0 Iacute:CD Icircumflex:CE Idieresis:CF Igrave:CC
+    Ntilde:D1 Oacute:D3 Ocircumflex:D4 Odieresis:D6 Ograve:D2 Otilde:D5 Scaron:160
+    Thorn:DE Uacute:DA Ucircumflex:DB Udieresis:DC Ugrave:D9 Yacute:DD Ydieresis:178
+    Zcaron:17D aacute:E1 acircumflex:E2 adieresis:E4 agrave:E0 aring:E5 atilde:E3
+    ccedilla:E7 eacute:E9 ecircumflex:EA edieresis:EB egrave:E8 eth:F0 iacute:ED
+    icircumflex:EE idieresis:EF igrave:EC ntilde:F1 oacute:F3 ocircumflex:F4
+    odieresis:F6 ograve:F2 otilde:F5 scaron:161 thorn:FE uacute:FA ucircumflex:FB
+    udieresis:FC ugrave:F9 yacute:FD ydieresis:FF zcaron:17E brokenbar:A6
+    copyright:A9 degree:B0 divide:F7 logicalnot:AC minus:2212 mu:B5 multiply:D7
+    onehalf:BD onequarter:BC threequarters:BE onesuperior:B9 twosuperior:B2
+    threesuperior:B3 plusminus:B1 registered:AE trademark:2122 Euro:20AC
+    nbspace:A0 sfthyphen:AD Delta:2206 Omega:2126 pi:3C0 lozenge:25CA radical:221A
+    summation:2211 product:220F partialdiff:2202 infinity:221E integral:222B
+    approxequal:2248 notequal:2260 lessequal:2264 greaterequal:2265
+'''.split()))
+
+def glyphtext(name):
+    ''' Return the unicode text for a glyph name, or None.
+    '''
+    result = _glyphs.get(name)
+    if result is not None:
+        return result
+    name = name.split('.')[0]
+    if '_' in name:
+        # Ligatures, e.g. f_f_i
+        parts = [glyphtext(x) for x in name.split('_')]
+        if None not in parts:
+            return u''.join(parts)
+        return None
+    if len(name) == 1 and name.isalpha():
+        return unicode(name)
+    try:
+        if name.startswith('uni') and len(name) >= 7 and not (len(name) - 3) % 4:
+            return binascii.unhexlify(name[3:]).decode('utf-16-be')
+        if name.startswith('u') and 5 <= len(name) <= 7:
+            return ('\\U%08x' % int(name[1:], 16)).decode('unicode-escape')
+    except (ValueError, TypeError, UnicodeError):
+        pass
+    return _glyphs.get(name)
+
+# Undefined codes are mapped to this, which charmap_decode skips
+_undefined = u'\ufffe'
+
+def _codetable(decode):
+    table = [(x >= 32 and decode(chr(x)) or _undefined) for x in range(256)]
+    return [x != u'\ufffd' and x or _undefined for x in table]
+
+_standard = _codetable(lambda x: x < '\x7f' and unicode(x) or _undefined)
+_standard[0x27] = _glyphs['quoteright']
+_standard[0x60] = _glyphs['quoteleft']
+for _code, _name in enumerate('''
+    exclamdown cent sterling fraction yen florin section currency quotesingle
+    quotedblleft guillemotleft guilsinglleft guilsinglright fi fl - endash dagger
+    daggerdbl periodcentered - paragraph bullet quotesinglbase quotedblbase
+    quotedblright guillemotright ellipsis perthousand - questiondown - grave acute
+    circumflex tilde macron breve dotaccent dieresis - ring cedilla - hungarumlaut
+    ogonek caron emdash - - - - - - - - - - - - - - - - AE - ordfeminine - - - -
+    Lslash Oslash OE ordmasculine - - - - - ae - - - dotlessi - - lslash oslash oe
+    germandbls'''.split()):
+    if _name != '-':
+        _standard[0xA1 + _code] = _glyphs[_name]
+
+_encodings = {
+    PdfName.StandardEncoding: _standard,
+    PdfName.WinAnsiEncoding: _codetable(lambda x: x.decode('cp1252', 'replace')),
+    PdfName.MacRomanEncoding: _codetable(lambda x: x.decode('mac_roman', 'replace')),
+    PdfName.PDFDocEncoding: _codetable(lambda x: PdfString.pdfdoc_table[ord(x)]),
+}
+
+#####################################################################
+# CMaps
+
+class CMap(object):
+    ''' The parts of a CMap that text extraction uses:  the
+        codespace ranges (as (low, high) strings), and the
+        mapping of codes to unicode text from a ToUnicode CMap.
+    '''
+    maxrange = 1 << 16
+
+    def __init__(self, data):
+        self.codespace = []
+        self.map = {}
+        section = None
+        operands = []
+        for token in tokens(data):
+            if token in ('begincodespacerange', 'beginbfchar', 'beginbfrange'):
+                section = token
+                operands = []
+            elif section is not None and token == 'end' + section[5:]:
+                try:
+                    getattr(self, section[5:])(operands)
+                except (ValueError, TypeError, IndexError), s:
+                    log.warning('Bad %s in CMap: %s' % (section, s))
+                section = None
+            elif section is not None:
+                operands.append(token)
+
+    def code(self, token):
+        return PdfString(token).decode()
+
+    def text(self, token):
+        if token[0] == '/':
+            return glyphtext(token[1:]) or u''
+        return self.code(token).decode('utf-16-be', 'replace')
+
+    def codespacerange(self, operands):
+        code = self.code
+        for index in range(0, len(operands) - 1, 2):
+            self.codespace.append((code(operands[index]), code(operands[index + 1])))
+
+    def bfchar(self, operands):
+        code, text, result = self.code, self.text, self.map
+        for index in range(0, len(operands) - 1, 2):
+            result[code(operands[index])] = text(operands[index + 1])
+
+    def bfrange(self, operands, hexlify=binascii.hexlify, unhexlify=binascii.unhexlify):
+        code, text, result = self.code, self.text, self.map
+        index = 0
+        while index + 2 < len(operands):
+            low, high, dest = operands[index:index + 3]
+            low, high = code(low), code(high)
+            size = len(low)
+            start = int(hexlify(low), 16)
+            count = min(int(hexlify(high), 16) - start + 1, self.maxrange)
+            codes = [unhexlify('%0*x' % (2 * size, start + x)) for x in range(count)]
+            if dest == '[':
+                end = operands.index(']', index)
+                for key, value in zip(codes, operands[index + 3:end]):
+                    result[key] = text(value)
+                index = end + 1
+                continue
+            dest = code(dest)
+            first = int(hexlify(dest), 16)
+            size = len(dest)
+            for x, key in enumerate(codes):
+                value = unhexlify('%0*x' % (2 * size, first + x))
+                result[key] = value.decode('utf-16-be', 'replace')
+            index += 3
+
+    def splitter(self):
+        ''' Return a function that splits a string into codes,
+            using the codespace ranges (two bytes if there
+            are none).
+        '''
+        lengths = set(len(x) for x, y in self.codespace) or set([2])
+        if len(lengths) != 1:
+            ranges = [(len(x), x, y) for x, y in self.codespace]
+            def split(data):
+                result = []
+                index = 0
+                while index < len(data):
+                    for size, low, high in ranges:
+                        code = data[index:index + size]
+                        if len(code) == size and all(a <= b <= c for a, b, c in zip(low, code, high)):
+                            break
+                    else:
+                        code = data[index:index + max(lengths)]
+                    result.append(code)
+                    index += len(code)
+                return result
+            return split
+        size, = lengths
+        def split(data):
+            return [data[x:x + size] for x in xrange(0, len(data), size)]
+        return split
+
+_cmapcache = OrderedDict()
+
+def getcmap(data, maxcached=256, sha1=hashlib.sha1):
+    ''' Return the parsed CMap for CMap stream data, from the
+        cache if the same data has been parsed before.
+    '''
+    key = sha1(data).digest()
+    result = _cmapcache.pop(key, None)
+    if result is None:
+        result = CMap(data)
+    _cmapcache[key] = result
+    if len(_cmapcache) > maxcached:
+        _cmapcache.popitem(last=False)
+    return result
+
+#####################################################################
+# Fonts
+
+class FontDecoder(object):
+    ''' Decodes the strings shown in one font to unicode.
+    '''
+
+    def __init__(self, font, isinstance=isinstance, PdfDict=PdfDict):
+        tounicode = None
+        data = isinstance(font.ToUnicode, PdfDict) and font.ToUnicode.decoded
+        if data:
+            tounicode = getcmap(data).map
+        if font.Subtype == PdfName.Type0:
+            encoding = font.Encoding
+            self.unicodecodes = False
+            if isinstance(encoding, PdfDict):
+                data = encoding.decoded
+                split = getcmap(data or '').splitter()
+            else:
+                split = CMap('').splitter()
+                # Predefined CMaps whose codes are already unicode
+                self.unicodecodes = encoding is not None and (
+                                        'UCS2' in encoding or 'UTF16' in encoding)
+            self.split = split
+            self.map = tounicode or {}
+            self.decode = self.decode_composite
+        else:
+            self.table = self.simpletable(font, tounicode or {})
+
+    def simpletable(self, font, tounicode):
+        ''' Return a charmap_decode table for a simple font.
+        '''
+        encoding = font.Encoding
+        differences = None
+        if isinstance(encoding, PdfDict):
+            differences = encoding.Differences
+            encoding = encoding.BaseEncoding
+        table = list(_encodings.get(encoding, _standard))
+        if isinstance(differences, PdfArray):
+            code = 0
+            for item in differences:
+                if isinstance(item, basestring) and item.startswith('/'):
+                    if code < 256:
+                        table[code] = glyphtext(item[1:]) or _undefined
+                    code += 1
+                else:
+                    code = int(item)
+        for code, text in tounicode.iteritems():
+            if len(code) == 1:
+                table[ord(code)] = text or _undefined
+        if max(len(x) for x in table) == 1:
+            return u''.join(table)
+        return dict((x, y) for x, y in enumerate(table) if y != _undefined)
+
+    def decode(self, data, charmap_decode=codecs.charmap_decode):
+        return charmap_decode(data, 'ignore', self.table)[0]
+
+    def decode_composite(self, data):
+        get = self.map.get
+        if self.unicodecodes:
+            return u''.join([get(x) or x.decode('utf-16-be', 'ignore') for x in self.split(data)])
+        return u''.join([get(x, u'') for x in self.split(data)])
+
+_nofont = FontDecoder(PdfDict(Encoding=PdfName.PDFDocEncoding))
+
+#####################################################################
+# Pages
+
+class _PageText(object):
+    ''' Collects the text of one page.
+    '''
+
+    def __init__(self, fonts):
+        self.fonts = fonts
+        self.result = []
+        self.y = 0.0
+        self.lasty = None
+        self.pending = None
+        self.forms = set()
+
+    def decoder(self, resources, name):
+        fonts = isinstance(resources, PdfDict) and resources.Font
+        font = isinstance(fonts, PdfDict) and fonts[name]
+        if not isinstance(font, PdfDict):
+            return _nofont
+        info = self.fonts.get(id(font))
+        if info is None:
+            try:
+                info = self.fonts[id(font)] = font, FontDecoder(font)
+            except Exception, s:
+                log.warning('Cannot decode text in font %s: %s' % (name, s))
+                info = self.fonts[id(font)] = font, _nofont
+        return info[1]
+
+    def show(self, decoder, token, PdfString=PdfString):
+        text = decoder.decode(PdfString(token).decode())
+        if not text:
+            return
+        result = self.result
+        if result:
+            if self.lasty is not None and self.y != self.lasty:
+                self.pending = u'\n'
+            if self.pending is not None and not result[-1][-1:].isspace():
+                result.append(self.pending)
+        self.pending = None
+        self.lasty = self.y
+        result.append(text)
+
+    def newline(self):
+        self.pending = u'\n'
+        self.lasty = None
+
+    def run(self, data, resources, decoder=_nofont, float=float):
+        show = self.show
+        stack = []
+        for operands, operator in instructions(data):
+            try:
+                if operator == 'Tj':
+                    show(decoder, operands[-1])
+                elif operator == 'TJ':
+                    for item in operands[1:-1]:
+                        if item[0] in '(<':
+                            show(decoder, item)
+                        elif float(item) < -200 and self.pending is None:
+                            self.pending = u' '
+                elif operator == 'Tf':
+                    decoder = self.decoder(resources, operands[0])
+                elif operator == 'Td' or operator == 'TD':
+                    x, y = float(operands[-2]), float(operands[-1])
+                    self.y += y
+                    if not y and x > 0 and self.pending is None:
+                        self.pending = u' '
+                elif operator == 'Tm':
+                    y = float(operands[-1])
+                    if y == self.y and self.pending is None:
+                        self.pending = u' '
+                    self.y = y
+                elif operator == 'T*':
+                    self.newline()
+                elif operator == "'" or operator == '"':
+                    self.newline()
+                    show(decoder, operands[-1])
+                elif operator == 'BT':
+                    self.y = 0.0
+                elif operator == 'q':
+                    stack.append(decoder)
+                elif operator == 'Q':
+                    decoder = stack and stack.pop() or decoder
+                elif operator == 'Do':
+                    self.form(resources, operands[-1], decoder)
+            except (ValueError, IndexError), s:
+                log.warning('Bad operands for %s in content stream: %s' % (operator, s))
+
+    def form(self, resources, name, decoder):
+        xobjects = isinstance(resources, PdfDict) and resources.XObject
+        form = isinstance(xobjects, PdfDict) and xobjects[name]
+        if not isinstance(form, PdfDict) or form.Subtype != PdfName.Form or id(form) in self.forms:
+            return
+        data = form.decoded
+        if data is None:
+            return
+        self.forms.add(id(form))
+        try:
+            self.run(data, form.Resources or resources, decoder)
+        finally:
+            self.forms.discard(id(form))
+
+def pagetext(page, fonts=None):
+    ''' Return the text of a page.  fonts is a dictionary
+        that keeps the font decoders, to share them between
+        pages.
+    '''
+    if fonts is None:
+        fonts = {}
+    contents = page.Contents
+    if not isinstance(contents, PdfArray):
+        contents = [contents]
+    datas = [x.decoded for x in contents if isinstance(x, PdfDict)]
+    collector = _PageText(fonts)
+    collector.run('\n'.join(x for x in datas if x), page.inheritable.Resources)
+    return u''.join(collector.result)
+
+def itertext(reader):
+    ''' Yield (pagenum, text) for each page of a document,
+        starting with page 1.
+    '''
+    fonts = {}
+    for pagenum, page in enumerate(reader.iterpages()):
+        yield pagenum + 1, pagetext(page, fonts)
+
+#####################################################################
+# Many files
+
+def _filetext(fname):
+    with PdfReader(fname) as reader:
+        return [text for pagenum, text in itertext(reader)]
+
+def iterfiles(fnames, workers=None):
+    ''' Yield (fname, list of page texts) for a list of files
+        (or all the .pdf files in a directory), in order, using
+        a pool of workers processes (default: one per CPU).
+        The list is None for files that could not be read.
+    '''
+    return mapfiles(_filetext, fnames, workers)
@@ -15,6 +15,7 @@ from __future__ import generators
 import re
 import itertools
 from pdfrw.objects import PdfString, PdfObject
+from pdfrw.objects.pdfname import intern
 from pdfrw.errors import log, PdfParseError
 
 def linepos(fdata, loc):
@@ -71,23 +72,28 @@ class PdfTokens(object):
             cache[result] = result
         return result
 
-    def fixname(self, cache, token, constructor, splitname=splitname, join=''.join, cacheobj=_cacheobj):
+    def fixname(self, cache, token, constructor, splitname=splitname, join=''.join):
         ''' Inside name tokens, a '#' character indicates that
             the next two bytes are hex characters to be used
             to form the 'real' character.
         '''
+        # These are not shared with PdfName, because they keep
+        # their original spelling, and are cached by it.
+        result = cache.get(token)
+        if result is not None:
+            return result
         substrs = splitname(token)
         if '#' in join(substrs[::2]):
             self.warning('Invalid /Name token')
             return token
         substrs[1::2] = (chr(int(x, 16)) for x in substrs[1::2])
-        result = cacheobj(cache, join(substrs), constructor)
+        result = cache[token] = constructor(join(substrs))
         result.encoded = token
         return result
 
     def _gettoks(self, startloc, cacheobj=_cacheobj,
                        delimiters=delimiters, findtok=findtok, findparen=findparen,
-                       PdfString=PdfString, PdfObject=PdfObject):
+                       PdfString=PdfString, PdfObject=PdfObject, intern=intern):
         ''' Given a source data string and a location inside it,
             gettoks generates tokens.  Each token is a tuple of the form:
              <starting file loc>, <ending file loc>, <token string>
@@ -102,7 +108,6 @@ class PdfTokens(object):
         '''
         fdata = self.fdata
         current = self.current = [(startloc, startloc)]
-        namehandler = (cacheobj, self.fixname)
         cache = {}
         while 1:
             for match in findtok(fdata, current[0][1]):
@@ -113,8 +118,11 @@ class PdfTokens(object):
                     token = cacheobj(cache, token, PdfObject)
                 elif firstch in '/<(%':
                     if firstch == '/':
-                        # PDF Name
-                        token = namehandler['#' in token](cache, token, PdfObject)
+                        # PDF Name -- shared with PdfName, if it has no escapes
+                        if '#' in token:
+                            token = self.fixname(cache, token, PdfObject)
+                        else:
+                            token = intern(token, cache)
                     elif firstch == '<':
                         # << dict delim, or < hex string >
                         if token[1:2] != '<':
@@ -33,9 +33,9 @@ Notes:
         via repeated calls to makerl.  This is great for
         not putting too many objects into the
         new PDF, but not so good if you are modifying
-        objects for different pages.  Then you
-        need to do your own deep copying (of circular
-        structures).  You're on your own.
+        objects for different pages.  Then you can
+        use pdfrw.clone.clone() to make a separate
+        copy of the objects for each page.
 
     2) ReportLab seems weird about FormXObjects.
        They pass around a partial name instead of the
@@ -3,50 +3,734 @@
 # MIT license -- See LICENSE.txt for details
 
 '''
-Currently, this sad little file only knows how to decompress
-using the flate (zlib) algorithm.  Maybe more later, but it's
-not a priority for me...
+Decoders for the PDF stream filters.
+
+The decoders are kept in the filters dictionary, keyed by filter
+name, so that more can be added.  Each one is called with the
+encoded data and the /DecodeParms dictionary for the filter (or
+None), and returns the decoded data, or raises an exception if
+the data is bad.
+
+uncompress() applies the filters of each stream in order, and stops
+at the first one it does not know (such as /DCTDecode, which is left
+for the image viewer).
+
+The decoded property of a stream dictionary decodes just that one
+stream, leaving the encoded data in place, and keeps the result in
+decodecache.
+
+iterdecode() decodes a stream in fixed-size chunks, using the
+incremental decoders in iterfilters, so that huge streams can be
+processed in a fixed amount of memory, and can be cut off at a
+maximum size.
+
+uncompress() can decode streams in several threads at once (zlib
+and NumPy release the GIL while they work).
+
+If NumPy is installed, it is used to undo the PNG and TIFF predictors.
+Otherwise they are undone a byte at a time in Python.
 '''
+import sys
 import zlib
-from pdfrw.objects import PdfDict, PdfName
-from pdfrw.errors import log
+import struct
+import binascii
+from collections import OrderedDict, deque
+from pdfrw.objects import PdfDict, PdfName, PdfArray, PdfObject
+from pdfrw.errors import PdfParseError, log
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-def streamobjects(mylist, isinstance=isinstance, PdfDict=PdfDict):
+def streamobjects(mylist, isinstance=isinstance, PdfDict=PdfDict, vars=vars):
     for obj in mylist:
-        if isinstance(obj, PdfDict) and obj.stream is not None:
+        if isinstance(obj, PdfDict) and vars(obj).get('stream') is not None:
             yield obj
 
-def uncompress(mylist, warnings=set(), flate = PdfName.FlateDecode,
-                    decompress=zlib.decompressobj, isinstance=isinstance, list=list, len=len):
+def getparm(parms, name, default, int=int):
+    if parms is not None:
+        value = parms[name]
+        if value is not None:
+            return int(value)
+    return default
+
+#####################################################################
+# Predictors
+
+def _png_row(kind, row, prev, bpp, xrange=xrange, abs=abs):
+    ''' Undo the PNG filter for one row (a bytearray), in place.
+        prev is the previous row, after it has been undone.
+    '''
+    size = len(row)
+    if kind == 0:
+        pass
+    elif kind == 1:
+        for x in xrange(bpp, size):
+            row[x] = (row[x] + row[x - bpp]) & 255
+    elif kind == 2:
+        for x in xrange(size):
+            row[x] = (row[x] + prev[x]) & 255
+    elif kind == 3:
+        for x in xrange(bpp):
+            row[x] = (row[x] + (prev[x] >> 1)) & 255
+        for x in xrange(bpp, size):
+            row[x] = (row[x] + ((row[x - bpp] + prev[x]) >> 1)) & 255
+    elif kind == 4:
+        for x in xrange(bpp):
+            row[x] = (row[x] + prev[x]) & 255
+        for x in xrange(bpp, size):
+            a = row[x - bpp]
+            b = prev[x]
+            c = prev[x - bpp]
+            p = a + b - c
+            pa = abs(p - a)
+            pb = abs(p - b)
+            pc = abs(p - c)
+            if pa <= pb and pa <= pc:
+                pass
+            elif pb <= pc:
+                a = b
+            else:
+                a = c
+            row[x] = (row[x] + a) & 255
+    else:
+        raise ValueError('Invalid PNG predictor row type %d' % kind)
+
+def _png_python(data, bpp, rowlen, rows, bytearray=bytearray):
+    stride = rowlen + 1
+    prev = bytearray(rowlen)
+    result = []
+    for start in xrange(0, rows * stride, stride):
+        row = bytearray(data[start + 1:start + stride])
+        _png_row(ord(data[start]), row, prev, bpp)
+        result.append(row)
+        prev = row
+    return str(bytearray().join(result))
+
+def _png_numpy(data, bpp, rowlen, rows):
+    ''' Undo runs of rows with the same filter type together.
+        Sub and Up are running sums (modulo 256) across or down
+        the rows.  Average and Paeth rows are done one at a time.
+    '''
+    uint8 = numpy.uint8
+    image = numpy.frombuffer(data, uint8, rows * (rowlen + 1)).reshape(rows, rowlen + 1)
+    kinds = image[:, 0]
+    result = image[:, 1:].copy()
+    starts = [0] + list(numpy.flatnonzero(numpy.diff(kinds)) + 1)
+    ends = starts[1:] + [rows]
+    prev = numpy.zeros(rowlen, uint8)
+    for start, end in zip(starts, ends):
+        kind = kinds[start]
+        block = result[start:end]
+        if kind == 1 and not rowlen % bpp:
+            pixels = block.reshape(end - start, rowlen // bpp, bpp)
+            pixels.cumsum(axis=1, dtype=uint8, out=pixels)
+        elif kind == 2:
+            block[0] += prev
+            block.cumsum(axis=0, dtype=uint8, out=block)
+        elif kind:
+            for index in xrange(start, end):
+                row = bytearray(result[index].tostring())
+                _png_row(kind, row, bytearray(prev.tostring()), bpp)
+                result[index] = numpy.frombuffer(row, uint8)
+                prev = result[index]
+        prev = result[end - 1]
+    return result.tostring()
+
+def png_unpredict(data, colors, bpc, columns):
+    ''' Undo the PNG predictors (/Predictor 10 to 15).  Each
+        row starts with a byte giving its own filter type.
+    '''
+    bpp = (colors * bpc + 7) // 8
+    rowlen = (colors * bpc * columns + 7) // 8
+    extra = len(data) % (rowlen + 1)
+    if extra:
+        # Pad a short final row
+        data += '\0' * (rowlen + 1 - extra)
+    rows = len(data) // (rowlen + 1)
+    if numpy is not None:
+        return _png_numpy(data, bpp, rowlen, rows)
+    return _png_python(data, bpp, rowlen, rows)
+
+def tiff_unpredict(data, colors, bpc, columns):
+    ''' Undo the TIFF predictor (/Predictor 2), which stores
+        the difference from the same component of the
+        previous pixel in the row.
+    '''
+    if bpc not in (8, 16):
+        raise ValueError('TIFF predictor not supported for %d bits per component' % bpc)
+    rowlen = colors * bpc // 8 * columns
+    rows = len(data) // rowlen
+    size = rows * rowlen
+    data, extra = data[:size], data[size:]
+    if numpy is not None:
+        dtype = bpc == 8 and numpy.uint8 or numpy.dtype('>u2')
+        image = numpy.frombuffer(data, dtype).reshape(rows, columns, colors)
+        image = image.cumsum(axis=1, dtype=image.dtype.newbyteorder('='))
+        return image.astype(dtype).tostring() + extra
+    if bpc == 8:
+        image = bytearray(data)
+        for start in xrange(0, size, rowlen):
+            for x in xrange(start + colors, start + rowlen):
+                image[x] = (image[x] + image[x - colors]) & 255
+        return str(image) + extra
+    count = size // 2
+    image = list(struct.unpack('>%dH' % count, data))
+    rowlen //= 2
+    for start in xrange(0, count, rowlen):
+        for x in xrange(start + colors, start + rowlen):
+            image[x] = (image[x] + image[x - colors]) & 0xFFFF
+    return struct.pack('>%dH' % count, *image) + extra
+
+def unpredict(data, parms):
+    ''' Undo the predictor given in the decode parameters
+        of a Flate or LZW filter, if any.
+    '''
+    predictor = getparm(parms, PdfName.Predictor, 1)
+    if predictor == 1:
+        return data
+    colors = getparm(parms, PdfName.Colors, 1)
+    bpc = getparm(parms, PdfName.BitsPerComponent, 8)
+    columns = getparm(parms, PdfName.Columns, 1)
+    if predictor >= 10:
+        return png_unpredict(data, colors, bpc, columns)
+    if predictor == 2:
+        return tiff_unpredict(data, colors, bpc, columns)
+    raise ValueError('Invalid predictor %d' % predictor)
+
+#####################################################################
+# Filters
+
+def flate_decode(data, parms, decompressobj=zlib.decompressobj):
+    dco = decompressobj()
+    result = dco.decompress(data)
+    if dco.unused_data.strip():
+        raise ValueError('Unconsumed compression data: %s' % repr(dco.unused_data[:20]))
+    return unpredict(result, parms)
+
+def _lzw(chunks, early, chunksize, chr=chr, len=len):
+    ''' Decode LZW data, yielding the output whenever there
+        are at least chunksize bytes of it.  Codes start out 9
+        bits wide and grow to 12 bits.  With /EarlyChange 1 (the
+        default) each change of width happens one code early.
+        Once the table is full (4096 codes), no more entries are
+        added until the encoder sends a clear code.
+    '''
+    initial = [chr(x) for x in range(256)] + [None, None]
+    table = initial[:]
+    result = []
+    append = result.append
+    size = value = bits = 0
+    width = 9
+    prev = None
+    for data in chunks:
+        for byte in bytearray(data):
+            value = (value << 8) | byte
+            bits += 8
+            while bits >= width:
+                bits -= width
+                code = value >> bits
+                value &= (1 << bits) - 1
+                if code == 256:
+                    table = initial[:]
+                    width = 9
+                    prev = None
+                    continue
+                if code == 257:
+                    yield ''.join(result)
+                    return
+                if code < len(table):
+                    entry = table[code]
+                    if prev is not None and len(table) < 4096:
+                        table.append(prev + entry[0])
+                elif code == len(table) and prev is not None:
+                    entry = prev + prev[0]
+                    table.append(entry)
+                else:
+                    raise ValueError('Invalid LZW code %d' % code)
+                append(entry)
+                prev = entry
+                width = min(12, (len(table) + early).bit_length())
+                size += len(entry)
+                if size >= chunksize:
+                    yield ''.join(result)
+                    del result[:]
+                    size = 0
+    yield ''.join(result)
+
+def lzw_decode(data, parms, maxint=sys.maxint):
+    early = getparm(parms, PdfName.EarlyChange, 1)
+    return unpredict(''.join(_lzw([data], early, maxint)), parms)
+
+def asciihex_decode(data, parms, unhexlify=binascii.unhexlify):
+    data = ''.join(data.split('>', 1)[0].split())
+    if len(data) & 1:
+        # Missing final digit is assumed to be zero
+        data += '0'
+    try:
+        return unhexlify(data)
+    except (TypeError, binascii.Error):
+        raise ValueError('Invalid ASCIIHexDecode data')
+
+def ascii85_decode(data, parms, pack=struct.pack, ord=ord):
+    data = ''.join(data.split())
+    if data.startswith('<~'):
+        data = data[2:]
+    data = data.split('~', 1)[0].replace('z', '!!!!!')
+    padding = -len(data) % 5
+    data += 'u' * padding
+    words = []
+    append = words.append
+    for start in xrange(0, len(data), 5):
+        a, b, c, d, e = [ord(x) - 33 for x in data[start:start + 5]]
+        append((((a * 85 + b) * 85 + c) * 85 + d) * 85 + e)
+    result = pack('>%dL' % len(words), *words)
+    return result[:len(result) - padding]
+
+def _runlength(data, ord=ord, len=len):
+    ''' Decode all the complete runs in data.  Return the
+        output, the data left over, and whether the
+        end-of-data marker was found.
+    '''
+    result = []
+    append = result.append
+    index = 0
+    size = len(data)
+    while index < size:
+        length = ord(data[index])
+        if length < 128:
+            end = index + length + 2
+            if end > size:
+                break
+            append(data[index + 1:end])
+        elif length > 128:
+            end = index + 2
+            if end > size:
+                break
+            append(data[index + 1] * (257 - length))
+        else:
+            return ''.join(result), '', True
+        index = end
+    return ''.join(result), data[index:], False
+
+def runlength_decode(data, parms):
+    result, extra, done = _runlength(data)
+    # Keep what there is of a truncated final run
+    return result + extra[1:]
+
+filters = {
+    PdfName.FlateDecode: flate_decode,
+    PdfName.LZWDecode: lzw_decode,
+    PdfName.ASCIIHexDecode: asciihex_decode,
+    PdfName.ASCII85Decode: ascii85_decode,
+    PdfName.RunLengthDecode: runlength_decode,
+}
+
+# Abbreviations used in inline images
+for abbrev, name in (('Fl', 'FlateDecode'), ('LZW', 'LZWDecode'),
+                     ('AHx', 'ASCIIHexDecode'), ('A85', 'ASCII85Decode'),
+                     ('RL', 'RunLengthDecode')):
+    filters[PdfName(abbrev)] = filters[PdfName(name)]
+
+#####################################################################
+# Streams
+
+def getfilters(obj, isinstance=isinstance, list=list, len=len, PdfDict=PdfDict):
+    ''' Return a list of (filter, parms) pairs for a stream.
+    '''
+    ftype = obj.Filter
+    if ftype is None:
+        return []
+    parms = obj.DecodeParms
+    if not isinstance(ftype, list):
+        ftype = [ftype]
+        parms = [parms]
+    elif not isinstance(parms, list):
+        parms = [parms]
+    parms = list(parms) + [None] * (len(ftype) - len(parms))
+    return [(x, isinstance(y, PdfDict) and y or None) for x, y in zip(ftype, parms)]
+
+def setfilters(obj, pairs, PdfNull=PdfObject('null')):
+    ''' Set the /Filter and /DecodeParms of a stream
+        from a list of (filter, parms) pairs.
+    '''
+    if len(pairs) == 1:
+        obj.Filter, obj.DecodeParms = pairs[0]
+    elif pairs:
+        obj.Filter = PdfArray([x for x, y in pairs])
+        parms = [y for x, y in pairs]
+        obj.DecodeParms = [x for x in parms if x is not None] and PdfArray(
+                                [x is None and PdfNull or x for x in parms]) or None
+    else:
+        obj.Filter = obj.DecodeParms = None
+
+def splitfilters(pairs, filters=filters, enumerate=enumerate):
+    ''' Split a list of (filter, parms) pairs into the leading
+        ones that are in filters, and the rest.
+    '''
+    for index, (ftype, parms) in enumerate(pairs):
+        if ftype not in filters:
+            return pairs[:index], pairs[index:]
+    return pairs, []
+
+def decode(data, pairs, filters=filters):
+    ''' Apply the filters in pairs (from getfilters()) to data,
+        in order, until one is found that we don't know.  Return
+        the data and a list of the pairs that were not applied.
+    '''
+    known, remaining = splitfilters(pairs, filters)
+    for ftype, parms in known:
+        data = filters[ftype](data, parms)
+    return data, remaining
+
+def _decodestream(obj, pairs, maxsize):
+    ''' Decode one stream for uncompress().  Return the data,
+        the filters that were not applied, and the exception
+        raised, if any.
+    '''
+    try:
+        if maxsize is None:
+            data, remaining = decode(obj.stream, pairs)
+        else:
+            known, remaining = splitfilters(pairs, iterfilters)
+            data = ''.join(iterdecode(obj, maxsize=maxsize, pairs=known))
+    except Exception, s:
+        return None, None, s
+    return data, remaining, None
+
+def readparms(pairs, PdfDict=PdfDict):
+    ''' Return a copy of a list of (filter, parms) pairs with
+        the parameters read in, so that worker threads can use
+        them without touching the reader.
+    '''
+    return [(x, y is not None and PdfDict(y.iteritems()) or None) for x, y in pairs]
+
+def inorder(func, jobs, workers):
+    ''' Call func(*job) for each job in a pool of threads, yielding
+        (job, result) in the original order.  Only a few more
+        jobs than there are workers are in progress at a time.
+    '''
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(workers)
+    try:
+        pending = deque()
+        for job in jobs:
+            pending.append((job, pool.apply_async(func, job)))
+            if len(pending) >= 2 * workers:
+                job, result = pending.popleft()
+                yield job, result.get()
+        while pending:
+            job, result = pending.popleft()
+            yield job, result.get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def uncompress(mylist, warnings=set(), len=len, spill=None, maxsize=None, workers=1):
+    ''' Decompress the streams in mylist in place.  If a
+        pdfrw.spill.SpillStore is given, the decompressed
+        streams are handed to it, so that large ones may
+        be moved out to disk.  Streams that would decode to
+        more than maxsize bytes are left alone.
+
+        If workers is more than 1, the streams are decoded in
+        that many threads, but the results (and any errors)
+        are still applied in order.
+    '''
     ok = True
-    for obj in streamobjects(mylist):
-        ftype = obj.Filter
-        if ftype is None:
+    jobs = ((obj, getfilters(obj)) for obj in streamobjects(mylist))
+    jobs = ((obj, pairs) for obj, pairs in jobs if pairs)
+    if workers > 1:
+        jobs = ((obj, readparms(pairs), maxsize) for obj, pairs in jobs)
+        results = inorder(_decodestream, jobs, workers)
+    else:
+        results = (((obj, pairs, maxsize), _decodestream(obj, pairs, maxsize))
+                        for obj, pairs in jobs)
+    for (obj, pairs, maxsize), (data, remaining, error) in results:
+        if error is not None:
+            log.error('%s %s' % (error, repr(obj.indirect)))
             continue
-        if isinstance(ftype, list) and len(ftype) == 1:
-            # todo: multiple filters
-            ftype = ftype[0]
-        parms = obj.DecodeParms
-        if ftype != flate or parms is not None:
-            msg = 'Not decompressing: cannot use filter %s with parameters %s' % (repr(ftype), repr(parms))
+        if remaining:
+            msg = 'Not decompressing: cannot use filter %s with parameters %s' % (
+                        repr(remaining[0][0]), repr(remaining[0][1]))
             if msg not in warnings:
                 warnings.add(msg)
                 log.warning(msg)
             ok = False
-        else:
-            dco = decompress()
-            error = None
-            try:
-                data = dco.decompress(obj.stream)
-            except Exception, s:
-                error = str(s)
-            if error is None:
-                assert not dco.unconsumed_tail
-                if dco.unused_data.strip():
-                    error = 'Unconsumed compression data: %s' % repr(dco.unused_data[:20])
-            if error is None:
-                obj.Filter = None
-                obj.stream = data
-            else:
-                log.error('%s %s' % (error, repr(obj.indirect)))
+            if len(remaining) == len(pairs):
+                continue
+        setfilters(obj, remaining)
+        obj.stream = data
+        if spill is not None:
+            spill.add(obj)
     return ok
+
+#####################################################################
+# Decoding in chunks
+
+def _aligned(chunks, unit, len=len):
+    ''' Regroup strings so that each one (except perhaps the
+        last) has a length that is a multiple of unit.
+    '''
+    pending = []
+    size = 0
+    for data in chunks:
+        if not data:
+            continue
+        pending.append(data)
+        size += len(data)
+        if size >= unit:
+            data = ''.join(pending)
+            end = size - size % unit
+            yield data[:end]
+            data = data[end:]
+            pending = data and [data] or []
+            size = len(data)
+    if pending:
+        yield ''.join(pending)
+
+def _limited(chunks, limit, len=len):
+    ''' Pass strings through, raising ValueError once
+        there are more than limit bytes of them.
+    '''
+    total = 0
+    for data in chunks:
+        total += len(data)
+        if total > limit:
+            raise ValueError('Predictor input is more than %d bytes' % limit)
+        yield data
+
+def rechunk(chunks, chunksize, len=len):
+    ''' Regroup strings into pieces of chunksize bytes
+        (the last one may be shorter).
+    '''
+    pending = []
+    size = 0
+    for data in chunks:
+        if not data:
+            continue
+        pending.append(data)
+        size += len(data)
+        if size >= chunksize:
+            data = ''.join(pending)
+            end = size - size % chunksize
+            for start in xrange(0, end, chunksize):
+                yield data[start:start + chunksize]
+            data = data[end:]
+            pending = data and [data] or []
+            size = len(data)
+    if pending:
+        yield ''.join(pending)
+
+def iterunpredict(chunks, parms, chunksize=1 << 16, maxsize=None, rowchunks=256):
+    ''' Undo the predictor (if any), a few rows at a time.
+        Each row is held in memory whole, so a row longer than
+        maxsize (or than rowchunks chunks) is rejected before
+        anything is decoded, and the input is counted against
+        maxsize before the predictor is undone.
+    '''
+    predictor = getparm(parms, PdfName.Predictor, 1)
+    if predictor == 1:
+        return chunks
+    colors = getparm(parms, PdfName.Colors, 1)
+    bpc = getparm(parms, PdfName.BitsPerComponent, 8)
+    columns = getparm(parms, PdfName.Columns, 1)
+    if predictor >= 10:
+        rowlen = (colors * bpc * columns + 7) // 8
+        unit = rowlen + 1
+    elif predictor == 2:
+        rowlen = unit = max(1, colors * bpc // 8 * columns)
+    else:
+        raise ValueError('Invalid predictor %d' % predictor)
+    limit = chunksize * rowchunks
+    if maxsize is not None:
+        limit = min(limit, maxsize)
+        # Each row of output takes unit bytes of input
+        chunks = _limited(chunks, (maxsize // max(rowlen, 1) + 1) * unit)
+    if rowlen > limit:
+        raise ValueError('Predictor rows of %d bytes are too long' % rowlen)
+    if predictor >= 10:
+        return _iterpng(chunks, colors, bpc, columns)
+    return (tiff_unpredict(x, colors, bpc, columns) for x in _aligned(chunks, rowlen))
+
+def _iterpng(chunks, colors, bpc, columns):
+    # Each group of rows is preceded by the previous row, unfiltered.
+    rowlen = (colors * bpc * columns + 7) // 8
+    prev = '\0' * rowlen
+    for data in _aligned(chunks, rowlen + 1):
+        data = png_unpredict('\0' + prev + data, colors, bpc, columns)
+        yield data[rowlen:]
+        prev = data[-rowlen:]
+
+def iterflate(chunks, parms, chunksize, maxsize=None, decompressobj=zlib.decompressobj):
+    def inflate():
+        dco = decompressobj()
+        for data in chunks:
+            while data:
+                yield dco.decompress(data, chunksize)
+                data = dco.unconsumed_tail
+            if dco.unused_data.strip():
+                raise ValueError('Unconsumed compression data: %s' % repr(dco.unused_data[:20]))
+        yield dco.flush()
+    return iterunpredict(inflate(), parms, chunksize, maxsize)
+
+def iterlzw(chunks, parms, chunksize, maxsize=None):
+    early = getparm(parms, PdfName.EarlyChange, 1)
+    return iterunpredict(_lzw(chunks, early, chunksize), parms, chunksize, maxsize)
+
+def iterasciihex(chunks, parms, chunksize, maxsize=None):
+    def digits():
+        for data in chunks:
+            data = data.split('>', 1)
+            yield ''.join(data[0].split())
+            if len(data) > 1:
+                return
+    for data in _aligned(digits(), 2):
+        yield asciihex_decode(data, parms)
+
+def iterascii85(chunks, parms, chunksize, maxsize=None):
+    def chars():
+        first = True
+        for data in chunks:
+            data = ''.join(data.split())
+            if first and data:
+                first = False
+                if data.startswith('<~'):
+                    data = data[2:]
+            data = data.split('~', 1)
+            yield data[0].replace('z', '!!!!!')
+            if len(data) > 1:
+                return
+    for data in _aligned(chars(), 5):
+        yield ascii85_decode(data, parms)
+
+def iterrunlength(chunks, parms, chunksize, maxsize=None):
+    extra = ''
+    for data in chunks:
+        result, extra, done = _runlength(extra + data)
+        yield result
+        if done:
+            return
+    yield extra[1:]
+
+iterfilters = {
+    PdfName.FlateDecode: iterflate,
+    PdfName.LZWDecode: iterlzw,
+    PdfName.ASCIIHexDecode: iterasciihex,
+    PdfName.ASCII85Decode: iterascii85,
+    PdfName.RunLengthDecode: iterrunlength,
+}
+for abbrev, name in (('Fl', 'FlateDecode'), ('LZW', 'LZWDecode'),
+                     ('AHx', 'ASCIIHexDecode'), ('A85', 'ASCII85Decode'),
+                     ('RL', 'RunLengthDecode')):
+    iterfilters[PdfName(abbrev)] = iterfilters[PdfName(name)]
+
+def iterstream(obj, chunksize, vars=vars, len=len):
+    ''' Yield the (encoded) stream data of obj in chunks.
+        Spilled streams are read from disk a chunk at a time.
+    '''
+    stream = vars(obj).get('stream')
+    if stream is None:
+        return
+    size = len(stream)
+    if isinstance(stream, basestring):
+        for start in xrange(0, size, chunksize):
+            yield stream[start:start + chunksize]
+    else:
+        for start in xrange(0, size, chunksize):
+            yield stream.read(start, min(chunksize, size - start))
+
+def iterdecode(obj, chunksize=1 << 16, maxsize=None, pairs=None):
+    ''' Decode the stream of obj, yielding chunksize bytes at a
+        time (the last chunk may be shorter), so that a stream of
+        any size can be processed in a fixed amount of memory:
+
+            for chunk in iterdecode(obj):
+                f.write(chunk)
+
+        PdfParseError is raised if the stream has a filter that
+        we can't decode, if the data is bad, or if it decodes to
+        more than maxsize bytes.  To only apply some of the filters,
+        pass a list of (filter, parms) pairs (see getfilters()).
+    '''
+    if pairs is None:
+        pairs = getfilters(obj)
+    chunks = iterstream(obj, chunksize)
+    total = 0
+    try:
+        for ftype, parms in pairs:
+            func = iterfilters.get(ftype)
+            if func is None:
+                raise PdfParseError('Cannot decode filter %s in stream %s' %
+                                        (repr(ftype), repr(obj.indirect)))
+            chunks = func(chunks, parms, chunksize, maxsize)
+        for data in rechunk(chunks, chunksize):
+            total += len(data)
+            if maxsize is not None and total > maxsize:
+                raise PdfParseError('Stream %s decodes to more than %d bytes' %
+                                        (repr(obj.indirect), maxsize))
+            yield data
+    except (ValueError, struct.error, zlib.error), s:
+        raise PdfParseError('%s %s' % (s, repr(obj.indirect)))
+
+class DecodeCache(object):
+    ''' A cache of decoded stream data, holding at most
+        maxsize bytes (of decoded and encoded data).  Entries
+        are kept by the id of the stream dictionary, and only
+        used if the dictionary still has the same stream and
+        filters, so changed and reused dictionaries are decoded
+        again.  Streams that have been spilled to disk are not
+        kept in memory, and only their decoded size is counted.
+    '''
+    def __init__(self, maxsize=32 << 20):
+        self.maxsize = maxsize
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, obj, id=id, len=len, vars=vars, isinstance=isinstance,
+                 basestring=basestring):
+        ''' Return the decoded stream of obj, or None if
+            it can't be decoded.
+        '''
+        # For a spilled stream, this is the SpilledStream, which
+        # stays the same, rather than data read back from disk.
+        stream = vars(obj).get('stream')
+        ftype = obj.Filter
+        if stream is None or ftype is None:
+            return obj.stream
+        parms = obj.DecodeParms
+        key = id(obj)
+        entries = self.entries
+        entry = entries.pop(key, None)
+        if (entry is not None and entry[0] is stream and
+                entry[1] is ftype and entry[2] is parms):
+            entries[key] = entry
+            return entry[3]
+        if entry is not None:
+            self.size -= entry[4]
+        try:
+            data, remaining = decode(obj.stream, getfilters(obj))
+        except Exception, s:
+            log.error('%s %s' % (s, repr(obj.indirect)))
+            return None
+        if remaining:
+            log.warning('Cannot decode stream %s: cannot use filter %s' %
+                            (repr(obj.indirect), repr(remaining[0][0])))
+            return None
+        size = len(data)
+        if isinstance(stream, basestring):
+            size += len(stream)
+        if size <= self.maxsize:
+            entries[key] = stream, ftype, parms, data, size
+            self.size += size
+            while self.size > self.maxsize:
+                entry = entries.popitem(last=False)[1]
+                self.size -= entry[4]
+        return data
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+decodecache = DecodeCache()
@@ -0,0 +1,69 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2012 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Run a function over many PDF files, in a pool of processes:
+
+    for fname, result in mapfiles(func, 'pdfdir', workers=4):
+        ...
+
+func(fname, *args) is called for each file, and the results are
+yielded in the order of the files.  If func raises an exception
+for a file, the error is logged and the result is None, so one bad
+file does not stop the others.  func and args must be picklable
+(e.g. func is defined at the top level of a module).
+'''
+
+import os
+from multiprocessing import Pool
+
+from pdfrw.errors import log
+
+
+def pdffiles(fnames):
+    ''' Return a list of file names as is, or (if it is
+        a string) all the .pdf files in that directory.
+    '''
+    if isinstance(fnames, basestring):
+        dirname = fnames
+        fnames = sorted(os.path.join(dirname, x) for x in os.listdir(dirname)
+                            if x.lower().endswith('.pdf'))
+    return fnames
+
+
+class _Call(object):
+    ''' A picklable func(fname, *args) that logs errors.
+    '''
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+    def __call__(self, fname):
+        try:
+            return fname, self.func(fname, *self.args)
+        except Exception, s:
+            log.error('%s failed on %s: %s' % (self.func.__name__, fname, s))
+            return fname, None
+
+
+def mapfiles(func, fnames, workers=None, args=()):
+    ''' Yield (fname, func(fname, *args)) for a list of files
+        (or all the .pdf files in a directory), in order, using
+        a pool of worker processes (default: one per CPU).
+        The result is None for files where func failed.
+    '''
+    call = _Call(func, tuple(args))
+    fnames = pdffiles(fnames)
+    if workers == 1:
+        for fname in fnames:
+            yield call(fname)
+        return
+    pool = Pool(workers)
+    try:
+        for result in pool.imap(call, fnames):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,62 @@
+'''
+Size and speed benchmark for the content stream optimizer.
+
+Run from the directory above like so:
+python -m tests.bench_content [count]
+
+Makes a content stream like the ones many generators write (six
+decimal places, the color and line width set again for every
+path, q/Q around everything), optimizes it, and reports the sizes
+before and after (plain and compressed), and the time it takes
+to parse each version.
+'''
+
+import sys
+import zlib
+import time
+import random
+
+from pdfrw.content import instructions, optimize
+
+
+def makecontent(count):
+    rnd = random.Random(0)
+    result = []
+    for index in range(count):
+        x, y = rnd.uniform(0, 600), rnd.uniform(0, 800)
+        result.append('q\n0.000000 0.000000 0.000000 RG\n1.000000 w\n'
+                      '%.6f %.6f m\n%.6f %.6f l\nS\nQ\nq\nQ\n' %
+                      (x, y, x + rnd.uniform(-50, 50), y + rnd.uniform(-50, 50)))
+        if index % 10 == 0:
+            result.append('BT\n/F1 10.000000 Tf\n1.000000 0.000000 0.000000 1.000000 '
+                          '%.6f %.6f Tm\n(label %d) Tj\nET\n' % (x, y, index))
+    return ''.join(result)
+
+
+def parsetime(data, repeat=3):
+    best = None
+    for x in range(repeat):
+        start = time.time()
+        for instruction in instructions(data):
+            pass
+        elapsed = time.time() - start
+        best = best is None and elapsed or min(best, elapsed)
+    return best
+
+
+def main(count=20000):
+    original = makecontent(count)
+    start = time.time()
+    lossless = optimize(original)
+    optimizetime = time.time() - start
+    rounded = optimize(original, 2)
+    print 'Optimizing took %.3f seconds' % optimizetime
+    print '%-20s %10s %10s %10s' % ('', 'bytes', 'deflated', 'parse (s)')
+    for name, data in (('original', original), ('optimized', lossless),
+                       ('optimized, 2 digits', rounded)):
+        print '%-20s %10d %10d %10.3f' % (name, len(data), len(zlib.compress(data)),
+                                          parsetime(data))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,37 @@
+'''
+Microbenchmarks for PDF name construction and
+attribute-style dictionary access.
+
+Run from the directory above like so:
+python -m tests.bench_names
+'''
+
+import timeit
+
+setup = '''
+from pdfrw import PdfName, PdfDict
+from pdfrw.tokens import PdfTokens
+page = PdfDict(Type=PdfName.Page, Resources=PdfDict(), MediaBox=[0, 0, 612, 792])
+fdata = '<</Type /Page /Resources 3 0 R /MediaBox [0 0 612 792] /Rotate 90>>\\n' * 1000
+'''
+
+tests = [
+    ('PdfName.Resources', 'PdfName.Resources'),
+    ("PdfName('Resources')", "PdfName('Resources')"),
+    ('page.Resources', 'page.Resources'),
+    ('page.Missing', 'page.Missing'),
+    ("page['/Resources']", "page['/Resources']"),
+    ('page.Type == PdfName.Page', 'page.Type == PdfName.Page'),
+    ('tokenize 1000 dicts', 'list(PdfTokens(fdata))'),
+]
+
+
+def main():
+    for title, stmt in tests:
+        number = 'tokenize' in title and 100 or 200000
+        best = min(timeit.repeat(stmt, setup, repeat=3, number=number))
+        print '%-30s %8.3f usec' % (title, best * 1e6 / number)
+
+
+if __name__ == '__main__':
+    main()
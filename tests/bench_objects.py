@@ -0,0 +1,83 @@
+'''
+Memory benchmark for the PDF object model.
+
+Run from the directory above like so:
+python -m tests.bench_objects [object count]
+
+Builds a document with a large number of small indirect
+arrays that refer to each other, reads all of it, and
+reports the peak memory use and the size of the
+per-object overhead.
+'''
+
+import gc
+import sys
+import time
+import resource
+
+from pdfrw import PdfReader, PdfArray
+
+
+def makepdf(count):
+    ''' Make a minimal PDF with count extra objects.  Each one is
+        an array of references to a few other ones (and a number),
+        so there are about 4 placeholders per object.
+    '''
+    parts = ['%PDF-1.3\n']
+    def add(objstr):
+        parts.append('%d 0 obj\n%s\nendobj\n' % (len(parts), objstr))
+    add('<</Type /Catalog /Pages 2 0 R /Extra 4 0 R>>')
+    add('<</Type /Pages /Kids [3 0 R] /Count 1>>')
+    add('<</Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]>>')
+    first = 4
+    for index in range(count):
+        num = first + index
+        refs = ' '.join('%d 0 R' % (first + (num * x) % count) for x in (3, 5, 7, 11))
+        add('[%s %d]' % (refs, index))
+    offsets = []
+    pos = len(parts[0])
+    for part in parts[1:]:
+        offsets.append(pos)
+        pos += len(part)
+    xref = ['xref\n0 %d\n' % (len(offsets) + 1), '0000000000 65535 f\r\n']
+    xref.extend('%010d 00000 n\r\n' % x for x in offsets)
+    trailer = 'trailer\n<</Size %d /Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n' % (len(offsets) + 1, pos)
+    return ''.join(parts + xref) + trailer
+
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main(count=200000):
+    fdata = makepdf(count)
+    gc.collect()
+    before = maxrss()
+    start = time.time()
+    reader = PdfReader(fdata=fdata)
+    reader.read_all()
+    for obj in reader.indirect_objects.itervalues():
+        if isinstance(obj, PdfArray):
+            obj[0]
+    elapsed = time.time() - start
+    after = maxrss()
+
+    placeholder = reader.findindirect(first_missing(reader), 0)
+    array = reader.indirect_objects[(4, 0)]
+    arraysize = sys.getsizeof(array)
+    if hasattr(array, '__dict__'):
+        arraysize += sys.getsizeof(vars(array)) + sum(
+            sys.getsizeof(x) for x in vars(array).itervalues())
+    print '%d objects read in %.2f seconds' % (count, elapsed)
+    print 'Peak memory increase:     %8d KB' % (after - before)
+    print 'Placeholder size:         %8d bytes' % (
+        sys.getsizeof(placeholder) + sys.getsizeof(getattr(placeholder, '__dict__', None)))
+    print 'Resolved array overhead:  %8d bytes' % (arraysize - sys.getsizeof(list(array)))
+
+
+def first_missing(reader):
+    return max(key[0] for key in reader.indirect_objects) + 1
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,36 @@
+'''
+Benchmarks for PdfString decoding and encoding.
+
+Run from the directory above like so:
+python -m tests.bench_pdfstring
+'''
+
+import timeit
+
+setup = '''
+from pdfrw import PdfString
+plain = PdfString('(Microsoft Word - Quarterly Report.doc)')
+escaped = PdfString(r'(Line one\\nLine \\(two\\)\\t\\351t\\351 \\\\ done\\\r\\n)')
+hexstr = PdfString('<' + 'FEFF004D006900630072006F0073006F0066007400200057006F00720064' + '>')
+longhex = PdfString('<' + '0123456789abcdef' * 256 + '>')
+source = 'Quarterly (draft) report \\\\ 2012'
+'''
+
+tests = [
+    'plain.decode()',
+    'escaped.decode()',
+    'hexstr.decode()',
+    'longhex.decode()',
+    'PdfString.encode(source)',
+]
+
+
+def main():
+    for stmt in tests:
+        number = 'longhex' in stmt and 1000 or 100000
+        best = min(timeit.repeat(stmt, setup, repeat=5, number=number))
+        print '%-30s %10.3f usec' % (stmt, best * 1e6 / number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+'''
+Speed benchmark for the PNG predictors.
+
+Run from the directory above like so:
+python -m tests.bench_uncompress [width height]
+
+Decodes an RGB image that was compressed with the PNG Up filter
+(as most PDF producers do), with and without NumPy.
+'''
+
+import sys
+import zlib
+import time
+import random
+
+from pdfrw import PdfName, PdfDict
+from pdfrw import uncompress as module
+
+
+def main(width=1000, height=1000):
+    rnd = random.Random(0)
+    rowlen = width * 3
+    row = ''.join(chr(rnd.randrange(256)) for x in range(rowlen))
+    data = zlib.compress(('\x02' + row) * height)
+    parms = PdfDict(Predictor=12, Colors=3, Columns=width)
+    decode = module.filters[PdfName.FlateDecode]
+    saved = module.numpy
+    for name, numpy in (('NumPy', saved), ('Python', None)):
+        if name == 'NumPy' and numpy is None:
+            continue
+        module.numpy = numpy
+        start = time.time()
+        decode(data, parms)
+        print '%-8s %8.3f seconds' % (name, time.time() - start)
+    module.numpy = saved
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,83 @@
+'''
+Run from the directory above like so:
+python -m tests.test_clone
+'''
+
+
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+from pdfrw.clone import clone
+
+
+def makepage():
+    font = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                           BaseFont=PdfName.Helvetica)
+    image = IndirectPdfDict(Type=PdfName.XObject, Subtype=PdfName.Image, stream='x')
+    page = IndirectPdfDict(
+        Type = PdfName.Page,
+        MediaBox = PdfArray([0, 0, 612, 792]),
+        Resources = PdfDict(Font=PdfDict(F1=font), XObject=PdfDict(Im1=image)),
+        Contents = IndirectPdfDict(stream='BT /F1 12 Tf (Hi) Tj ET'),
+    )
+    annot = IndirectPdfDict(Type=PdfName.Annot, P=page)
+    page.Annots = PdfArray([annot, annot])
+    return page
+
+
+class TestClone(unittest.TestCase):
+
+    def test_clone(self):
+        page = makepage()
+        copy = clone(page)
+        self.assertTrue(copy is not page)
+        self.assertTrue(copy.indirect)
+        self.assertEqual(copy.Contents.stream, page.Contents.stream)
+        self.assertTrue(copy.Contents is not page.Contents)
+        # Shared resources
+        self.assertTrue(copy.Resources is not page.Resources)
+        self.assertTrue(copy.Resources.Font.F1 is page.Resources.Font.F1)
+        self.assertTrue(copy.Resources.XObject.Im1 is page.Resources.XObject.Im1)
+        # Cycles and shared structure
+        annots = copy.Annots
+        self.assertTrue(annots[0] is annots[1])
+        self.assertTrue(annots[0] is not page.Annots[0])
+        self.assertTrue(annots[0].P is copy)
+        copy.Rotate = 90
+        self.assertEqual(page.Rotate, None)
+
+    def test_memo(self):
+        page = makepage()
+        memo = {}
+        first = clone(page.Contents, memo)
+        self.assertTrue(clone(page, memo).Contents is first)
+        self.assertTrue(clone(page).Contents is not first)
+
+    def test_lazy(self):
+        pages = [makepage() for x in range(3)]
+        f = StringIO()
+        PdfWriter().addpages(pages).write(f)
+        reader = PdfReader(fdata=f.getvalue())
+        unread = len(reader.deferred_objects)
+        copies = [clone(page) for page in reader.pages for x in range(2)]
+        self.assertEqual(len(reader.deferred_objects), unread)
+        self.assertTrue(copies[0].Parent is reader.pages[0].Parent)
+        copies[1].Contents.stream = 'changed'
+        self.assertEqual(copies[0].Contents.stream, 'BT /F1 12 Tf (Hi) Tj ET')
+        self.assertTrue(copies[0].Resources.Font.F1 is reader.pages[0].Resources.Font.F1)
+        f = StringIO()
+        PdfWriter().addpages(copies).write(f)
+        pages = PdfReader(fdata=f.getvalue()).pages
+        self.assertEqual(len(pages), 6)
+        self.assertEqual([x.Contents.stream for x in pages][:2],
+                         ['BT /F1 12 Tf (Hi) Tj ET', 'changed'])
+        self.assertTrue(pages[1].Resources.Font.F1 is pages[0].Resources.Font.F1)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
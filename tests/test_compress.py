@@ -0,0 +1,173 @@
+'''
+Run from the directory above like so:
+python -m tests.test_compress
+'''
+
+
+import zlib
+import random
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+from pdfrw import compress as module
+from pdfrw.compress import compress, transcode, png_predict
+from pdfrw.uncompress import png_unpredict, getfilters, decode
+
+from tests.test_uncompress import lzw_encode, ascii85_encode
+
+
+def gradient(width, height, colors):
+    ''' A smooth image, which the PNG predictors shrink a lot.
+    '''
+    return ''.join(chr((x + y * 3 + c * 40) & 255) for y in range(height)
+                        for x in range(width) for c in range(colors))
+
+
+def stream(data, ftype=None, **kw):
+    obj = IndirectPdfDict(Filter=ftype, **kw)
+    obj.stream = data
+    return obj
+
+
+def decoded(obj):
+    data, remaining = decode(obj.stream, getfilters(obj))
+    assert not remaining
+    return data
+
+
+class TestTranscode(unittest.TestCase):
+
+    def setUp(self):
+        self.numpy = module.numpy
+        rnd = random.Random(3)
+        self.text = ''.join(rnd.choice(['0 0 m ', '10 20 l ', 'S\n', 'BT /F1 12 Tf ET\n'])
+                                for x in range(2000))
+
+    def tearDown(self):
+        module.numpy = self.numpy
+
+    def both(self, func):
+        ''' Run func with and without NumPy.
+        '''
+        func()
+        if module.numpy is not None:
+            module.numpy = None
+            func()
+
+    def test_predict(self):
+        rnd = random.Random(5)
+        data = ''.join(chr(rnd.randrange(256)) for x in range(3 * 2 * 7 * 5))
+        def check():
+            for colors, bpc, columns in ((3, 8, 14), (3, 16, 7), (1, 8, 42)):
+                predicted = png_predict(data, colors, bpc, columns)
+                self.assertEqual(len(predicted), len(data) + 5)
+                self.assertEqual(png_unpredict(predicted, colors, bpc, columns), data)
+            # 3 bytes a pixel, in rows of 5 and 15 bytes
+            for columns in (2, 6):
+                predicted = png_predict(data, 5, 4, columns)
+                self.assertEqual(png_unpredict(predicted, 5, 4, columns), data)
+        self.both(check)
+
+    def test_filters(self):
+        objs = [
+            stream(lzw_encode(self.text), PdfName.LZWDecode),
+            stream(ascii85_encode(zlib.compress(self.text)),
+                   PdfArray([PdfName.ASCII85Decode, PdfName.FlateDecode])),
+            stream(self.text),
+            stream(ascii85_encode('\xff\xd8 JPEG \xff\xd9'),
+                   PdfArray([PdfName.ASCII85Decode, PdfName.DCTDecode]),
+                   DecodeParms=PdfArray([None, PdfDict(ColorTransform=0)])),
+            stream(zlib.compress(self.text, 1), PdfName.FlateDecode),
+            stream('\xff\xd8 JPEG \xff\xd9', PdfName.DCTDecode),
+            stream(self.text, Type=PdfName.Metadata),
+        ]
+        before = [(x.stream, x.Filter) for x in objs]
+        saved = transcode(objs)
+        self.assertTrue(saved > 0)
+        for obj in objs[:3]:
+            self.assertEqual(obj.Filter, PdfName.FlateDecode)
+            self.assertEqual(obj.DecodeParms, None)
+            self.assertEqual(decoded(obj), self.text)
+        self.assertEqual(objs[3].Filter, PdfName.DCTDecode)
+        self.assertEqual(objs[3].DecodeParms, PdfDict(ColorTransform=0))
+        self.assertEqual(objs[3].stream, '\xff\xd8 JPEG \xff\xd9')
+        for obj, (data, ftype) in zip(objs, before)[4:]:
+            self.assertEqual((obj.stream, obj.Filter), (data, ftype))
+
+    def test_image(self):
+        data = gradient(40, 30, 3)
+        def check():
+            obj = stream(ascii85_encode(data), PdfName.ASCII85Decode, Subtype=PdfName.Image,
+                         Width=40, Height=30, BitsPerComponent=8, ColorSpace=PdfName.DeviceRGB)
+            transcode([obj])
+            self.assertEqual(obj.Filter, PdfName.FlateDecode)
+            self.assertEqual(obj.DecodeParms, PdfDict(Predictor=15, Colors=3,
+                                                      BitsPerComponent=8, Columns=40))
+            self.assertTrue(len(obj.stream) < len(zlib.compress(data, 9)))
+            self.assertEqual(decoded(obj), data)
+        self.both(check)
+
+    def test_bad(self):
+        obj = stream('not LZW at all', PdfName.LZWDecode)
+        transcode([obj])
+        self.assertEqual((obj.stream, obj.Filter), ('not LZW at all', PdfName.LZWDecode))
+
+    def test_budget(self):
+        objs = [stream(lzw_encode(self.text), PdfName.LZWDecode) for x in range(5)]
+        size = len(objs[0].stream)
+        transcode(objs, maxbytes=size * 3)
+        self.assertEqual([x.Filter for x in objs], [PdfName.FlateDecode] * 3 + [PdfName.LZWDecode] * 2)
+        objs = [stream(lzw_encode(self.text), PdfName.LZWDecode) for x in range(5)]
+        transcode(objs, maxtime=-1)
+        self.assertEqual([x.Filter for x in objs], [PdfName.LZWDecode] * 5)
+
+    def test_maxsize(self):
+        for workers in (1, 2):
+            objs = [stream(lzw_encode(self.text), PdfName.LZWDecode),
+                    stream(lzw_encode('\0' * (1 << 20)), PdfName.LZWDecode)]
+            transcode(objs, workers=workers, maxsize=1 << 16)
+            self.assertEqual([x.Filter for x in objs], [PdfName.FlateDecode, PdfName.LZWDecode])
+            self.assertEqual(decoded(objs[0]), self.text)
+
+    def test_parallel(self):
+        results = []
+        for workers in (1, 3):
+            objs = [stream(lzw_encode(self.text[:x * 500]), PdfName.LZWDecode,
+                           DecodeParms=PdfDict(EarlyChange=1)) for x in range(1, 20)]
+            objs[5].stream = 'bad data'
+            transcode(objs, workers=workers)
+            results.append([(x.stream, x.Filter, x.DecodeParms) for x in objs])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][5][1], PdfName.LZWDecode)
+        self.assertEqual(results[0][6][1], PdfName.FlateDecode)
+
+    def test_writer(self):
+        image = stream(lzw_encode(gradient(20, 10, 1)), PdfName.LZWDecode,
+                       Type=PdfName.XObject, Subtype=PdfName.Image, Width=20, Height=10,
+                       BitsPerComponent=8, ColorSpace=PdfName.DeviceGray)
+        contents = stream(ascii85_encode(self.text), PdfName.ASCII85Decode)
+        page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                               Contents=contents, Resources=PdfDict(XObject=PdfDict(Im1=image)))
+        f = StringIO()
+        PdfWriter(transcode=dict(workers=2)).addpage(page).write(f)
+        page = PdfReader(fdata=f.getvalue()).pages[0]
+        self.assertEqual(page.Contents.Filter, PdfName.FlateDecode)
+        self.assertEqual(decoded(page.Contents), self.text)
+        image = page.inheritable.Resources.XObject.Im1
+        self.assertEqual(image.Filter, PdfName.FlateDecode)
+        self.assertEqual(decoded(image), gradient(20, 10, 1))
+
+    def test_compress(self):
+        obj = stream(self.text)
+        compress([obj])
+        self.assertEqual(obj.Filter, PdfName.FlateDecode)
+        self.assertEqual(zlib.decompress(obj.stream), self.text)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
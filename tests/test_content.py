@@ -0,0 +1,133 @@
+'''
+Run from the directory above like so:
+python -m tests.test_content
+'''
+
+
+import zlib
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, IndirectPdfDict
+from pdfrw.content import tokens, instructions, formatcontent, fixnumber, optimize, optimizepages
+
+
+class TestParse(unittest.TestCase):
+
+    def test_tokens(self):
+        data = ('/F1 12 Tf % a comment\r(a (b) \\) c)%another\nTj<41 42>Tj [1 -2.5(x)]TJ '
+                '<</MCID 3>> BDC EMC /Name#20X 0 0 m')
+        self.assertEqual(list(tokens(data)), [
+            '/F1', '12', 'Tf', '(a (b) \\) c)', 'Tj', '<41 42>', 'Tj', '[', '1', '-2.5',
+            '(x)', ']', 'TJ', '<<', '/MCID', '3', '>>', 'BDC', 'EMC', '/Name#20X', '0', '0', 'm'])
+
+    def test_inline(self):
+        image = '\0EI\x01 EI\n\xff'
+        data = 'q BI /W 2 /H 1 /BPC 8 /CS /G ID %s EI Q' % image
+        self.assertEqual(list(instructions(data)), [
+            ([], 'q'),
+            (['/W', '2', '/H', '1', '/BPC', '8', '/CS', '/G', image], 'BI'),
+            ([], 'Q')])
+        self.assertEqual(list(instructions(formatcontent(instructions(data)))),
+                         list(instructions(data)))
+
+    def test_format(self):
+        data = '/F1  12 Tf\n( x )  Tj [ 1 (a) 2 ] TJ / 5 w <<  /A /B >> BDC'
+        result = formatcontent(instructions(data))
+        self.assertEqual(result, '/F1 12 Tf( x )Tj[1(a)2]TJ/ 5 w<</A/B>>BDC')
+        self.assertEqual(list(instructions(result)), list(instructions(data)))
+
+
+class TestOptimize(unittest.TestCase):
+
+    def check(self, data, expected, digits=None):
+        self.assertEqual(list(instructions(optimize(data, digits))),
+                         list(instructions(expected)))
+
+    def test_numbers(self):
+        for token, expected in (('1.500', '1.5'), ('0.25', '.25'), ('-0.0', '0'),
+                                ('+3', '3'), ('007', '7'), ('-.50', '-.5'), ('12.', '12'),
+                                ('0', '0'), ('100', '100')):
+            self.assertEqual(fixnumber(token), expected)
+        self.assertEqual(fixnumber('1.23456', 2), '1.23')
+        self.assertEqual(fixnumber('-0.004', 2), '0')
+        self.assertEqual(fixnumber('1.9999', 2), '2')
+
+    def test_digits(self):
+        self.check('1.0000 0 0 1.23456 0 0 cm 10.12345 20.5 m 3.14159 w',
+                   '1 0 0 1.23456 0 0 cm 10.12 20.5 m 3.14159 w', 2)
+
+    def test_empty(self):
+        self.check('q Q q q Q Q 1 w', '1 w')
+        self.check('q 1 w Q q Q', 'q 1 w Q')
+
+    def test_state(self):
+        self.check('1 w 1 w 2 w 1 J 1 J [3] 0 d [3] 0 d', '1 w 2 w 1 J [3] 0 d')
+        self.check('BT /F1 12 Tf (a) Tj /F1 12 Tf (b) Tj ET BT /F1 12 Tf ET',
+                   'BT /F1 12 Tf (a) Tj (b) Tj ET BT ET')
+        self.check('/GS1 gs 1 w /GS1 gs 1 w', '/GS1 gs 1 w /GS1 gs 1 w')
+        self.check('BT 1 2 (a) " 1 Tw 2 Tc 3 Tw ET', 'BT 1 2 (a) " 3 Tw ET')
+
+    def test_stack(self):
+        # Q restores what was set before the q
+        self.check('1 w q 2 w Q 1 w 2 w', '1 w q 2 w Q 2 w')
+        self.check('1 w q 1 w Q', '1 w')
+        self.check('q 1 w Q 1 w', 'q 1 w Q 1 w')
+        # Unbalanced Q at the start of a stream
+        self.check('Q 1 w Q 1 w', 'Q 1 w Q 1 w')
+
+    def test_colors(self):
+        self.check('1 0 0 rg 1 0 0 rg 1 0 0 RG 0 g 0 g', '1 0 0 rg 1 0 0 RG 0 g')
+        self.check('/CS0 cs 1 sc /CS0 cs 1 sc 1 sc', '/CS0 cs 1 sc /CS0 cs 1 sc')
+        self.check('/CS0 CS /CS0 CS 1 SC 0.5 SC 0.50 SC', '/CS0 CS 1 SC .5 SC')
+        self.check('1 sc 1 sc', '1 sc 1 sc')
+
+
+class TestPages(unittest.TestCase):
+
+    def stream(self, data, compressed=False):
+        obj = IndirectPdfDict()
+        if compressed:
+            obj.Filter = PdfName.FlateDecode
+            data = zlib.compress(data)
+        obj.stream = data
+        return obj
+
+    def makepages(self):
+        begin = self.stream('q\n')
+        end = self.stream('Q /Watermark.0 Do\n')
+        return [IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                                Contents=PdfArray([begin, self.stream(body, compressed), end]))
+                    for body, compressed in (('1.000 0 0 1.000 72 72 cm  0 0 m 10 10 l S\n', True),
+                                             ('BT /F1 12.0 Tf /F1 12.0 Tf (x) Tj ET\n', False))]
+
+    def test_streams(self):
+        pages = self.makepages()
+        before, after = optimizepages(pages)
+        self.assertTrue(after < before)
+        self.assertEqual(after, len('q') + len('Q/Watermark.0 Do') +
+                         len('1 0 0 1 72 72 cm\n0 0 m\n10 10 l\nS') + len('BT/F1 12 Tf(x)Tj\nET'))
+        self.assertEqual(pages[0].Contents[1].Filter, PdfName.FlateDecode)
+        self.assertEqual(pages[0].Contents[1].decoded, '1 0 0 1 72 72 cm\n0 0 m\n10 10 l\nS')
+        self.assertEqual(pages[1].Contents[1].Filter, None)
+        self.assertTrue(pages[0].Contents[0] is pages[1].Contents[0])
+
+    def test_merge(self):
+        pages = self.makepages()
+        optimizepages(pages, merge=True)
+        f = StringIO()
+        PdfWriter().addpages(pages).write(f)
+        pages = PdfReader(fdata=f.getvalue()).pages
+        self.assertEqual(pages[0].Contents.Filter, PdfName.FlateDecode)
+        self.assertEqual(pages[0].Contents.decoded,
+                         'q\n1 0 0 1 72 72 cm\n0 0 m\n10 10 l\nS\nQ/Watermark.0 Do')
+        self.assertEqual(pages[1].Contents.Filter, None)
+        self.assertEqual(pages[1].Contents.stream, 'q\nBT/F1 12 Tf(x)Tj\nET\nQ/Watermark.0 Do')
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+'''
+Run from the directory above like so:
+python -m tests.test_images
+'''
+
+
+import os
+import zlib
+import struct
+import random
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+from pdfrw.objects import PdfString
+from pdfrw.uncompress import png_unpredict
+from pdfrw.images import iterimages, extract_file, extract_images
+
+from tests.test_uncompress import png_encode
+
+
+def makeimage(data, filter=None, **kw):
+    image = IndirectPdfDict(Type=PdfName.XObject, Subtype=PdfName.Image,
+                            BitsPerComponent=8, Filter=filter, **kw)
+    image.stream = data
+    return image
+
+
+def readpng(data):
+    ''' Return the IHDR fields, palette and image data of a PNG.
+    '''
+    assert data[:8] == '\x89PNG\r\n\x1a\n'
+    index = 8
+    chunks = {}
+    while index < len(data):
+        length, = struct.unpack('>L', data[index:index + 4])
+        kind = data[index + 4:index + 8]
+        body = data[index + 8:index + 8 + length]
+        crc, = struct.unpack('>L', data[index + 8 + length:index + 12 + length])
+        assert crc == zlib.crc32(kind + body) & 0xFFFFFFFF
+        chunks[kind] = chunks.get(kind, '') + body
+        index += 12 + length
+    assert 'IEND' in chunks
+    return (struct.unpack('>LLBBBBB', chunks['IHDR']), chunks.get('PLTE'),
+            chunks['IDAT'])
+
+
+class TestImages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rnd = random.Random(7)
+        self.rgb = ''.join(chr(rnd.randrange(256)) for x in range(3 * 10 * 6))
+        self.gray = ''.join(chr(rnd.randrange(256)) for x in range(10 * 6))
+        self.jpeg = '\xff\xd8 not really a JPEG \xff\xd9'
+        jpeg = makeimage(self.jpeg, PdfName.DCTDecode, Width=10, Height=6,
+                         ColorSpace=PdfName.DeviceRGB)
+        predicted = makeimage(zlib.compress(png_encode(self.rgb, 30, 3, [0, 1, 2, 3, 4])),
+                              PdfName.FlateDecode, Width=10, Height=6,
+                              ColorSpace=PdfName.DeviceRGB,
+                              DecodeParms=PdfDict(Predictor=15, Colors=3, Columns=10))
+        plain = makeimage(zlib.compress(self.gray), PdfName.FlateDecode, Width=10, Height=6,
+                          ColorSpace=PdfName.DeviceGray)
+        indexed = makeimage(self.gray, Width=10, Height=6,
+                            ColorSpace=PdfArray([PdfName.Indexed, PdfName.DeviceGray, 255,
+                                                 PdfString.encode(''.join(chr(255 - x) for x in range(256)), True)]))
+        cmyk = makeimage(zlib.compress('\0' * 240), PdfName.FlateDecode, Width=10, Height=6,
+                         ColorSpace=PdfName.DeviceCMYK)
+        form = IndirectPdfDict(Type=PdfName.XObject, Subtype=PdfName.Form,
+                               Resources=PdfDict(XObject=PdfDict(Im9=plain)))
+        form.stream = '/Im9 Do'
+        pages = [IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                                 Resources=PdfDict(XObject=xobjects))
+                 for xobjects in (PdfDict(Im1=jpeg, Im2=predicted, Im3=cmyk),
+                                  PdfDict(Fm1=form, Im4=indexed, Im1=jpeg))]
+        f = StringIO()
+        PdfWriter().addpages(pages).write(f)
+        self.fname = os.path.join(self.tmpdir, 'doc.pdf')
+        open(self.fname, 'wb').write(f.getvalue())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_iterimages(self):
+        reader = PdfReader(self.fname)
+        images = [(x.pagenum, x.name, x.width, x.height, x.filter, x.extension())
+                     for x in iterimages(reader)]
+        self.assertEqual(images, [
+            (1, 'Im1', 10, 6, PdfName.DCTDecode, '.jpg'),
+            (1, 'Im2', 10, 6, PdfName.FlateDecode, '.png'),
+            (1, 'Im3', 10, 6, PdfName.FlateDecode, None),
+            (2, 'Im1', 10, 6, PdfName.DCTDecode, '.jpg'),
+            (2, 'Im4', 10, 6, None, '.png'),
+            (2, 'Im9', 10, 6, PdfName.FlateDecode, '.png'),
+        ])
+
+    def test_extract(self):
+        outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(outdir)
+        names = extract_file(self.fname, outdir)
+        self.assertEqual([os.path.basename(x) for x in names],
+                         ['doc-p1-Im1.jpg', 'doc-p1-Im2.png', 'doc-p2-Im4.png', 'doc-p2-Im9.png'])
+        read = lambda name: open(os.path.join(outdir, name), 'rb').read()
+        self.assertEqual(read('doc-p1-Im1.jpg'), self.jpeg)
+
+        # The compressed data is copied as is
+        header, palette, idat = readpng(read('doc-p1-Im2.png'))
+        self.assertEqual(header, (10, 6, 8, 2, 0, 0, 0))
+        image = PdfReader(self.fname).pages[0].Resources.XObject.Im2
+        self.assertEqual(idat, image.stream)
+        self.assertEqual(png_unpredict(zlib.decompress(idat), 3, 8, 10), self.rgb)
+
+        header, palette, idat = readpng(read('doc-p2-Im4.png'))
+        self.assertEqual(header, (10, 6, 8, 3, 0, 0, 0))
+        self.assertEqual(palette, ''.join(chr(255 - x) * 3 for x in range(256)))
+        self.assertEqual(png_unpredict(zlib.decompress(idat), 1, 8, 10), self.gray)
+
+        header, palette, idat = readpng(read('doc-p2-Im9.png'))
+        self.assertEqual(header, (10, 6, 8, 0, 0, 0, 0))
+        self.assertEqual(png_unpredict(zlib.decompress(idat), 1, 8, 10), self.gray)
+
+    def test_same_name(self):
+        # A page's /Im1 and a different /Im1 in a Form XObject on it
+        first = makeimage(zlib.compress(self.gray), PdfName.FlateDecode, Width=10, Height=6,
+                          ColorSpace=PdfName.DeviceGray)
+        second = makeimage('\xff' * 60, Width=10, Height=6, ColorSpace=PdfName.DeviceGray)
+        form = IndirectPdfDict(Type=PdfName.XObject, Subtype=PdfName.Form,
+                               Resources=PdfDict(XObject=PdfDict(Im1=second)))
+        form.stream = '/Im1 Do'
+        page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                               Resources=PdfDict(XObject=PdfDict(Im1=first, Fm1=form)))
+        fname = os.path.join(self.tmpdir, 'same.pdf')
+        PdfWriter().addpage(page).write(fname)
+        outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(outdir)
+        names = extract_file(fname, outdir)
+        self.assertEqual([os.path.basename(x) for x in names],
+                         ['same-p1-Im1.png', 'same-p1-Im1-2.png'])
+        datas = [png_unpredict(zlib.decompress(readpng(open(x, 'rb').read())[2]), 1, 8, 10)
+                    for x in names]
+        self.assertEqual(sorted(datas), sorted([self.gray, '\xff' * 60]))
+
+    def test_bad_image(self):
+        bad = makeimage('x\x9c not really Flate data', PdfName.FlateDecode, Width=10, Height=6,
+                        ColorSpace=PdfName.DeviceGray)
+        good = makeimage(self.gray, Width=10, Height=6, ColorSpace=PdfName.DeviceGray)
+        page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                               Resources=PdfDict(XObject=PdfDict(Im1=bad, Im2=good)))
+        fname = os.path.join(self.tmpdir, 'bad.pdf')
+        PdfWriter().addpage(page).write(fname)
+        outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(outdir)
+        names = extract_file(fname, outdir)
+        self.assertEqual([os.path.basename(x) for x in names], ['bad-p1-Im2.png'])
+        self.assertEqual(os.listdir(outdir), ['bad-p1-Im2.png'])
+
+    def test_parallel(self):
+        shutil.copy(self.fname, os.path.join(self.tmpdir, 'doc2.pdf'))
+        outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(outdir)
+        result = extract_images(self.tmpdir, outdir, workers=2)
+        self.assertEqual(sorted(result), [self.fname, os.path.join(self.tmpdir, 'doc2.pdf')])
+        self.assertEqual(len(os.listdir(outdir)), 8)
+        self.assertEqual([len(x) for x in result.values()], [4, 4])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
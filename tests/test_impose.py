@@ -0,0 +1,156 @@
+'''
+Run from the directory above like so:
+python -m tests.test_impose
+'''
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, IndirectPdfDict
+from pdfrw.impose import Layout, NUp, Booklet, Poster, impose, imposefile, imposefiles
+
+from tests.test_text import stream
+
+
+def makepages(count, width=612, height=792):
+    return [IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, width, height]),
+                            Contents=stream('%d w' % index)) for index in range(count)]
+
+
+def placed(sheet):
+    ''' Return (matrix, page content) for each page on a sheet.
+    '''
+    xobjs = sheet.Resources.XObject
+    result = []
+    for line in sheet.Contents.stream.splitlines():
+        tokens = line.split()
+        xobj = xobjs[tokens[-3]]
+        result.append((' '.join(tokens[1:7]), xobj.stream))
+    return result
+
+
+class TestLayouts(unittest.TestCase):
+
+    def test_nup(self):
+        self.assertEqual(NUp(2, 2).slots, [(0, 0.5, 0.5, 0.5), (0.5, 0.5, 0.5, 0.5),
+                                           (0, 0, 0.5, 0.5), (0.5, 0, 0.5, 0.5)])
+        sheets = list(NUp(2, 2).sheets(5))
+        self.assertEqual([[x[0] for x in sheet] for sheet in sheets],
+                         [[0, 1, 2, 3], [4, 5, 6, 7]])
+
+    def test_booklet(self):
+        sheets = list(Booklet().sheets(6))
+        self.assertEqual([[x[0] for x in sheet] for sheet in sheets],
+                         [[7, 0], [1, 6], [5, 2], [3, 4]])
+
+    def test_poster(self):
+        sheets = list(Poster(2, 1).sheets(2))
+        self.assertEqual([[(x[0], x[2]) for x in sheet] for sheet in sheets],
+                         [[(0, (0, 0, 0.5, 1))], [(0, (0.5, 0, 0.5, 1))],
+                          [(1, (0, 0, 0.5, 1))], [(1, (0.5, 0, 0.5, 1))]])
+
+
+class TestImpose(unittest.TestCase):
+
+    def test_nup(self):
+        sheets = list(impose(makepages(5), NUp(2, 2)))
+        self.assertEqual(len(sheets), 2)
+        self.assertEqual(sheets[0].MediaBox, [0, 0, 612, 792])
+        self.assertEqual(placed(sheets[0]), [
+            ('0.5 0 0 0.5 0 396', '0 w'), ('0.5 0 0 0.5 306 396', '1 w'),
+            ('0.5 0 0 0.5 0 0', '2 w'), ('0.5 0 0 0.5 306 0', '3 w')])
+        self.assertEqual(placed(sheets[1]), [('0.5 0 0 0.5 0 396', '4 w')])
+
+    def test_fit(self):
+        # Landscape pages centered in portrait slots
+        sheets = list(impose(makepages(2, 792, 612), NUp(2, 1, size=(1224, 792))))
+        self.assertEqual(placed(sheets[0]), [
+            ('0.7727 0 0 0.7727 0 159.5455', '0 w'),
+            ('0.7727 0 0 0.7727 612 159.5455', '1 w')])
+
+    def test_booklet(self):
+        pages = makepages(3)
+        sheets = list(impose(pages, Booklet()))
+        self.assertEqual(sheets[0].MediaBox, [0, 0, 1224, 792])
+        self.assertEqual([placed(x) for x in sheets], [
+            [('1 0 0 1 612 0', '0 w')],
+            [('1 0 0 1 0 0', '1 w'), ('1 0 0 1 612 0', '2 w')]])
+
+    def test_poster(self):
+        pages = makepages(1)
+        sheets = list(impose(pages, Poster(2, 2)))
+        self.assertEqual(len(sheets), 4)
+        xobjs = [x.Resources.XObject.P0 for x in sheets]
+        self.assertEqual([x.BBox for x in xobjs], [
+            [0, 396, 306, 792], [306, 396, 612, 792], [0, 0, 306, 396], [306, 0, 612, 396]])
+        # The parts all use the same Form XObject for the whole page
+        self.assertEqual(len(set(id(x.Resources.XObject.FullPage) for x in xobjs)), 1)
+        self.assertEqual([x[0] for x in placed(sheets[3])], ['2 0 0 2 -612 0'])
+
+    def test_cache(self):
+        pages = makepages(1)
+        layout = Layout([(0, 0, 1, 1)])
+        layout.sheets = lambda numpages: [[(0, (0, 0, 0.5, 0.5), None), (0, (0.5, 0.5, 0.5, 0.5), None)]]
+        sheet, = impose(pages, layout)
+        xobjs = sheet.Resources.XObject
+        self.assertTrue(xobjs.P0 is xobjs.P1)
+
+    def test_contents(self):
+        pages = makepages(2)
+        pages[0].Contents = PdfArray([stream('1 w'), stream('2 w')])
+        pages[1].Contents = None
+        sheet, = impose(pages, NUp(2, 1))
+        self.assertEqual(sheet.Resources.XObject.P1.stream, '')
+        self.assertEqual(sheet.Resources.XObject.P0.decoded, '1 w\n2 w')
+        # The pages are not changed
+        self.assertEqual(len(pages[0].Contents), 2)
+        self.assertEqual(pages[1].Contents, None)
+        sheets = list(impose(pages[:1], Poster(2, 1)))
+        xobjs = [x.Resources.XObject.P0.Resources.XObject.FullPage for x in sheets]
+        self.assertTrue(xobjs[0] is xobjs[1])
+        self.assertEqual(xobjs[0].decoded, '1 w\n2 w')
+
+    def test_rotate(self):
+        pages = makepages(1)
+        sheet, = impose(pages, NUp(1, 1, rotate=90))
+        self.assertEqual(sheet.MediaBox, [0, 0, 792, 612])
+        self.assertEqual(sheet.Resources.XObject.P0.Matrix, [0, -1, 1, 0, 0, 0])
+        self.assertEqual(placed(sheet)[0][0], '1 0 0 1 0 612')
+
+
+class TestFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, *names):
+        return os.path.join(self.tmpdir, *names)
+
+    def test_file(self):
+        inname, outname = self.path('in.pdf'), self.path('out.pdf')
+        PdfWriter().addpages(makepages(10)).write(inname)
+        self.assertEqual(imposefile(inname, outname, Booklet(), cachesize=2, release=2), 6)
+        sheets = PdfReader(outname).pages
+        self.assertEqual([[x[1] for x in placed(sheet)] for sheet in sheets], [
+            ['0 w'], ['1 w'], ['9 w', '2 w'], ['3 w', '8 w'], ['7 w', '4 w'], ['5 w', '6 w']])
+
+    def test_files(self):
+        os.mkdir(self.path('in'))
+        PdfWriter().addpages(makepages(3)).write(self.path('in', 'f.pdf'))
+        results = list(imposefiles(self.path('in'), self.path('out'), NUp(2, 1), workers=1))
+        self.assertEqual(results, [(self.path('in', 'f.pdf'), 2)])
+        self.assertEqual(len(PdfReader(self.path('out', 'f.pdf')).pages), 2)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
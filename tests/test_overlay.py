@@ -0,0 +1,143 @@
+'''
+Run from the directory above like so:
+python -m tests.test_overlay
+'''
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+from pdfrw.objects import PdfString
+from pdfrw.buildxobj import pagexobj
+from pdfrw.overlay import Overlay, overlayfile, overlayfiles
+
+from tests.test_text import stream
+
+
+def makepage(data, resources=None):
+    return IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                           Resources=resources, Contents=stream(data))
+
+
+def contents(page):
+    return [x.stream for x in page.Contents]
+
+
+class TestOverlay(unittest.TestCase):
+
+    def setUp(self):
+        self.stamp = pagexobj(makepage('0 0 m 612 792 l S'))
+
+    def test_over(self):
+        shared = IndirectPdfDict(XObject=PdfDict(Overlay=stream('other')))
+        pages = [makepage('1 w', shared), makepage('2 w', shared), makepage('3 w'),
+                 makepage('4 w', shared)]
+        pages[3].Contents = PdfArray([pages[3].Contents, stream('5 w')])
+        result = list(Overlay(self.stamp).apply(pages, pagenums=set([1, 2, 3, 4])))
+        self.assertEqual(result, pages)
+        self.assertEqual(contents(pages[0]), ['q\n', '1 w', 'Q /Overlay.1 Do\n'])
+        self.assertEqual(contents(pages[2]), ['q\n', '3 w', 'Q /Overlay.1 Do\n'])
+        self.assertEqual(contents(pages[3]), ['q\n', '4 w', '5 w', 'Q /Overlay.1 Do\n'])
+        # The streams and resources are shared, and the originals are not changed
+        self.assertTrue(pages[0].Contents[0] is pages[2].Contents[0])
+        self.assertTrue(pages[0].Contents[-1] is pages[3].Contents[-1])
+        self.assertTrue(pages[0].Resources is pages[1].Resources is pages[3].Resources)
+        self.assertFalse(pages[0].Resources is shared)
+        self.assertEqual(sorted(shared.XObject), ['/Overlay'])
+        self.assertTrue(pages[0].Resources.XObject['/Overlay.1'] is self.stamp)
+        self.assertTrue(pages[2].Resources.XObject['/Overlay.1'] is self.stamp)
+
+    def test_under(self):
+        pages = [makepage('1 w'), makepage('2 w'), makepage('3 w')]
+        overlay = Overlay(self.stamp, underneath=True, matrix=(.5, 0, 0, .5, 0, 0))
+        list(overlay.apply(pages, pagenums=set([1, 3])))
+        self.assertEqual(contents(pages[0]), ['q 0.5 0 0 0.5 0 0 cm /Overlay Do Q\n', '1 w'])
+        self.assertEqual(pages[1].Contents.stream, '2 w')
+        self.assertEqual(pages[1].Resources, None)
+        self.assertTrue(pages[2].Contents[0] is pages[0].Contents[0])
+
+    def test_direct(self):
+        resources = PdfDict(Font=PdfDict())
+        pages = [makepage('1 w', resources), makepage('2 w', resources)]
+        list(Overlay(self.stamp).apply(pages))
+        self.assertTrue(pages[0].Resources is pages[1].Resources)
+        self.assertTrue(pages[0].Resources.indirect)
+        self.assertFalse(resources.indirect)
+
+    def test_cascade(self):
+        pages = [makepage('1 w')]
+        other = pagexobj(makepage('0 0 m 1 1 l S'))
+        list(Overlay(self.stamp).apply(pages))
+        list(Overlay(other).apply(pages))
+        self.assertEqual(contents(pages[0]), ['q\n', 'q\n', '1 w', 'Q /Overlay Do\n',
+                                              'Q /Overlay.1 Do\n'])
+        xobjdict = pages[0].Resources.XObject
+        self.assertTrue(xobjdict['/Overlay'] is self.stamp)
+        self.assertTrue(xobjdict['/Overlay.1'] is other)
+
+    def test_write(self):
+        pages = [makepage('1 w'), makepage('2 w')]
+        f = StringIO()
+        PdfWriter().addpages(Overlay(self.stamp).apply(pages)).write(f)
+        pages = PdfReader(fdata=f.getvalue()).pages
+        self.assertEqual(contents(pages[1]), ['q\n', '2 w', 'Q /Overlay Do\n'])
+        self.assertEqual(pages[1].inheritable.Resources.XObject.Overlay.stream, '0 0 m 612 792 l S')
+
+
+class TestFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.stamp = self.path('stamp.pdf')
+        PdfWriter().addpages([makepage('0 0 m 1 1 l S'), makepage('BT ET')]).write(self.stamp)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, *names):
+        return os.path.join(self.tmpdir, *names)
+
+    def test_file(self):
+        inname, outname = self.path('in.pdf'), self.path('out.pdf')
+        PdfWriter().addpages([makepage('%d w' % x) for x in range(3)]).write(inname)
+        self.assertEqual(overlayfile(inname, outname, self.stamp + '#page=2',
+                                     pagenums=set([2]), cachesize=1), 3)
+        pages = PdfReader(outname).pages
+        self.assertEqual(pages[0].Contents.stream, '0 w')
+        self.assertEqual(contents(pages[1]), ['q\n', '1 w', 'Q /Overlay Do\n'])
+        self.assertEqual(pages[1].Resources.XObject.Overlay.stream, 'BT ET')
+
+    def test_catalog(self):
+        inname = self.path('in.pdf')
+        writer = PdfWriter().addpages([makepage('%d w' % x) for x in range(2)])
+        writer.trailer.Info = IndirectPdfDict(Title=PdfString.encode('Title'))
+        writer.trailer.Root.PageLabels = PdfDict(Nums=PdfArray([0, PdfDict(S=PdfName.r)]))
+        writer.write(inname)
+        for stream in (True, False):
+            outname = self.path('out%s.pdf' % stream)
+            self.assertEqual(overlayfile(inname, outname, self.stamp, stream=stream), 2)
+            reader = PdfReader(outname)
+            self.assertEqual(reader.Info.Title.decode(), 'Title')
+            self.assertEqual(reader.Root.PageLabels is not None, not stream)
+            self.assertEqual(contents(reader.pages[1]), ['q\n', '1 w', 'Q /Overlay Do\n'])
+
+    def test_files(self):
+        os.mkdir(self.path('in'))
+        PdfWriter().addpage(makepage('1 w')).write(self.path('in', 'f.pdf'))
+        results = list(overlayfiles(self.path('in'), self.path('out'), self.stamp,
+                                    workers=1, underneath=True))
+        self.assertEqual(results, [(self.path('in', 'f.pdf'), 1)])
+        page = PdfReader(self.path('out', 'f.pdf')).pages[0]
+        self.assertEqual(contents(page), ['/Overlay Do\n', '1 w'])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
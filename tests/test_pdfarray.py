@@ -0,0 +1,80 @@
+'''
+Run from the directory above like so:
+python -m tests.test_pdfarray
+'''
+
+
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfObject, IndirectPdfDict
+
+
+def makereader(count):
+    annots = PdfArray(IndirectPdfDict(Type=PdfName.Annot, Contents='annot %d' % index)
+                        for index in range(count))
+    page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                           Annots=annots)
+    f = StringIO()
+    PdfWriter().addpage(page).write(f)
+    reader = PdfReader(fdata=f.getvalue())
+    return reader, reader.pages[0].Annots
+
+
+class TestLazyArray(unittest.TestCase):
+
+    def test_index(self):
+        reader, annots = makereader(100)
+        unread = len(reader.deferred_objects)
+        self.assertEqual(annots[40].Contents.decode(), 'annot 40')
+        self.assertEqual(annots[-1].Type, PdfName.Annot)
+        self.assertEqual(len(reader.deferred_objects), unread - 2)
+        self.assertEqual(len(annots[10:13]), 3)
+        self.assertEqual(len(annots[::25]), 4)
+        self.assertEqual(len(reader.deferred_objects), unread - 9)
+        for annot in annots[10:13] + annots[::25]:
+            self.assertEqual(annot.Type, PdfName.Annot)
+
+    def test_iter(self):
+        reader, annots = makereader(20)
+        unread = len(reader.deferred_objects)
+        for index, annot in enumerate(annots):
+            self.assertEqual(annot.Type, PdfName.Annot)
+            self.assertEqual(len(reader.deferred_objects), unread - index - 1)
+        self.assertTrue(annots._resolved)
+
+    def test_resolve(self):
+        reader, annots = makereader(20)
+        order = []
+        loader = type(list.__getitem__(annots, 0))._loader
+        def logloader(key):
+            order.append(reader.findoffset(key))
+            return loader(key)
+        type(list.__getitem__(annots, 0))._loader = staticmethod(logloader)
+        annots.resolve()
+        self.assertEqual(order, sorted(order))
+        self.assertEqual(len(order), 20)
+        self.assertEqual(list.count(annots, None), 0)
+
+
+class TestFloats(unittest.TestCase):
+
+    def test_floats(self):
+        box = PdfArray([PdfObject('0'), PdfObject('0.5'), 612, PdfObject('792')])
+        self.assertEqual(box.floats(), (0.0, 0.5, 612.0, 792.0))
+        self.assertTrue(box.floats() is box.floats())
+        box[2] = PdfObject('595')
+        self.assertEqual(box.floats(), (0.0, 0.5, 595.0, 792.0))
+
+    def test_number(self):
+        self.assertEqual(PdfObject('42').number, 42)
+        self.assertEqual(PdfObject('-.5').number, -0.5)
+        self.assertRaises(ValueError, getattr, PdfObject('/Name'), 'number')
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
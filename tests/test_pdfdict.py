@@ -0,0 +1,98 @@
+'''
+Run from the directory above like so:
+python -m tests.test_pdfdict
+'''
+
+
+import unittest
+
+from pdfrw import PdfDict, PdfName, PdfArray
+from pdfrw.objects.pdfdict import _DictSearch
+
+
+class TestInheritable(unittest.TestCase):
+
+    def maketree(self):
+        root = PdfDict(Type=PdfName.Pages, Resources=PdfDict(Name='root'),
+                       MediaBox=PdfArray([0, 0, 612, 792]))
+        mid = PdfDict(Type=PdfName.Pages, Parent=root)
+        pages = [PdfDict(Type=PdfName.Page, Parent=mid) for x in range(3)]
+        return root, mid, pages
+
+    def test_cached(self):
+        root, mid, pages = self.maketree()
+        for page in pages:
+            self.assertTrue(page.inheritable.Resources is root.Resources)
+        self.assertTrue(vars(mid)['_inherited'][1][PdfName.Resources] is root.Resources)
+        self.assertEqual(pages[0].inheritable.Rotate, None)
+        self.assertEqual(pages[0].inheritable.Type, PdfName.Page)
+
+    def test_invalidate(self):
+        root, mid, pages = self.maketree()
+        page = pages[0]
+        self.assertEqual(page.inheritable.Resources.Name, 'root')
+        mid.Resources = PdfDict(Name='mid')
+        self.assertEqual(page.inheritable.Resources.Name, 'mid')
+        del mid[PdfName.Resources]
+        self.assertEqual(page.inheritable.Resources.Name, 'root')
+        root.update({PdfName.Rotate: 90})
+        self.assertEqual(pages[1].inheritable.Rotate, 90)
+        other = PdfDict(Type=PdfName.Pages, Resources=PdfDict(Name='other'))
+        mid.Parent = other
+        self.assertEqual(page.inheritable.Resources.Name, 'other')
+        self.assertEqual(page.inheritable.MediaBox, None)
+        page.Resources = PdfDict(Name='page')
+        self.assertEqual(page.inheritable.Resources.Name, 'page')
+
+    def test_bulk(self):
+        root, mid, pages = self.maketree()
+        page = pages[0]
+        self.assertEqual(page.inheritable.Resources.Name, 'root')
+        mid.setdefault(PdfName.Resources, PdfDict(Name='mid'))
+        self.assertEqual(page.inheritable.Resources.Name, 'mid')
+        self.assertEqual(mid.setdefault(PdfName.Resources, PdfDict()).Name, 'mid')
+        self.assertEqual(mid.pop(PdfName.Resources).Name, 'mid')
+        self.assertEqual(page.inheritable.Resources.Name, 'root')
+        self.assertEqual(mid.pop(PdfName.Rotate, 0), 0)
+        mid.clear()
+        self.assertEqual(page.inheritable.Resources, None)
+        self.assertEqual(pages[1].inheritable.MediaBox, None)
+        mid.Parent = root
+        mid.Rotate = 90
+        self.assertEqual(page.inheritable.Rotate, 90)
+        self.assertEqual(sorted(mid.popitem()[0] for x in range(2)),
+                         [PdfName.Parent, PdfName.Rotate])
+        self.assertEqual(page.inheritable.Rotate, None)
+
+    def test_unrelated(self):
+        root, mid, pages = self.maketree()
+        self.assertTrue(pages[0].inheritable.Resources is root.Resources)
+        generation = _DictSearch.generation
+        # New dictionaries, pages, and nodes without caches
+        PdfDict(pages[1], Resources=PdfDict(), Parent=mid)
+        pages[1].Parent = mid
+        pages[2].Resources = PdfDict(Name='page')
+        PdfDict(Type=PdfName.Pages).update({PdfName.Rotate: 90})
+        self.assertEqual(_DictSearch.generation, generation)
+        self.assertEqual(pages[2].inheritable.Resources.Name, 'page')
+        self.assertTrue(pages[1].inheritable.Resources is root.Resources)
+        root.Rotate = 90
+        self.assertNotEqual(_DictSearch.generation, generation)
+
+
+class TestAttributes(unittest.TestCase):
+
+    def test_getattr(self):
+        # Names that are also attributes of PdfName
+        mydict = PdfDict()
+        self.assertEqual(mydict.__call__, None)
+        mydict[PdfName('__call__')] = 5
+        self.assertEqual(mydict.__call__, 5)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
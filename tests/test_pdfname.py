@@ -0,0 +1,63 @@
+'''
+Run from the directory above like so:
+python -m tests.test_pdfname
+'''
+
+
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, IndirectPdfDict
+from pdfrw.tokens import PdfTokens
+from pdfrw.objects import pdfname
+
+
+def tokens(fdata):
+    return list(PdfTokens(fdata))
+
+
+class TestNames(unittest.TestCase):
+
+    def test_identity(self):
+        name, = tokens('/FooBar')
+        self.assertTrue(PdfName.FooBar is PdfName('FooBar') is name)
+        self.assertEqual(name, '/FooBar')
+
+    def test_escaped(self):
+        escaped, plain, again = tokens('/Pag#65 /Page /Pag#65')
+        self.assertEqual(escaped, PdfName.Page)
+        self.assertEqual(escaped.encoded, '/Pag#65')
+        self.assertTrue(again is escaped)
+        # The shared name keeps its own spelling
+        self.assertTrue(plain is PdfName.Page)
+        self.assertFalse(hasattr(PdfName.Page, 'encoded'))
+        f = StringIO()
+        PdfWriter().addpage(IndirectPdfDict(Type=PdfName.Page, Other=escaped)).write(f)
+        self.assertTrue('/Type /Page' in f.getvalue())
+        self.assertTrue('/Other /Pag#65' in f.getvalue())
+        page = PdfReader(fdata=f.getvalue()).pages[0]
+        self.assertEqual(page.Other, PdfName.Page)
+
+    def test_bounded(self):
+        name = PdfName.Type
+        saved = pdfname.maxinterned
+        pdfname.maxinterned = len(pdfname.interned)
+        try:
+            # Names already in the table are still shared
+            self.assertTrue(PdfName('Type') is name)
+            self.assertEqual(PdfName.NotInterned, '/NotInterned')
+            self.assertFalse('/NotInterned' in pdfname.interned)
+            first, second = tokens('/NotInterned2 /NotInterned2')
+            self.assertTrue(first is second)
+            self.assertFalse('/NotInterned2' in pdfname.interned)
+        finally:
+            pdfname.maxinterned = saved
+        self.assertTrue(PdfName.NotInterned is PdfName('NotInterned'))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+'''
+Run from the directory above like so:
+python -m tests.test_pdfreader
+'''
+
+
+import gc
+import weakref
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+from pdfrw.objects import PdfIndirect, PdfString
+from pdfrw.errors import PdfError
+
+
+def makepdf(count, compress=False):
+    pages = [IndirectPdfDict(
+                Type = PdfName.Page,
+                MediaBox = PdfArray([0, 0, 612, 792]),
+                Resources = IndirectPdfDict(Font=IndirectPdfDict(F1=IndirectPdfDict(
+                                Type=PdfName.Font, Name='font %d' % index))),
+                Contents = IndirectPdfDict(stream='%% page %d\n' % index),
+            ) for index in range(count)]
+    f = StringIO()
+    PdfWriter(compress=compress).addpages(pages).write(f)
+    return f.getvalue()
+
+
+class TestCacheSize(unittest.TestCase):
+
+    def test_iterpages(self):
+        reader = PdfReader(fdata=makepdf(50), cachesize=10)
+        for index, page in enumerate(reader.iterpages()):
+            self.assertEqual(page.Contents.stream, '%% page %d\n' % index)
+            self.assertEqual(page.Resources.Font.F1.Name.decode(), 'font %d' % index)
+            gc.collect()
+            # The pages themselves, plus a few objects for this page
+            self.assertTrue(len(reader.loaded) <= 50 + 5)
+        self.assertEqual(len(reader.recent), 0)
+
+    def test_bounded(self):
+        reader = PdfReader(fdata=makepdf(50), cachesize=10)
+        for page in reader.pages:
+            page.Resources.Font
+        self.assertEqual(len(reader.recent), 10)
+
+    def test_changed(self):
+        reader = PdfReader(fdata=makepdf(20), cachesize=2)
+        font = reader.pages[3].Resources.Font.F1
+        font.Name = 'changed'
+        resources = reader.pages[4].Resources
+        resources.Extra = PdfDict()
+        del font, resources
+        for page in reader.iterpages():
+            page.Resources.Font.F1.Name
+        gc.collect()
+        self.assertEqual(reader.pages[3].Resources.Font.F1.Name, 'changed')
+        self.assertTrue(reader.pages[4].Resources.Extra is not None)
+        f = StringIO()
+        PdfWriter().addpages(reader.pages).write(f)
+        pages = PdfReader(fdata=f.getvalue()).pages
+        self.assertEqual(len(pages), 20)
+        self.assertEqual(pages[3].Resources.Font.F1.Name.decode(), 'changed')
+        self.assertEqual(pages[7].Contents.stream, '% page 7\n')
+
+    def test_held(self):
+        reader = PdfReader(fdata=makepdf(20), cachesize=2)
+        font = reader.pages[0].Resources.Font.F1
+        reader.evict()
+        self.assertTrue(reader.pages[0].Resources.Font.F1 is font)
+
+    def test_inherited(self):
+        reader = PdfReader(fdata=makepdf(20), cachesize=2)
+        parent = weakref.ref(reader.pages[0].Parent)
+        self.assertEqual(reader.pages[0].inheritable.Rotate, None)
+        reader.evict()
+        gc.collect()
+        # The node with the cache is kept, so changes to it are seen
+        self.assertTrue(reader.pages[5].Parent is parent())
+        parent().Rotate = 90
+        self.assertEqual(reader.pages[0].inheritable.Rotate, 90)
+
+    def test_decompress(self):
+        fdata = makepdf(20, compress=True)
+        self.assertEqual(PdfReader(fdata=fdata).pages[0].Contents.Filter, PdfName.FlateDecode)
+        for cachesize in (None, 2):
+            reader = PdfReader(fdata=fdata, cachesize=cachesize, decompress=True)
+            for index, page in enumerate(reader.iterpages()):
+                self.assertEqual(page.Contents.Filter, None)
+                self.assertEqual(page.Contents.stream, '%% page %d\n' % index)
+            gc.collect()
+            # Read in again, after being evicted
+            self.assertEqual(reader.pages[3].Contents.Filter, None)
+            self.assertEqual(reader.pages[3].Contents.stream, '% page 3\n')
+        # Decompressing later works too, and is not counted as a change
+        reader = PdfReader(fdata=fdata, cachesize=2)
+        contents = weakref.ref(reader.pages[0].Contents)
+        reader.uncompress()
+        self.assertEqual(contents().Filter, None)
+        reader.evict()
+        gc.collect()
+        self.assertEqual(contents(), None)
+        self.assertEqual(reader.pages[0].Contents.stream, '% page 0\n')
+
+
+class TestLazy(unittest.TestCase):
+
+    def makepdf(self):
+        page = IndirectPdfDict(
+            Type = PdfName.Page,
+            MediaBox = PdfArray([0, 0, 612, 792]),
+            Resources = PdfDict(Font=PdfDict(F1=IndirectPdfDict(
+                Type = PdfName.Font,
+                Widths = PdfArray(range(1000)),
+                Odd = PdfArray([PdfString.encode('x ] ) ( >> y'), PdfString('<5D5D>'),
+                                PdfDict(A=PdfArray(range(300))), PdfArray([1, 2])]),
+            ))),
+        )
+        f = StringIO()
+        PdfWriter().addpages([page]).write(f)
+        return f.getvalue()
+
+    def test_lazy(self):
+        fdata = self.makepdf()
+        font = PdfReader(fdata=fdata, lazysize=500).pages[0].inheritable.Resources.Font.F1
+        self.assertTrue(isinstance(dict.get(font, PdfName.Widths), PdfIndirect))
+        self.assertTrue(isinstance(dict.get(font, PdfName.Odd), PdfIndirect))
+        self.assertEqual(font.Type, PdfName.Font)
+        self.assertEqual([int(x) for x in font.Widths], range(1000))
+        self.assertTrue(isinstance(dict.get(font, PdfName.Widths), PdfArray))
+        odd = font.Odd
+        self.assertEqual(odd[0].decode(), 'x ] ) ( >> y')
+        self.assertEqual(odd[1].decode(), ']]')
+        self.assertEqual(len(odd[2].A), 300)
+        self.assertEqual(odd[3], ['1', '2'])
+
+    def test_small(self):
+        fdata = self.makepdf()
+        font = PdfReader(fdata=fdata, lazysize=len(fdata)).pages[0].inheritable.Resources.Font.F1
+        self.assertTrue(isinstance(dict.get(font, PdfName.Widths), PdfArray))
+
+    def test_cachesize(self):
+        page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                               Annots=PdfArray([PdfDict(Index=x) for x in range(30)]))
+        f = StringIO()
+        PdfWriter().addpage(page).write(f)
+        reader = PdfReader(fdata=f.getvalue(), cachesize=10, lazysize=64)
+        page = reader.pages[0]
+        self.assertTrue(isinstance(dict.get(page, PdfName.Annots), PdfIndirect))
+        self.assertTrue(page.Annots is page.Annots)
+        page.Annots.append(PdfDict(Index=30))
+        reader.evict()
+        gc.collect()
+        self.assertEqual(len(page.Annots), 31)
+        self.assertEqual(page.Annots[30].Index, 30)
+
+    def test_roundtrip(self):
+        fdata = self.makepdf()
+        f = StringIO()
+        PdfWriter().addpages(PdfReader(fdata=fdata, lazysize=100).pages).write(f)
+        self.assertEqual(f.getvalue(), fdata)
+
+
+class TestClose(unittest.TestCase):
+
+    def test_close(self):
+        with PdfReader(fdata=makepdf(5)) as reader:
+            page = reader.pages[0]
+            contents = page.Contents
+        self.assertEqual(reader.source, None)
+        self.assertEqual(contents.stream, '% page 0\n')
+        self.assertEqual(page.Contents, contents)
+        self.assertRaises(PdfError, getattr, page, 'Resources')
+        reader.close()
+
+    def test_freed(self):
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            reader = PdfReader(fdata=makepdf(5), lazysize=10)
+            reader.pages[0].Resources
+            reader.close()
+            ref = weakref.ref(reader)
+            del reader
+            self.assertEqual(ref(), None)
+        finally:
+            if enabled:
+                gc.enable()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,11 +12,11 @@ class TestEncoding(unittest.TestCase):
 
     @staticmethod
     def decode(value):
-        return pdfrw.pdfobjects.PdfString(value).decode()
+        return pdfrw.objects.PdfString(value).decode()
 
     @staticmethod
     def encode(value):
-        return str(pdfrw.pdfobjects.PdfString.encode(value))
+        return str(pdfrw.objects.PdfString.encode(value))
 
     @classmethod
     def encode_decode(cls, value):
@@ -28,6 +28,31 @@ class TestEncoding(unittest.TestCase):
     def test_doubleslash(self):
         self.roundtrip('\\')
 
+    def test_roundtrip(self):
+        for value in ('', 'plain', '(nested (parens))', 'back\\slash',
+                      ''.join(chr(x) for x in range(256))):
+            self.roundtrip(value)
+            self.assertEqual(value, pdfrw.objects.PdfString.encode(value, usehex=True).decode())
+
+    def test_escapes(self):
+        self.assertEqual(self.decode(r'(a\nb\tc\(d\)e\\f\qg)'), 'a\nb\tc(d)e\\fqg')
+        self.assertEqual(self.decode('(one\\\r\ntwo\\\nthree)'), 'onetwothree')
+
+    def test_octal(self):
+        self.assertEqual(self.decode(r'(\351t\351)'), '\xe9t\xe9')
+        self.assertEqual(self.decode(r'(\0053\53\5)'), '\x053+\x05')
+        self.assertEqual(self.decode(r'(\777)'), '\xff')
+
+    def test_hex(self):
+        self.assertEqual(self.decode('<48 65\n6c6C6f>'), 'Hello')
+        self.assertEqual(self.decode('<901fa>'), '\x90\x1f\xa0')
+        self.assertEqual(pdfrw.objects.PdfString('<0041263A>').decode(unichr, True), u'A\u263a')
+
+    def test_unicode(self):
+        PdfString = pdfrw.objects.PdfString
+        self.assertEqual(PdfString('<FEFF004D00E9263A>').to_unicode(), u'M\xe9\u263a')
+        self.assertEqual(PdfString('(Caf\351 \200 \223)').to_unicode(), u'Caf\xe9 \u2022 \ufb01')
+
 
 def main():
     unittest.main()
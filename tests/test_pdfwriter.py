@@ -0,0 +1,197 @@
+'''
+Run from the directory above like so:
+python -m tests.test_pdfwriter
+'''
+
+
+import pdfrw
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfStreamWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+
+
+def makepages(count, resources=None):
+    resources = resources or IndirectPdfDict()
+    return [IndirectPdfDict(
+                Type = PdfName.Page,
+                MediaBox = PdfArray([0, 0, 612, 792]),
+                Resources = resources,
+                Contents = IndirectPdfDict(stream='%% page %d\n' % index),
+            ) for index in range(count)]
+
+
+def roundtrip(writer):
+    f = StringIO()
+    writer.write(f)
+    return PdfReader(fdata=f.getvalue())
+
+
+class TestPageTree(unittest.TestCase):
+
+    def depths(self, node, depth=0):
+        if node.Type == PdfName.Page:
+            return [depth]
+        self.assertTrue(len(node.Kids) <= 10)
+        result = []
+        for kid in node.Kids:
+            result.extend(self.depths(kid, depth + 1))
+        self.assertEqual(int(node.Count), len(result))
+        return result
+
+    def test_flat(self):
+        writer = PdfWriter(fanout=0).addpages(makepages(25))
+        pages = writer.trailer.Root.Pages
+        self.assertTrue(pages.Kids is writer.pagearray)
+        self.assertEqual(pages.Resources, None)
+        self.assertEqual(len(roundtrip(writer).pages), 25)
+
+    def test_balanced(self):
+        writer = PdfWriter(fanout=10).addpages(makepages(1234))
+        depths = self.depths(writer.trailer.Root.Pages)
+        self.assertEqual(len(depths), 1234)
+        self.assertEqual(set(depths), set([4]))
+        reader = roundtrip(writer)
+        self.assertEqual(len(reader.pages), 1234)
+        self.assertEqual(reader.pages[567].Contents.stream, '% page 567\n')
+
+    def test_hoist(self):
+        pages = makepages(20) + makepages(5)
+        pages[-1].Rotate = 90
+        writer = PdfWriter(fanout=10).addpages(pages)
+        root = writer.trailer.Root.Pages
+        self.assertEqual([int(x) for x in root.MediaBox], [0, 0, 612, 792])
+        self.assertEqual(root.Resources, None)
+        self.assertEqual(root.Rotate, None)
+        self.assertTrue(root.Kids[0].Resources is pages[0].Resources)
+        self.assertEqual(writer.pagearray[0].MediaBox, None)
+        for page in roundtrip(writer).pages:
+            self.assertEqual([int(x) for x in page.inheritable.MediaBox],
+                             [0, 0, 612, 792])
+            self.assertTrue(page.inheritable.Resources is not None)
+
+    def test_rebuild(self):
+        writer = PdfWriter(fanout=10).addpages(makepages(15))
+        writer.trailer
+        writer.addpages(makepages(15))
+        for page in roundtrip(writer).pages:
+            self.assertTrue(page.inheritable.MediaBox is not None)
+            self.assertTrue(page.inheritable.Resources is not None)
+
+
+class TestPromote(unittest.TestCase):
+
+    def shared(self, promote):
+        font = PdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                       BaseFont=PdfName.Helvetica, FirstChar=32, LastChar=126,
+                       Encoding=PdfName.WinAnsiEncoding, Name=PdfName.F1,
+                       Widths=PdfArray([500] * 95))
+        pages = []
+        for page in makepages(10):
+            page.Resources = PdfDict(Font=PdfDict(F1=font))
+            pages.append(page)
+        f = StringIO()
+        PdfWriter(promote=promote).addpages(pages).write(f)
+        fdata = f.getvalue()
+        reader = PdfReader(fdata=fdata)
+        fonts = [page.Resources.Font.F1 for page in reader.pages]
+        self.assertEqual([int(x.LastChar) for x in fonts], [126] * 10)
+        return fdata, len(set(id(x) for x in fonts))
+
+    def test_promote(self):
+        promoted, count = self.shared(8)
+        self.assertEqual(count, 1)
+        replicated, count = self.shared(0)
+        self.assertEqual(count, 10)
+        self.assertTrue(len(promoted) * 2 < len(replicated))
+
+    def test_linearized(self):
+        pages = makepages(4)
+        box = PdfArray(range(10))
+        for page in pages:
+            page.Annots = box
+        reader = roundtrip(PdfWriter(linearize=True, promote=4).addpages(pages))
+        self.assertTrue(reader.linearized is not None)
+        self.assertTrue(reader.pages[0].Annots is reader.pages[3].Annots)
+
+
+class TestStreamWriter(unittest.TestCase):
+
+    def test_merge(self):
+        sources = []
+        for count in (3, 40, 7):
+            sources.append(roundtrip(PdfWriter().addpages(makepages(count))))
+        f = StringIO()
+        writer = PdfStreamWriter(f, fanout=8)
+        for source in sources:
+            writer.adddoc(source)
+        writer.close()
+        reader = PdfReader(fdata=f.getvalue())
+        self.assertEqual(len(reader.pages), 50)
+        self.assertEqual(int(reader.Root.Pages.Count), 50)
+        self.assertEqual(reader.pages[3].Contents.stream, '% page 0\n')
+        self.assertEqual(reader.pages[49].Contents.stream, '% page 6\n')
+        resources = set(id(page.inheritable.Resources) for page in reader.pages)
+        self.assertEqual(len(resources), 3)
+
+    def test_flat(self):
+        f = StringIO()
+        PdfStreamWriter(f, fanout=0).addpages(makepages(25)).close()
+        reader = PdfReader(fdata=f.getvalue())
+        self.assertEqual(len(reader.Root.Pages.Kids), 25)
+        self.assertEqual(reader.pages[24].Contents.stream, '% page 24\n')
+        self.assertTrue(reader.pages[0].Parent is reader.Root.Pages)
+
+
+class TestLinearized(unittest.TestCase):
+
+    def test_linearized(self):
+        pages = makepages(7) + makepages(6)
+        writer = PdfWriter(linearize=True, fanout=4).addpages(pages)
+        f = StringIO()
+        writer.write(f)
+        fdata = f.getvalue()
+        reader = PdfReader(fdata=fdata)
+        self.assertTrue('_linearized' not in vars(reader))
+        params = reader.linearized
+        self.assertTrue(reader.linearized is params)
+        self.assertTrue(params is not None)
+        self.assertEqual(int(params.L), len(fdata))
+        self.assertEqual(int(params.N), 13)
+        self.assertEqual(int(params.O), reader.pages[0].indirect[0])
+        mainxref = int(params.T)
+        self.assertEqual(fdata[mainxref + 1:mainxref + 21], '0000000000 65535 f\r\n')
+        hint_offset, hint_len = [int(x) for x in params.H]
+        self.assertTrue(fdata[hint_offset:hint_offset + hint_len].endswith('endobj\n'))
+        # The first page and its contents are before the end of the first page.
+        contents = reader.pages[0].Contents.indirect[0]
+        self.assertTrue(0 < fdata.find('\n%s 0 obj' % contents) < int(params.E))
+        self.assertEqual([x.Contents.stream for x in reader.pages],
+                         [x.Contents.stream for x in pages])
+
+    def test_not_linearized(self):
+        self.assertEqual(roundtrip(PdfWriter().addpages(makepages(3))).linearized, None)
+
+    def test_direct_pages(self):
+        pages = [PdfDict(x) for x in makepages(3)]
+        for page in pages:
+            page.indirect = False
+        reader = roundtrip(PdfWriter(linearize=True).addpages(pages))
+        self.assertEqual(int(reader.linearized.N), 3)
+        self.assertTrue(reader.pages[2].indirect)
+        self.assertEqual(reader.pages[2].Contents.stream, '% page 2\n')
+
+    def test_closed(self):
+        f = StringIO()
+        PdfWriter(linearize=True).addpages(makepages(3)).write(f)
+        reader = PdfReader(fdata=f.getvalue())
+        reader.close()
+        self.assertEqual(reader.linearized, None)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
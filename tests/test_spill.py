@@ -0,0 +1,102 @@
+'''
+Run from the directory above like so:
+python -m tests.test_spill
+'''
+
+
+import zlib
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, IndirectPdfDict
+from pdfrw.spill import SpillStore, SpilledStream
+from pdfrw.errors import PdfError
+
+
+def stream(data, **kw):
+    obj = IndirectPdfDict(**kw)
+    obj.stream = data
+    return obj
+
+
+def spilled(obj):
+    return isinstance(vars(obj)['stream'], SpilledStream)
+
+
+class TestSpill(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SpillStore(threshold=100, budget=250)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_budget(self):
+        objs = [stream(chr(65 + x) * 100) for x in range(3)] + [stream('small')]
+        self.store.addall(objs[:2])
+        self.assertEqual([spilled(x) for x in objs[:2]], [False, False])
+        self.store.addall(objs[2:])
+        # The oldest goes out, and small streams are never tracked
+        self.assertEqual([spilled(x) for x in objs], [True, False, False, False])
+        self.assertEqual(self.store.inmemory, 200)
+
+    def test_read(self):
+        obj = stream('0123456789' * 20)
+        self.store.spill(obj)
+        self.assertTrue(spilled(obj))
+        self.assertEqual(obj.stream, '0123456789' * 20)
+        self.assertEqual(int(obj.Length), 200)
+        obj.stream = 'new'
+        self.assertEqual((obj.stream, int(obj.Length)), ('new', 3))
+
+    def test_write(self):
+        data = 'q 1 0 0 1 0 0 cm Q\n' * 20
+        page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                               Contents=stream(data))
+        self.store.spill(page.Contents)
+        f = StringIO()
+        PdfWriter().addpage(page).write(f)
+        self.assertEqual(PdfReader(fdata=f.getvalue()).pages[0].Contents.stream, data)
+
+    def test_compress(self):
+        data = zlib.compress('q Q\n' * 100)
+        page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                               Contents=stream(data, Filter=PdfName.FlateDecode))
+        self.store.spill(page.Contents)
+        reads = []
+        read = self.store.read
+        self.store.read = lambda *args: reads.append(args) or read(*args)
+        f = StringIO()
+        PdfWriter(compress=True).addpage(page).write(f)
+        # Read back once, to be written out, and not to check for data
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(PdfReader(fdata=f.getvalue()).pages[0].Contents.stream, data)
+
+    def test_reader(self):
+        data = 'stream data\n' * 100
+        page = IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                               Contents=stream(zlib.compress(data), Filter=PdfName.FlateDecode))
+        f = StringIO()
+        PdfWriter().addpage(page).write(f)
+        store = SpillStore(threshold=0, budget=0)
+        contents = PdfReader(fdata=f.getvalue(), decompress=True, spill=store).pages[0].Contents
+        self.assertTrue(spilled(contents))
+        self.assertEqual((contents.stream, contents.Filter), (data, None))
+        store.close()
+
+    def test_close(self):
+        obj = stream('x' * 200)
+        self.store.spill(obj)
+        f = self.store.f
+        self.store.close()
+        self.assertTrue(f.closed)
+        self.assertEqual(self.store.f, None)
+        self.assertRaises(PdfError, getattr, obj, 'stream')
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+'''
+Run from the directory above like so:
+python -m tests.test_text
+'''
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+from pdfrw.text import CMap, FontDecoder, glyphtext, getcmap, itertext, iterfiles
+
+
+TOUNICODE = '''/CIDInit /ProcSet findresource begin
+12 dict begin
+begincmap
+/CMapName /Adobe-Identity-UCS def
+1 begincodespacerange
+<0000> <FFFF>
+endcodespacerange
+3 beginbfchar
+<0001> <0048>
+<0002> <0069>
+<0003> <D83DDE00>
+endbfchar
+2 beginbfrange
+<0010> <0012> <0041>
+<0020> <0021> [<00660069> /eacute]
+endbfrange
+endcmap
+CMapName currentdict /CMap defineresource pop
+end
+end
+'''
+
+
+def stream(data, **kw):
+    obj = IndirectPdfDict(**kw)
+    obj.stream = data
+    return obj
+
+
+def makefonts():
+    latin = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                            BaseFont=PdfName.Helvetica, Encoding=PdfName.WinAnsiEncoding)
+    custom = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1, BaseFont=PdfName.Custom,
+                             Encoding=PdfDict(Differences=PdfArray(
+                                [65, PdfName.quotedblleft, PdfName.f_i, PdfName.uni00E9, PdfName.B])))
+    cid = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type0, BaseFont=PdfName.CIDFont,
+                          Encoding=PdfName('Identity-H'), ToUnicode=stream(TOUNICODE))
+    return PdfDict(F1=latin, F2=custom, F3=cid)
+
+
+class TestFonts(unittest.TestCase):
+
+    def test_glyphs(self):
+        self.assertEqual(glyphtext('f_f_i'), u'ffi')
+        self.assertEqual(glyphtext('uni00E90041'), u'\xe9A')
+        self.assertEqual(glyphtext('u1F600'), u'\U0001f600')
+        self.assertEqual(glyphtext('a.sc'), u'a')
+        self.assertEqual(glyphtext('quotedblleft'), u'\u201c')
+        self.assertEqual(glyphtext('g123'), None)
+
+    def test_cmap(self):
+        cmap = CMap(TOUNICODE)
+        self.assertEqual(cmap.codespace, [('\0\0', '\xff\xff')])
+        self.assertEqual(cmap.map, {'\0\1': u'H', '\0\2': u'i', '\0\3': u'\U0001f600',
+                                    '\0\x10': u'A', '\0\x11': u'B', '\0\x12': u'C',
+                                    '\0\x20': u'fi', '\0\x21': u'\xe9'})
+        self.assertEqual(cmap.splitter()('\0\1\0\2\0'), ['\0\1', '\0\2', '\0'])
+
+    def test_mixed_codespace(self):
+        cmap = CMap('begincodespacerange <00> <80> <8140> <9FFC> endcodespacerange')
+        self.assertEqual(cmap.splitter()('A\x81\x40B'), ['A', '\x81\x40', 'B'])
+
+    def test_no_codespace(self):
+        split = CMap('').splitter()
+        self.assertEqual(split('\0\1\0\2\0'), ['\0\1', '\0\2', '\0'])
+
+    def test_cache(self):
+        first = getcmap(TOUNICODE)
+        self.assertTrue(getcmap(TOUNICODE) is first)
+        self.assertFalse(getcmap(TOUNICODE + ' ') is first)
+
+    def test_decoders(self):
+        fonts = makefonts()
+        self.assertEqual(FontDecoder(fonts.F1).decode('Caf\xe9 \x93ok\x94'), u'Caf\xe9 \u201cok\u201d')
+        self.assertEqual(FontDecoder(fonts.F2).decode('ABCDx\x00'), u'\u201cfi\xe9Bx')
+        self.assertEqual(FontDecoder(fonts.F3).decode('\0\1\0\2\0\x11\0\x20\0\x21\0\x99'),
+                         u'HiBfi\xe9')
+
+
+class TestPages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def makepdf(self, fname, *contents):
+        fonts = makefonts()
+        form = stream('BT /F1 10 Tf 0 -100 Td (In a form) Tj ET', Type=PdfName.XObject,
+                      Subtype=PdfName.Form, Resources=PdfDict(Font=fonts))
+        resources = PdfDict(Font=fonts, XObject=PdfDict(Fm1=form))
+        pages = [IndirectPdfDict(Type=PdfName.Page, MediaBox=PdfArray([0, 0, 612, 792]),
+                                 Resources=resources, Contents=stream(x)) for x in contents]
+        PdfWriter(compress=True).addpages(pages).write(fname)
+        return fname
+
+    def test_operators(self):
+        fname = self.makepdf(os.path.join(self.tmpdir, 'a.pdf'),
+            'BT /F1 12 Tf 72 700 Td (Hello,) Tj 40 0 Td (world) Tj\n'
+            '0 -14 Td [(Ke) 20 (rn) -500 (ing)] TJ 14 TL T* (next) Tj\n'
+            '(quote) \' 1 2 (dquote) " ET\n'
+            'BT /F3 12 Tf 1 0 0 1 72 600 Tm <00010002> Tj 1 0 0 1 200 600 Tm <0003> Tj ET\n'
+            'q /F2 9 Tf Q BT /F2 12 Tf 72 500 Td (ABC) Tj ET /Fm1 Do',
+            'BT /F1 12 Tf (Page two) Tj ET')
+        reader = PdfReader(fname)
+        self.assertEqual(list(itertext(reader)), [
+            (1, u'Hello, world\nKern ing\nnext\nquote\ndquote\nHi \U0001f600\n\u201cfi\xe9\nIn a form'),
+            (2, u'Page two')])
+
+    def test_files(self):
+        fname = self.makepdf(os.path.join(self.tmpdir, 'f.pdf'), 'BT /F1 12 Tf (File) Tj ET')
+        self.assertEqual(list(iterfiles([fname], workers=1)), [(fname, [u'File'])])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+'''
+Run from the directory above like so:
+python -m tests.test_uncompress
+'''
+
+
+import zlib
+import logging
+import struct
+import random
+import unittest
+from cStringIO import StringIO
+
+from pdfrw import PdfReader, PdfWriter, PdfName, PdfArray, PdfDict, IndirectPdfDict
+from pdfrw import uncompress as module
+from pdfrw.uncompress import uncompress, filters, iterdecode, png_unpredict, DecodeCache
+from pdfrw.spill import SpillStore
+from pdfrw.errors import PdfParseError
+
+
+def png_encode(data, rowlen, bpp, kinds):
+    ''' Apply PNG filters to data, cycling through kinds.
+    '''
+    def paeth(a, b, c):
+        p = a + b - c
+        pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+        if pa <= pb and pa <= pc:
+            return a
+        return pb <= pc and b or c
+    result = []
+    prev = bytearray(rowlen)
+    for index in range(len(data) // rowlen):
+        row = bytearray(data[index * rowlen:(index + 1) * rowlen])
+        kind = kinds[index % len(kinds)]
+        out = bytearray([kind])
+        for x in range(rowlen):
+            a = x >= bpp and row[x - bpp] or 0
+            b = prev[x]
+            c = x >= bpp and prev[x - bpp] or 0
+            predict = [0, a, b, (a + b) // 2, paeth(a, b, c)][kind]
+            out.append((row[x] - predict) & 255)
+        result.append(str(out))
+        prev = row
+    return ''.join(result)
+
+
+def tiff_encode(data, colors, bpc, columns):
+    size = bpc // 8
+    fmt = size == 1 and 'B' or 'H'
+    count = len(data) // size
+    values = list(struct.unpack('>%d%s' % (count, fmt), data))
+    rowlen = colors * columns
+    for start in range(0, count, rowlen):
+        for x in range(start + rowlen - 1, start + colors - 1, -1):
+            values[x] = (values[x] - values[x - colors]) & (256 ** size - 1)
+    return struct.pack('>%d%s' % (count, fmt), *values)
+
+
+def ascii85_encode(data):
+    padding = -len(data) % 4
+    data += '\0' * padding
+    result = []
+    for (word,) in [struct.unpack('>L', data[x:x + 4]) for x in range(0, len(data), 4)]:
+        chars = []
+        for x in range(5):
+            word, digit = divmod(word, 85)
+            chars.append(chr(digit + 33))
+        result.append(''.join(reversed(chars)))
+    result = ''.join(result)
+    return result[:len(result) - padding] + '~>'
+
+
+def lzw_encode(data, early=1, clear=True):
+    table = dict((chr(x), x) for x in range(256))
+    codes = [256]
+    word = ''
+    for ch in data:
+        if word + ch in table:
+            word += ch
+            continue
+        codes.append(table[word])
+        if len(table) + 2 < 4096:
+            table[word + ch] = len(table) + 2
+        word = ch
+        if clear and len(table) + 2 == 4096 - early:
+            codes.append(table[word])
+            word = ''
+            codes.append(256)
+            table = dict((chr(x), x) for x in range(256))
+    if word:
+        codes.append(table[word])
+    codes.append(257)
+    # Work out the widths the way the decoder will
+    bits = []
+    size = 258
+    prev = False
+    width = 9
+    for code in codes:
+        bits.append(bin(code)[2:].zfill(width))
+        if code == 256:
+            size, prev, width = 258, False, 9
+            continue
+        if prev:
+            size += 1
+        prev = True
+        width = min(12, len(bin(size + early)) - 2)
+    bits = ''.join(bits)
+    bits += '0' * (-len(bits) % 8)
+    return ''.join(chr(int(bits[x:x + 8], 2)) for x in range(0, len(bits), 8))
+
+
+class TestFilters(unittest.TestCase):
+
+    def setUp(self):
+        self.numpy = module.numpy
+
+    def tearDown(self):
+        module.numpy = self.numpy
+
+    def both(self, func):
+        ''' Run func with and without NumPy.
+        '''
+        func()
+        if module.numpy is not None:
+            module.numpy = None
+            func()
+
+    def stream(self, data, ftype, parms=None):
+        obj = PdfDict(Filter=ftype, DecodeParms=parms)
+        obj.stream = data
+        return obj
+
+    def test_png(self):
+        rnd = random.Random(42)
+        data = ''.join(chr(rnd.randrange(256)) for x in range(30 * 12))
+        encoded = png_encode(data, 30, 3, [0, 1, 1, 2, 2, 2, 3, 4, 4, 1, 2, 0])
+        parms = PdfDict(Predictor=12, Colors=3, Columns=10)
+        def check():
+            obj = self.stream(zlib.compress(encoded), PdfName.FlateDecode, parms)
+            self.assertTrue(uncompress([obj]))
+            self.assertEqual(obj.stream, data)
+            self.assertEqual(obj.Filter, None)
+            self.assertEqual(obj.DecodeParms, None)
+        self.both(check)
+
+    def test_png_bpp(self):
+        # 5 colors of 4 bits are 3 bytes a pixel, and a row of
+        # 2 pixels (5 bytes) is not a whole number of them.
+        rnd = random.Random(8)
+        for columns in (2, 6):
+            rowlen = (5 * 4 * columns + 7) // 8
+            data = ''.join(chr(rnd.randrange(256)) for x in range(rowlen * 8))
+            encoded = png_encode(data, rowlen, 3, [1, 1, 3, 4, 0, 1, 2, 4])
+            def check():
+                self.assertEqual(png_unpredict(encoded, 5, 4, columns), data)
+            self.both(check)
+
+    def test_tiff(self):
+        rnd = random.Random(1)
+        for bpc in (8, 16):
+            data = ''.join(chr(rnd.randrange(256)) for x in range(4 * 5 * 7 * bpc // 8))
+            encoded = tiff_encode(data, 4, bpc, 5)
+            parms = PdfDict(Predictor=2, Colors=4, Columns=5, BitsPerComponent=bpc)
+            def check():
+                self.assertEqual(filters[PdfName.FlateDecode](zlib.compress(encoded), parms), data)
+            self.both(check)
+
+    def test_lzw(self):
+        # Example from the PDF reference
+        encoded = '\x80\x0b\x60\x50\x22\x0c\x0c\x85\x01'
+        self.assertEqual(filters[PdfName.LZWDecode](encoded, None), '-----A---B')
+
+    def test_lzw_long(self):
+        # Enough codes to go up to 12 bits, and reset the table
+        rnd = random.Random(3)
+        data = ''.join(rnd.choice('abcdefgh') for x in range(20000))
+        self.assertEqual(filters[PdfName.LZWDecode](lzw_encode(data), None), data)
+        self.assertEqual(filters[PdfName.LZWDecode](lzw_encode(data, 0),
+                         PdfDict(EarlyChange=0)), data)
+
+    def test_lzw_full(self):
+        # The encoder keeps sending 12 bit codes after the table is full
+        rnd = random.Random(4)
+        data = ''.join(rnd.choice('abcdefgh') for x in range(40000))
+        self.assertEqual(filters[PdfName.LZWDecode](lzw_encode(data, clear=False), None), data)
+
+    def test_ascii(self):
+        data = ''.join(chr(x) for x in range(256)) + '\0\0\0\0 end'
+        self.assertEqual(filters[PdfName.ASCIIHexDecode]('61 62\n6>', None), 'ab`')
+        self.assertEqual(filters[PdfName.ASCII85Decode](ascii85_encode(data), None), data)
+        self.assertEqual(filters[PdfName.ASCII85Decode]('<~9jqo^z~>', None), 'Man \0\0\0\0')
+
+    def test_runlength(self):
+        self.assertEqual(filters[PdfName.RunLengthDecode]('\x02abc\xfdx\x00y\x80junk', None),
+                         'abcxxxxy')
+
+    def test_chain(self):
+        data = 'Hello, world\n' * 20
+        obj = self.stream(ascii85_encode(zlib.compress(data)),
+                          PdfArray([PdfName.ASCII85Decode, PdfName.FlateDecode]))
+        self.assertTrue(uncompress([obj]))
+        self.assertEqual(obj.stream, data)
+        self.assertEqual(obj.Filter, None)
+
+    def test_partial(self):
+        parms = PdfDict(ColorTransform=0)
+        obj = self.stream(ascii85_encode('JPEG data'),
+                          PdfArray([PdfName.A85, PdfName.DCTDecode]),
+                          PdfArray([PdfName('null'), parms]))
+        self.assertFalse(uncompress([obj]))
+        self.assertEqual(obj.stream, 'JPEG data')
+        self.assertEqual(obj.Filter, PdfName.DCTDecode)
+        self.assertTrue(obj.DecodeParms is parms)
+
+    def test_error(self):
+        obj = self.stream('not compressed', PdfName.FlateDecode)
+        uncompress([obj])
+        self.assertEqual(obj.stream, 'not compressed')
+        self.assertEqual(obj.Filter, PdfName.FlateDecode)
+
+
+class TestDecoded(unittest.TestCase):
+
+    def makepdf(self, count):
+        pages = []
+        for index in range(count):
+            contents = IndirectPdfDict(Filter=PdfName.FlateDecode)
+            contents.stream = zlib.compress('%% page %d\n' % index)
+            pages.append(IndirectPdfDict(Type=PdfName.Page, Contents=contents,
+                                         MediaBox=PdfArray([0, 0, 612, 792])))
+        f = StringIO()
+        PdfWriter().addpages(pages).write(f)
+        return f.getvalue()
+
+    def test_decoded(self):
+        reader = PdfReader(fdata=self.makepdf(5))
+        unread = len(reader.deferred_objects)
+        contents = reader.pages[3].Contents
+        encoded = contents.stream
+        self.assertEqual(contents.decoded, '% page 3\n')
+        self.assertTrue(contents.decoded is contents.decoded)
+        self.assertEqual(contents.stream, encoded)
+        self.assertEqual(contents.Filter, PdfName.FlateDecode)
+        # Only the page's contents were read in
+        self.assertEqual(len(reader.deferred_objects), unread - 1)
+        f = StringIO()
+        PdfWriter().addpages(reader.pages).write(f)
+        self.assertTrue(encoded in f.getvalue())
+
+    def test_changed(self):
+        obj = PdfDict(Filter=PdfName.FlateDecode)
+        obj.stream = zlib.compress('first')
+        self.assertEqual(obj.decoded, 'first')
+        obj.stream = zlib.compress('second')
+        self.assertEqual(obj.decoded, 'second')
+        obj.Filter = None
+        self.assertEqual(obj.decoded, obj.stream)
+        obj.Filter = PdfName.DCTDecode
+        self.assertEqual(obj.decoded, None)
+
+    def test_bounded(self):
+        cache = DecodeCache(1000)
+        objs = []
+        for index in range(20):
+            obj = PdfDict(Filter=PdfName.ASCIIHexDecode)
+            obj.stream = '41' * 50
+            objs.append(obj)
+            self.assertEqual(cache.get(obj), 'A' * 50)
+        self.assertEqual(len(cache.entries), 6)
+        self.assertEqual(cache.size, 900)
+        first = cache.get(objs[-1])
+        self.assertTrue(cache.get(objs[-1]) is first)
+
+    def test_spilled(self):
+        cache = DecodeCache(1000)
+        obj = PdfDict(Filter=PdfName.ASCIIHexDecode)
+        obj.stream = '41' * 300
+        store = SpillStore(threshold=0, budget=0)
+        store.add(obj)
+        first = cache.get(obj)
+        self.assertEqual(first, 'A' * 300)
+        self.assertTrue(cache.get(obj) is first)
+        self.assertEqual(cache.size, 300)
+        store.close()
+
+
+class TestIterDecode(unittest.TestCase):
+
+    def stream(self, data, ftype, parms=None):
+        obj = PdfDict(Filter=ftype, DecodeParms=parms)
+        obj.stream = data
+        return obj
+
+    def check(self, obj, data, chunksize=7):
+        chunks = list(iterdecode(obj, chunksize))
+        self.assertEqual(''.join(chunks), data)
+        self.assertEqual(set(len(x) for x in chunks[:-1]), set([chunksize]))
+
+    def test_filters(self):
+        rnd = random.Random(5)
+        data = ''.join(chr(rnd.randrange(256)) for x in range(24 * 20))
+        encoded = png_encode(data, 24, 3, [1, 2, 3, 4, 0])
+        parms = PdfDict(Predictor=15, Colors=3, Columns=8)
+        self.check(self.stream(zlib.compress(encoded), PdfName.FlateDecode, parms), data)
+        self.check(self.stream(zlib.compress(tiff_encode(data, 3, 8, 8)), PdfName.FlateDecode,
+                               PdfDict(Predictor=2, Colors=3, Columns=8)), data)
+        self.check(self.stream(lzw_encode(data), PdfName.LZWDecode), data)
+        self.check(self.stream(' '.join('%02x' % ord(x) for x in data) + '>',
+                               PdfName.ASCIIHexDecode), data)
+        self.check(self.stream('<~' + ascii85_encode(data), PdfName.ASCII85Decode), data)
+        self.check(self.stream(''.join('\x00' + x for x in data) + '\x80',
+                               PdfName.RunLengthDecode), data)
+        self.check(self.stream(ascii85_encode(zlib.compress(data)),
+                               [PdfName.A85, PdfName.Fl]), data, 100)
+
+    def test_maxsize(self):
+        obj = self.stream(zlib.compress('\0' * (10 << 20)), PdfName.FlateDecode)
+        chunks = iterdecode(obj, maxsize=1 << 20)
+        self.assertEqual(len(chunks.next()), 1 << 16)
+        self.assertRaises(PdfParseError, list, chunks)
+        self.assertTrue(uncompress([obj], maxsize=1 << 20))
+        self.assertEqual(obj.Filter, PdfName.FlateDecode)
+        self.assertTrue(uncompress([obj], maxsize=10 << 20))
+        self.assertEqual(len(obj.stream), 10 << 20)
+
+    def test_columns(self):
+        # Huge rows are rejected before they are decoded
+        parms = PdfDict(Predictor=12, Columns=300000000)
+        obj = self.stream(zlib.compress('\0' * 1000), PdfName.FlateDecode, parms)
+        self.assertRaises(PdfParseError, list, iterdecode(obj, maxsize=1 << 20))
+        self.assertRaises(PdfParseError, list, iterdecode(obj))
+        self.assertTrue(uncompress([obj], maxsize=1 << 20))
+        self.assertEqual(obj.Filter, PdfName.FlateDecode)
+        # And the input to the predictor is counted
+        parms = PdfDict(Predictor=12, Columns=1000)
+        obj = self.stream(zlib.compress('\0' * (10 << 20)), PdfName.FlateDecode, parms)
+        self.assertRaises(PdfParseError, list, iterdecode(obj, maxsize=1 << 20))
+
+    def test_errors(self):
+        self.assertRaises(PdfParseError, list,
+                          iterdecode(self.stream('junk', PdfName.FlateDecode)))
+        self.assertRaises(PdfParseError, list,
+                          iterdecode(self.stream('junk', PdfName.DCTDecode)))
+        self.assertRaises(PdfParseError, list,
+                          iterdecode(self.stream('zz>', PdfName.ASCIIHexDecode)))
+
+    def test_spilled(self):
+        data = 'Spilled stream data\n' * 1000
+        obj = self.stream(zlib.compress(data), PdfName.FlateDecode)
+        store = SpillStore(threshold=0, budget=0)
+        store.add(obj)
+        self.assertFalse(isinstance(vars(obj)['stream'], str))
+        self.check(obj, data, 1000)
+        store.close()
+
+
+class TestParallel(unittest.TestCase):
+
+    def streams(self):
+        objs = []
+        for index in range(40):
+            obj = PdfDict(Filter=PdfName.FlateDecode)
+            obj.stream = zlib.compress('stream %d\n' % index * 1000)
+            objs.append(obj)
+        objs[7].stream = 'bad data'
+        objs[11].Filter = PdfName.DCTDecode
+        objs[13].Filter = PdfArray([PdfName.FlateDecode, PdfName.JPXDecode])
+        return objs
+
+    def test_parallel(self):
+        messages = []
+        class Handler(logging.Handler):
+            def emit(self, record):
+                messages.append(record.getMessage())
+        handler = Handler()
+        module.log.addHandler(handler)
+        try:
+            results = []
+            for workers in (1, 4):
+                objs = self.streams()
+                ok = uncompress(objs, warnings=set(), workers=workers)
+                results.append((ok, [(x.stream, x.Filter) for x in objs], messages[:]))
+                del messages[:]
+        finally:
+            module.log.removeHandler(handler)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(results[0][2]), 3)
+        self.assertEqual(results[0][1][20], ('stream 20\n' * 1000, None))
+        self.assertEqual(results[0][1][13][1], PdfName.JPXDecode)
+
+    def test_reader(self):
+        pages = [IndirectPdfDict(Type=PdfName.Page, Contents=obj,
+                                 MediaBox=PdfArray([0, 0, 612, 792]))
+                    for obj in self.streams()[20:]]
+        for obj in pages:
+            obj.Contents.indirect = True
+        f = StringIO()
+        PdfWriter().addpages(pages).write(f)
+        reader = PdfReader(fdata=f.getvalue(), decompress=True, workers=3)
+        self.assertEqual([x.Contents.stream for x in reader.pages],
+                         ['stream %d\n' % x * 1000 for x in range(20, 40)])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''
+Run from the directory above like so:
+python -m tests.test_util
+'''
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pdfrw.util import pdffiles, mapfiles
+
+
+def readfile(fname, suffix):
+    data = open(fname, 'rb').read()
+    if not data.startswith('%PDF'):
+        raise ValueError('not a PDF')
+    return data + suffix
+
+
+class TestMapFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for index in range(5):
+            open(os.path.join(self.tmpdir, 'f%d.pdf' % index), 'wb').write('%%PDF %d' % index)
+        open(os.path.join(self.tmpdir, 'bad.PDF'), 'wb').write('not a PDF')
+        open(os.path.join(self.tmpdir, 'notes.txt'), 'wb').write('%PDF')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_pdffiles(self):
+        self.assertEqual([os.path.basename(x) for x in pdffiles(self.tmpdir)],
+                         ['bad.PDF', 'f0.pdf', 'f1.pdf', 'f2.pdf', 'f3.pdf', 'f4.pdf'])
+        self.assertEqual(pdffiles(['b.pdf', 'a.pdf']), ['b.pdf', 'a.pdf'])
+
+    def test_mapfiles(self):
+        expected = [(os.path.join(self.tmpdir, 'bad.PDF'), None)] + [
+            (os.path.join(self.tmpdir, 'f%d.pdf' % x), '%%PDF %d!' % x) for x in range(5)]
+        for workers in (1, 2):
+            self.assertEqual(list(mapfiles(readfile, self.tmpdir, workers, ('!',))), expected)
+        fnames = [x for x, y in reversed(expected)]
+        self.assertEqual(list(mapfiles(readfile, fnames, 2, ('!',))), expected[::-1])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()